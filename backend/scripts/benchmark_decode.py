@@ -0,0 +1,168 @@
+"""
+Benchmark the image decode path used by the emotion endpoints.
+
+Compares the previous decode (full decode, LANCZOS upscale to 480px minimum,
+LANCZOS downscale to 1024px maximum) with the current `decode_image_bytes`
+(JPEG draft/DCT-scaled decode, bilinear resize, no unnecessary upscale) on a
+synthetic 12MP phone-sized JPEG.
+
+Each path runs in its own subprocess so peak RSS is measured in isolation.
+
+Usage (from the backend directory):
+    python scripts/benchmark_decode.py --runs 10
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+# Add the backend root to the Python path
+backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_root)
+
+
+def decode_legacy(image_data: bytes) -> np.ndarray:
+    """
+    The decode path before reduced-resolution decoding, kept for comparison.
+    """
+    image = Image.open(io.BytesIO(image_data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    min_dimension = 480
+    if min(image.size) < min_dimension:
+        ratio = min_dimension / min(image.size)
+        image = image.resize(tuple(int(dim * ratio) for dim in image.size), Image.Resampling.LANCZOS)
+
+    max_dimension = 1024
+    if max(image.size) > max_dimension:
+        ratio = max_dimension / max(image.size)
+        image = image.resize(tuple(int(dim * ratio) for dim in image.size), Image.Resampling.LANCZOS)
+
+    return np.array(image)
+
+
+def make_test_jpeg(path: str, width: int, height: int) -> None:
+    """
+    Write a photo-like JPEG: smooth gradients plus sensor-style noise, which
+    compresses to a realistic few-MB file instead of a trivially small one.
+    """
+    rng = np.random.default_rng(42)
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    channels = [
+        200 * x + 40 * y,
+        120 + 80 * np.sin(6 * x) * np.cos(4 * y),
+        180 * y + 30 * x,
+    ]
+    image = np.stack(channels, axis=-1)
+    image += rng.normal(0, 12, image.shape).astype(np.float32)
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(path, format='JPEG', quality=92)
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the kernel's peak RSS counter (Linux only) so imports are not counted.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def read_peak_rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(path_name: str, input_path: str, runs: int) -> None:
+    if path_name == 'old':
+        decode = decode_legacy
+    else:
+        from src.services.emotion_detection import decode_image_bytes as decode
+
+    with open(input_path, 'rb') as f:
+        image_data = f.read()
+
+    # One untimed run so lazy library initialisation is not measured
+    decode(image_data)
+    isolated = reset_peak_rss()
+
+    timings = []
+    shape = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        shape = decode(image_data).shape
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print(json.dumps({
+        'path': path_name,
+        'output_shape': list(shape),
+        'mean_ms': sum(timings) / len(timings),
+        'min_ms': min(timings),
+        'peak_rss_mb': read_peak_rss_mb(),
+        'rss_isolated': isolated,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--child', choices=['old', 'new'], help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.input, args.runs)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'upload.jpg')
+        make_test_jpeg(input_path, args.width, args.height)
+        size_mb = os.path.getsize(input_path) / (1024 * 1024)
+        print(f"Test image: {args.width}x{args.height} JPEG, {size_mb:.1f} MB, {args.runs} runs per path\n")
+
+        results = {}
+        for path_name in ('old', 'new'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', path_name, '--input', input_path, '--runs', str(args.runs)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            # The service module may log to stdout; the result is the last line
+            results[path_name] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'path':<6}{'output':>14}{'mean ms':>10}{'min ms':>10}{'peak RSS MB':>14}")
+    for name, result in results.items():
+        shape = 'x'.join(str(dim) for dim in result['output_shape'][:2])
+        print(f"{name:<6}{shape:>14}{result['mean_ms']:>10.1f}{result['min_ms']:>10.1f}{result['peak_rss_mb']:>14.1f}")
+
+    old, new = results['old'], results['new']
+    print(f"\nSpeedup: {old['mean_ms'] / new['mean_ms']:.1f}x, "
+          f"peak RSS change: {new['peak_rss_mb'] - old['peak_rss_mb']:+.1f} MB")
+    if not (old['rss_isolated'] and new['rss_isolated']):
+        print("Note: peak RSS could not be reset after imports on this platform; it includes library load.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark two-resolution face detection against detection on the working frame.
+
+For every photo in --samples-dir, test frames are composed with the face
+region shrunk to several sizes on a 1024px canvas, so small faces are
+covered as well as close-ups. Each frame is run through:
+
+    full:  face detection on the full working frame, crop of the exact box
+           (the path before two-resolution detection)
+    two:   `EmotionDetector.detect_faces` (grayscale copy at
+           FACE_DETECTION_DIMENSION, boxes mapped back, full-resolution retry
+           when nothing is found) and a FACE_CROP_MARGIN-padded crop
+
+and the report shows detection latency, how often the two-resolution path
+finds the full path's face (IoU >= 0.5), and top-1 emotion agreement between
+the two crops.
+
+Usage (from the backend directory):
+    python scripts/benchmark_detection.py --samples-dir data/photos --backend opencv
+    FACE_DETECTION_DIMENSION=240 python scripts/benchmark_detection.py --samples-dir data/photos
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add the backend root to the Python path
+backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_root)
+
+from src.services.emotion_detection import (
+    DETECTION_DIMENSION, MAX_DIMENSION, EmotionDetector, crop_face, face_crop
+)
+
+# Face box width as a fraction of the canvas width
+FACE_SCALES = (0.5, 0.25, 0.12, 0.06)
+
+
+def load_photos(samples_dir: str, limit: int) -> list:
+    paths = sorted(
+        path for pattern in ('*.jpg', '*.jpeg', '*.png')
+        for path in glob.glob(os.path.join(samples_dir, '**', pattern), recursive=True)
+    )[:limit]
+    photos = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is not None:
+            photos.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return photos
+
+
+def compose(photo: np.ndarray, face: dict, face_scale: float) -> np.ndarray:
+    """
+    Paste the photo, scaled so its face box spans `face_scale` of the canvas
+    width, onto the middle of a MAX_DIMENSION x 3/4 MAX_DIMENSION canvas.
+    """
+    width, height = MAX_DIMENSION, MAX_DIMENSION * 3 // 4
+    ratio = face_scale * width / face['w']
+    scaled = cv2.resize(photo, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA if ratio < 1 else cv2.INTER_LINEAR)
+    canvas = np.full((height, width, 3), 127, dtype=np.uint8)
+    # Centre the face on the canvas and clip whatever falls outside
+    offset_x = width // 2 - int((face['x'] + face['w'] / 2) * ratio)
+    offset_y = height // 2 - int((face['y'] + face['h'] / 2) * ratio)
+    src_x0, src_y0 = max(0, -offset_x), max(0, -offset_y)
+    dst_x0, dst_y0 = max(0, offset_x), max(0, offset_y)
+    copy_w = min(scaled.shape[1] - src_x0, width - dst_x0)
+    copy_h = min(scaled.shape[0] - src_y0, height - dst_y0)
+    if copy_w > 0 and copy_h > 0:
+        canvas[dst_y0:dst_y0 + copy_h, dst_x0:dst_x0 + copy_w] = scaled[src_y0:src_y0 + copy_h, src_x0:src_x0 + copy_w]
+    return canvas
+
+
+def iou(a: dict, b: dict) -> float:
+    x0, y0 = max(a['x'], b['x']), max(a['y'], b['y'])
+    x1 = min(a['x'] + a['w'], b['x'] + b['w'])
+    y1 = min(a['y'] + a['h'], b['y'] + b['h'])
+    overlap = max(0, x1 - x0) * max(0, y1 - y0)
+    union = a['w'] * a['h'] + b['w'] * b['h'] - overlap
+    return overlap / union if union else 0.0
+
+
+def best_face(faces: list):
+    confident = [face for face in faces if face['confidence'] > 0]
+    return max(confident, key=lambda face: face['w'] * face['h']) if confident else None
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples-dir', required=True, help='Photos containing at least one face')
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--backend', default='opencv', help='DeepFace detector backend to benchmark')
+    args = parser.parse_args()
+
+    detector = EmotionDetector()
+    detector.registry.load()
+    backends = [args.backend]
+
+    photos = load_photos(args.samples_dir, args.samples)
+    if not photos:
+        sys.exit(f"No readable images in {args.samples_dir}")
+    print(f"{len(photos)} photos, detector '{args.backend}', detection copy {DETECTION_DIMENSION}px\n")
+
+    # Untimed run so model loading is not measured
+    detector.detect_faces(photos[0], backends)
+
+    print(f"{'face width':>11}{'frames':>8}{'full ms':>10}{'two ms':>9}{'speedup':>9}{'found':>8}{'emotion agree':>15}")
+    for face_scale in FACE_SCALES:
+        full_ms, two_ms, found, agree, frames = [], [], 0, 0, 0
+        for photo in photos:
+            source_face = best_face(detector._locate_faces(photo, backends))
+            if source_face is None:
+                continue
+            frame = compose(photo, source_face, face_scale)
+
+            full_faces, elapsed_full = timed(detector._locate_faces, frame, backends)
+            reference = best_face(full_faces)
+            if reference is None:
+                # Not detectable at this size even at full resolution
+                continue
+            two_faces, elapsed_two = timed(detector.detect_faces, frame, backends)
+            frames += 1
+            full_ms.append(elapsed_full)
+            two_ms.append(elapsed_two)
+
+            candidate = best_face(two_faces)
+            if candidate is None or iou(reference, candidate) < 0.5:
+                continue
+            found += 1
+            (full_scores, _), (two_scores, _) = detector.classify_faces(
+                [crop_face(frame, reference), face_crop(frame, candidate)]
+            )
+            if max(full_scores, key=full_scores.get) == max(two_scores, key=two_scores.get):
+                agree += 1
+
+        label = f"{int(face_scale * MAX_DIMENSION)}px"
+        if not frames:
+            print(f"{label:>11}{0:>8}  (no faces detected at full resolution)")
+            continue
+        full_mean, two_mean = sum(full_ms) / frames, sum(two_ms) / frames
+        agreement = f"{agree / found * 100:.1f}%" if found else '-'
+        print(f"{label:>11}{frames:>8}{full_mean:>10.1f}{two_mean:>9.1f}{full_mean / two_mean:>8.1f}x"
+              f"{found / frames * 100:>7.1f}%{agreement:>15}")
+
+
+if __name__ == "__main__":
+    main()
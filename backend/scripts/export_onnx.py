@@ -0,0 +1,223 @@
+"""
+Export the emotion CNNs to ONNX and compare them with the Keras path.
+
+Converts the project's own model (the current `emotion_model` artifact, see
+scripts/model_artifacts.py) and/or the DeepFace emotion head to ONNX,
+optionally writes an int8 statically-quantized variant, and produces an accuracy-parity and latency report for every variant against
+Keras `model.predict`.
+
+Outputs (in --output-dir, default models/onnx, i.e. EMOTION_ONNX_DIR):
+    <model>.onnx, <model>.int8.onnx, <model>.report.json
+
+Calibration and parity use 48x48-ish face crops from --samples-dir (e.g. a
+FER2013 export). Without it, synthetic inputs are used; the report then only
+shows numerical agreement, not accuracy on real faces.
+
+Requires tf2onnx and onnxruntime in addition to the backend requirements.
+
+Usage (from the backend directory):
+    python scripts/export_onnx.py --model deepface_emotion --quantize --samples-dir data/faces
+    EMOTION_INFERENCE_BACKEND=onnx-int8 uvicorn src.main:app
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Add the backend root to the Python path
+backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_root)
+
+from src.ml_models.artifact_store import get_artifact_store
+from src.ml_models.inference_backends import DEFAULT_ONNX_DIR, KerasBackend, OnnxBackend, onnx_model_path
+
+MODELS = ('emotion_model', 'deepface_emotion')
+INPUT_SHAPE = (48, 48, 1)
+
+
+def load_keras_model(model_name: str, keras_path: Optional[str]):
+    if model_name == 'emotion_model':
+        import tensorflow as tf
+        return tf.keras.models.load_model(keras_path or get_artifact_store().resolve(model_name))
+
+    from src.services.model_registry import ModelRegistry
+    registry = ModelRegistry()
+    registry.load()
+    # DeepFace clients wrap the Keras model in a `.model` attribute
+    return getattr(registry.emotion_model, 'model', registry.emotion_model)
+
+
+def load_samples(samples_dir: str, limit: int) -> Tuple[np.ndarray, bool]:
+    """
+    Read face crops as 48x48x1 float32 tensors scaled to 0-1, like the services do.
+
+    Returns:
+        (samples, whether they are synthetic because no readable crops were found)
+    """
+    import cv2
+
+    if samples_dir:
+        paths = sorted(
+            path for pattern in ('*.jpg', '*.jpeg', '*.png')
+            for path in glob.glob(os.path.join(samples_dir, '**', pattern), recursive=True)
+        )[:limit]
+        faces = []
+        for path in paths:
+            gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if gray is not None:
+                faces.append(cv2.resize(gray, INPUT_SHAPE[:2], interpolation=cv2.INTER_AREA))
+        if faces:
+            return (np.stack(faces).astype(np.float32) / 255.0)[..., np.newaxis], False
+        print(f"No readable images in {samples_dir}; using synthetic inputs")
+
+    # Blurred noise: smooth enough to exercise realistic activation ranges
+    rng = np.random.default_rng(0)
+    noise = rng.random((limit,) + INPUT_SHAPE[:2]).astype(np.float32)
+    smooth = np.stack([cv2.GaussianBlur(image, (7, 7), 0) for image in noise])
+    return smooth[..., np.newaxis], True
+
+
+def export_onnx(keras_model, output_path: str, opset: int) -> None:
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = (tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(keras_model, input_signature=signature, opset=opset, output_path=output_path)
+
+
+def quantize_int8(fp32_path: str, int8_path: str, samples: np.ndarray) -> None:
+    """
+    Static int8 quantization (QDQ, per-channel weights) calibrated on the samples.
+    Static rather than dynamic because the model is mostly convolutions.
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(fp32_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class SampleReader(CalibrationDataReader):
+        def __init__(self):
+            self._feeds = iter({input_name: samples[i:i + 1]} for i in range(len(samples)))
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    quantize_static(
+        fp32_path, int8_path, SampleReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QInt8,
+        weight_type=QuantType.QInt8
+    )
+
+
+def measure_latency(backend, samples: np.ndarray, batch_size: int, runs: int) -> dict:
+    batch = samples[:batch_size]
+    if len(batch) < batch_size:
+        batch = np.resize(samples, (batch_size,) + samples.shape[1:])
+    # Untimed run so lazy initialisation is not measured
+    backend.predict(batch)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.predict(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'mean_ms': sum(timings) / len(timings),
+        'p50_ms': timings[len(timings) // 2],
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def compare(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    difference = np.abs(reference - candidate)
+    return {
+        'top1_agreement': float(np.mean(np.argmax(reference, axis=1) == np.argmax(candidate, axis=1))),
+        'max_abs_diff': float(difference.max()),
+        'mean_abs_diff': float(difference.mean()),
+    }
+
+
+def build_report(model_name: str, variants: dict, samples: np.ndarray, runs: int, synthetic: bool) -> dict:
+    reference = variants['keras'].predict(samples)
+    report = {'model': model_name, 'samples': len(samples), 'synthetic_samples': synthetic, 'variants': {}}
+    for name, backend in variants.items():
+        entry = {
+            'latency_batch_1': measure_latency(backend, samples, 1, runs),
+            'latency_batch_8': measure_latency(backend, samples, 8, runs),
+        }
+        if name != 'keras':
+            entry['parity'] = compare(reference, backend.predict(samples))
+            entry['size_mb'] = os.path.getsize(backend.model_path) / (1024 * 1024)
+        report['variants'][name] = entry
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{report['model']} ({report['samples']} "
+          f"{'synthetic' if report['synthetic_samples'] else 'real'} samples)")
+    print(f"{'variant':<11}{'b1 mean ms':>12}{'b1 p95 ms':>11}{'b8 mean ms':>12}{'top-1 agree':>13}{'max |diff|':>12}")
+    keras_mean = report['variants']['keras']['latency_batch_1']['mean_ms']
+    for name, entry in report['variants'].items():
+        parity = entry.get('parity')
+        agreement = f"{parity['top1_agreement'] * 100:.1f}%" if parity else '-'
+        max_diff = f"{parity['max_abs_diff']:.4f}" if parity else '-'
+        print(f"{name:<11}{entry['latency_batch_1']['mean_ms']:>12.2f}{entry['latency_batch_1']['p95_ms']:>11.2f}"
+              f"{entry['latency_batch_8']['mean_ms']:>12.2f}{agreement:>13}{max_diff:>12}")
+    for name, entry in report['variants'].items():
+        if name != 'keras':
+            print(f"{name} speedup at batch 1: {keras_mean / entry['latency_batch_1']['mean_ms']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', choices=MODELS + ('all',), default='all')
+    parser.add_argument('--keras-path', help='Project model file (default: current artifact)')
+    parser.add_argument('--output-dir', default=os.getenv('EMOTION_ONNX_DIR', DEFAULT_ONNX_DIR))
+    parser.add_argument('--quantize', action='store_true', help='Also write an int8 variant')
+    parser.add_argument('--samples-dir', help='Face crops for calibration and parity')
+    parser.add_argument('--samples', type=int, default=256)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--opset', type=int, default=13)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    samples, synthetic = load_samples(args.samples_dir, args.samples)
+    model_names = MODELS if args.model == 'all' else (args.model,)
+
+    for model_name in model_names:
+        try:
+            keras_model = load_keras_model(model_name, args.keras_path)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {model_name}: {e}")
+            continue
+        variants = {'keras': KerasBackend(keras_model)}
+
+        fp32_path = onnx_model_path(model_name, onnx_dir=args.output_dir)
+        export_onnx(keras_model, fp32_path, args.opset)
+        variants['onnx'] = OnnxBackend(fp32_path)
+        print(f"Wrote {fp32_path}")
+
+        if args.quantize:
+            int8_path = onnx_model_path(model_name, quantized=True, onnx_dir=args.output_dir)
+            quantize_int8(fp32_path, int8_path, samples)
+            variants['onnx-int8'] = OnnxBackend(int8_path)
+            print(f"Wrote {int8_path}")
+
+        report = build_report(model_name, variants, samples, args.runs, synthetic)
+        report_path = os.path.join(args.output_dir, f"{model_name}.report.json")
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print_report(report)
+        print(f"Report: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
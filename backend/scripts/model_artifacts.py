@@ -0,0 +1,114 @@
+"""
+Manage versioned model artifacts and check cold-start time.
+
+Commands:
+    publish NAME PATH [--version V] [--no-current]
+        Copy a trained model file into the store (MODEL_ARTIFACT_DIR, default
+        models) as a new checksummed version.
+    bootstrap
+        Publish the shipped emotion_model.h5 as the first version of
+        emotion_model (fails if it is missing; never publishes a placeholder).
+        Runs automatically on first load, and in the Docker build.
+    list NAME
+        Show the manifest of a model.
+    cold-start [--budget SECONDS]
+        In a fresh interpreter, time importing the emotion modules and loading
+        the current models. Exits non-zero when the total exceeds the budget.
+
+Usage (from the backend directory):
+    python scripts/model_artifacts.py publish emotion_model ~/trained/emotion_model.h5
+    python scripts/model_artifacts.py cold-start --budget 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Add the backend root to the Python path
+backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_root)
+
+from src.ml_models.artifact_store import get_artifact_store
+
+
+def measure_cold_start() -> dict:
+    """
+    Runs inside the fresh child interpreter.
+    """
+    timings = {}
+    start = time.perf_counter()
+    from src.ml_models import emotion_classifier
+    timings['import_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        emotion_classifier.warm_up()
+        timings['load_seconds'] = time.perf_counter() - start
+    except ValueError as e:
+        timings['load_seconds'] = None
+        timings['load_error'] = str(e)
+
+    timings['total_seconds'] = timings['import_seconds'] + (timings['load_seconds'] or 0.0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    publish = commands.add_parser('publish')
+    publish.add_argument('name')
+    publish.add_argument('path')
+    publish.add_argument('--version')
+    publish.add_argument('--no-current', action='store_true')
+
+    commands.add_parser('bootstrap')
+
+    listing = commands.add_parser('list')
+    listing.add_argument('name')
+
+    cold_start = commands.add_parser('cold-start')
+    cold_start.add_argument('--budget', type=float, default=float(os.getenv('COLD_START_BUDGET_SECONDS', 60)))
+    cold_start.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    store = get_artifact_store()
+
+    if args.command == 'publish':
+        entry = store.publish(args.name, args.path, version=args.version, make_current=not args.no_current)
+        print(json.dumps(entry, indent=2))
+
+    elif args.command == 'bootstrap':
+        name = 'emotion_model'
+        if store.manifest(name)['current'] is None and store.import_legacy(name) is None:
+            sys.exit(f"Nothing to bootstrap: {store.legacy_artifacts[name]} not found")
+        print(json.dumps(store.manifest(name), indent=2))
+
+    elif args.command == 'list':
+        print(json.dumps(store.manifest(args.name), indent=2))
+
+    elif args.child:
+        print(json.dumps(measure_cold_start()))
+
+    else:
+        output = subprocess.run(
+            [sys.executable, __file__, 'cold-start', '--child'],
+            check=True, capture_output=True, text=True, cwd=os.getcwd()
+        ).stdout
+        # TensorFlow may log to stdout; the result is the last line
+        timings = json.loads(output.strip().splitlines()[-1])
+        print(f"import: {timings['import_seconds']:.2f}s")
+        if timings['load_seconds'] is None:
+            print(f"load:   failed ({timings['load_error']})")
+        else:
+            print(f"load:   {timings['load_seconds']:.2f}s")
+        print(f"total:  {timings['total_seconds']:.2f}s (budget {args.budget:.0f}s)")
+        if timings['load_seconds'] is None or timings['total_seconds'] > args.budget:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
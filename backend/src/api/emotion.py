@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from starlette.formparsers import MultiPartParser
 from pydantic import BaseModel
 import numpy as np
 import base64
 import cv2
-from src.services.emotion_detection import EmotionDetector, decode_image
-from src.services.spotify_service import fetch_random_tracks, fetch_mood_playlists, get_supported_languages as get_spotify_languages, SpotifyTrack, SpotifyPlaylist, get_spotify_client
+from src.services.emotion_detection import analyze_image, analyze_group_image
+from src.services.degradation import QualityTier, get_degradation_controller
+from src.services.admission import AdmissionRejected, ImageTooLarge, admit_image
+from src.services.model_registry import get_configured_backends
+from src.services.emotion_stream import EmotionStreamSession
+from src.services.spotify_service import fetch_random_tracks, fetch_mood_playlists, get_supported_languages as get_spotify_languages, SpotifyTrack, SpotifyPlaylist, get_async_spotify_client
+import asyncio
 import logging
+import os
+import time
 import traceback
 
 logger = logging.getLogger(__name__)
@@ -13,11 +21,22 @@ logger = logging.getLogger(__name__)
 # Router for emotion-related endpoints
 emotion_router = APIRouter()
 
+# Largest accepted binary upload, and the read size used while streaming it
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv('MAX_IMAGE_UPLOAD_BYTES', 10 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Allowance for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Most recent live playlist results per (mood, language), served without
+# Spotify calls when the quality tier only allows cached playlists
+_recent_playlists: dict[tuple[str, str | None], tuple[list, list | None]] = {}
+
 # Pydantic model for image input
 class EmotionDetectionRequest(BaseModel):
     image: str  # base64 encoded image
     language: str | None = None  # Optional language preference
     include_playlists: bool = False  # Optional flag to include playlist recommendations
+    group: bool = False  # Analyse every face and recommend for the group's aggregate mood
 
 # Pydantic model for artist response
 class ArtistResponse(BaseModel):
@@ -42,6 +61,14 @@ class PlaylistResponse(BaseModel):
     external_url: str
     tracks: list[TrackResponse]
 
+# Pydantic model for one face in group mode
+class FaceEmotionResponse(BaseModel):
+    emotion: str
+    confidence: float
+    emotion_scores: dict[str, float]
+    face_region: dict[str, float]
+    tier: str | None = None
+
 # Pydantic model for emotion detection response
 class EmotionDetectionResponse(BaseModel):
     emotion: str
@@ -49,6 +76,16 @@ class EmotionDetectionResponse(BaseModel):
     emotion_scores: dict[str, float]
     playlist: list[TrackResponse]
     recommended_playlists: list[PlaylistResponse] | None = None
+    # Load-adaptive quality tier the request was served at (see services/degradation.py)
+    quality_tier: str | None = None
+    # Cascade tier that answered: 'fast' (own CNN) or 'deepface'; None for fallbacks
+    tier: str | None = None
+    # Group mode only: per-face results; the top-level emotion is the aggregate
+    faces: list[FaceEmotionResponse] | None = None
+    face_count: int | None = None
+    # Why no inference ran ('too_dark', 'too_bright', 'low_contrast', 'blurry',
+    # 'no_face'); the emotion is then the neutral fallback and the client should re-capture
+    quality_issue: str | None = None
 
 # Helper function to convert SpotifyTrack to TrackResponse
 def convert_to_track_response(track: SpotifyTrack) -> TrackResponse:
@@ -89,6 +126,62 @@ def convert_to_playlist_response(playlist: SpotifyPlaylist) -> PlaylistResponse:
         tracks=[]  # Playlists returned by search don't include tracks by default
     )
 
+async def read_image_upload(request: Request, max_bytes: int | None = None) -> bytes:
+    """
+    Read the image bytes of a binary upload, enforcing a size limit while reading.
+
+    Args:
+        request (Request): Multipart or raw-body request
+        max_bytes (int | None): Byte limit; defaults to MAX_IMAGE_UPLOAD_BYTES
+
+    Returns:
+        bytes: Encoded image file contents
+
+    Raises:
+        HTTPException: 413 if the upload exceeds the limit, 400 if it is empty
+    """
+    limit = max_bytes or MAX_IMAGE_UPLOAD_BYTES
+
+    # Reject early when the client announces an oversized body
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Image exceeds the {limit} byte limit")
+
+    async def limited_body(body_limit: int):
+        # Counts the body as it arrives, so a chunked upload without
+        # Content-Length is cut off before it is spooled in full
+        body_received = 0
+        async for chunk in request.stream():
+            body_received += len(chunk)
+            if body_received > body_limit:
+                raise HTTPException(status_code=413, detail=f"Image exceeds the {limit} byte limit")
+            yield chunk
+
+    chunks = []
+    received = 0
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('multipart/form-data'):
+        form = await MultiPartParser(request.headers, limited_body(limit + MULTIPART_OVERHEAD_BYTES)).parse()
+        upload = form.get('image') or form.get('file')
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing 'image' file field")
+        try:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"Image exceeds the {limit} byte limit")
+                chunks.append(chunk)
+        finally:
+            await upload.close()
+    else:
+        async for chunk in limited_body(limit):
+            received += len(chunk)
+            chunks.append(chunk)
+
+    if not received:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    return b''.join(chunks)
+
 def validate_language(language: str | None) -> str | None:
     """
     Validate and normalize language input.
@@ -135,43 +228,73 @@ def validate_language(language: str | None) -> str | None:
         logger.error(f"Error validating language: {str(e)}")
         return None
 
-@emotion_router.post("/detect", response_model=EmotionDetectionResponse)
-async def detect_emotion_endpoint(request: EmotionDetectionRequest):
+async def run_emotion_detection(
+    image: str | bytes,
+    language: str | None = None,
+    include_playlists: bool = False,
+    group: bool = False
+) -> EmotionDetectionResponse:
     """
-    Detect emotion from base64 encoded image and optionally return playlist recommendations.
+    Detect emotion from an image and optionally attach playlist recommendations.
+    Shared by the JSON and binary upload variants of the detect endpoint.
 
     Args:
-        request (EmotionDetectionRequest): Request containing base64 encoded image and options
+        image (str | bytes): Base64 encoded image, or raw JPEG/PNG bytes
+        language (str | None): Optional language preference
+        include_playlists (bool): Whether to fetch playlist recommendations
+        group (bool): Analyse every face; playlists follow the confidence-weighted
+            aggregate mood and per-face results are returned under `faces`
 
     Returns:
         EmotionDetectionResponse: Detected emotion and optional playlist recommendations
     """
+    # Under load the controller trades quality for latency; see QUALITY_TIERS
+    controller = get_degradation_controller()
+    quality = controller.current()
+    try:
+        # Raises AdmissionRejected (503 + Retry-After) when at capacity
+        async with admit_image(image, quality.max_dimension):
+            started = time.perf_counter()
+            try:
+                return await _run_emotion_detection(image, language, include_playlists, group, quality)
+            finally:
+                controller.record_latency((time.perf_counter() - started) * 1000)
+    except ValueError as e:
+        logger.warning(f"Rejected image before decoding: {e}")
+        raise HTTPException(status_code=413 if isinstance(e, ImageTooLarge) else 400, detail=str(e))
+
+async def _run_emotion_detection(
+    image: str | bytes,
+    language: str | None,
+    include_playlists: bool,
+    group: bool,
+    quality: QualityTier
+) -> EmotionDetectionResponse:
     try:
-        logger.info("Starting emotion detection request")
+        logger.info(f"Starting emotion detection request (quality tier: {quality.name})")
 
         # Validate language
-        language = validate_language(request.language)
+        language = validate_language(language)
         logger.info(f"Validated language: {language}")
 
         try:
-            # Decode base64 image
-            logger.info("Decoding image")
+            # Decode and detect emotion off the event loop; concurrent requests
+            # are micro-batched into a single emotion model forward pass
+            logger.info("Starting emotion detection")
             try:
-                image_array = decode_image(request.image)
+                # Without the detector fallback only the first (fastest) backend runs
+                detector_backends = None if quality.detector_fallback else get_configured_backends()[:1]
+                if group:
+                    emotion_result = await analyze_group_image(image, quality.max_dimension, detector_backends)
+                else:
+                    emotion_result = await analyze_image(image, quality.max_dimension, detector_backends)
             except ValueError as e:
                 logger.error(f"Image decoding failed: {e}")
                 raise HTTPException(
-                    status_code=400,
+                    status_code=413 if isinstance(e, ImageTooLarge) else 400,
                     detail=f"Failed to decode image: {str(e)}"
                 )
 
-            # Initialize emotion detector
-            detector = EmotionDetector()
-
-            # Detect emotion using the detector
-            logger.info("Starting emotion detection")
-            emotion_result = detector.detect_emotion(image_array)
-
             # We should always have a result now with our fallback mechanism
             if not emotion_result:
                 logger.warning("Emotion detection returned None despite fallback, using default neutral")
@@ -201,11 +324,19 @@ async def detect_emotion_endpoint(request: EmotionDetectionRequest):
             playlist = []
             recommended_playlists = None
 
-            if request.include_playlists:
+            quality_issue = emotion_result.get('quality_issue')
+            if include_playlists and quality_issue:
+                logger.info(f"Skipping playlists for unusable frame: {quality_issue}")
+            elif include_playlists and quality.playlists == 'none':
+                logger.info(f"Skipping playlists at quality tier {quality.name}")
+            elif include_playlists and quality.playlists == 'cache':
+                playlist, recommended_playlists = _recent_playlists.get((mapped_emotion, language), ([], None))
+                logger.info(f"Serving {len(playlist)} cached tracks at quality tier {quality.name}")
+            elif include_playlists:
                 logger.info(f"Attempting to get playlist recommendations for mood: {mapped_emotion}")
                 try:
                     # First check if Spotify is available
-                    spotify = get_spotify_client()
+                    spotify = get_async_spotify_client()
                     if spotify:
                         logger.info("Successfully got Spotify client")
                         # Get tracks for detected emotion
@@ -227,6 +358,7 @@ async def detect_emotion_endpoint(request: EmotionDetectionRequest):
                         # Convert SpotifyPlaylist to PlaylistResponse
                         recommended_playlists = [convert_to_playlist_response(pl) for pl in recommended_spotify_playlists]
                         logger.info(f"Got {len(recommended_playlists)} recommended playlists")
+                        _recent_playlists[(mapped_emotion, language)] = (playlist, recommended_playlists)
                     else:
                         logger.warning("Spotify client is not available, skipping playlist recommendations")
                 except Exception as e:
@@ -254,7 +386,12 @@ async def detect_emotion_endpoint(request: EmotionDetectionRequest):
                 confidence=emotion_result['confidence'],
                 emotion_scores=emotion_result['emotion_scores'],
                 playlist=track_responses,
-                recommended_playlists=recommended_playlists
+                recommended_playlists=recommended_playlists,
+                quality_tier=quality.name,
+                tier=emotion_result.get('tier'),
+                faces=emotion_result.get('faces'),
+                face_count=emotion_result.get('face_count'),
+                quality_issue=quality_issue
             )
 
         except HTTPException:
@@ -272,7 +409,8 @@ async def detect_emotion_endpoint(request: EmotionDetectionRequest):
                     'neutral': 0.6
                 },
                 playlist=[],
-                recommended_playlists=None
+                recommended_playlists=None,
+                quality_tier=quality.name
             )
             return neutral_response
 
@@ -283,6 +421,157 @@ async def detect_emotion_endpoint(request: EmotionDetectionRequest):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@emotion_router.post("/detect", response_model=EmotionDetectionResponse)
+async def detect_emotion_endpoint(request: EmotionDetectionRequest):
+    """
+    Detect emotion from base64 encoded image and optionally return playlist recommendations.
+
+    Args:
+        request (EmotionDetectionRequest): Request containing base64 encoded image and options
+
+    Returns:
+        EmotionDetectionResponse: Detected emotion and optional playlist recommendations
+    """
+    return await run_emotion_detection(request.image, request.language, request.include_playlists, request.group)
+
+@emotion_router.post("/detect/upload", response_model=EmotionDetectionResponse)
+async def detect_emotion_upload_endpoint(
+    request: Request,
+    language: str | None = None,
+    include_playlists: bool = False,
+    group: bool = False
+):
+    """
+    Detect emotion from a binary image upload, skipping base64 and JSON parsing.
+
+    Accepts either `multipart/form-data` with the image in an `image` (or `file`)
+    field, or the raw JPEG/PNG bytes as the body (`application/octet-stream` or
+    `image/*`). Options are passed as query parameters.
+
+    Args:
+        request (Request): Incoming request carrying the image bytes
+        language (str | None): Optional language preference
+        include_playlists (bool): Whether to fetch playlist recommendations
+        group (bool): Analyse every face and use the group's aggregate mood
+
+    Returns:
+        EmotionDetectionResponse: Same response as /detect
+    """
+    image_bytes = await read_image_upload(request)
+    return await run_emotion_detection(image_bytes, language, include_playlists, group)
+
+@emotion_router.websocket("/stream")
+async def emotion_stream_endpoint(
+    websocket: WebSocket,
+    language: str | None = None,
+    include_playlists: bool = False
+):
+    """
+    Stream webcam frames over a WebSocket and receive smoothed emotion updates.
+
+    The client sends each frame as a binary JPEG/PNG message. The server replies
+    with `{"type": "emotion", ...}` messages carrying exponentially smoothed
+    `emotion_scores`, and, when `include_playlists` is set, a
+    `{"type": "playlist", ...}` message whenever the smoothed mood changes.
+    Frames that arrive while inference is busy replace the pending frame, and
+    frames nearly identical to the last analysed one are skipped. Frames too
+    dark, bright, flat or blurry to analyse get a `{"type": "quality", ...}`
+    message with the `quality_issue` so the client can prompt a re-capture.
+    Each frame passes admission control and runs at the current degradation
+    tier like a `/detect` request; a frame rejected at capacity gets a
+    `{"type": "busy", "retry_after": seconds}` message and the client should
+    slow down.
+
+    Args:
+        websocket (WebSocket): Client connection
+        language (str | None): Optional language preference for playlists
+        include_playlists (bool): Push a playlist on every mood change
+    """
+    await websocket.accept()
+    language = validate_language(language)
+    session = EmotionStreamSession()
+    pending: dict[str, bytes | None] = {'frame': None}
+    frame_ready = asyncio.Event()
+    playlist_tasks: set[asyncio.Task] = set()
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            data = message.get('bytes')
+            if not data:
+                continue
+            if len(data) > MAX_IMAGE_UPLOAD_BYTES:
+                await websocket.send_json({'type': 'error', 'detail': f"Frame exceeds the {MAX_IMAGE_UPLOAD_BYTES} byte limit"})
+                continue
+            # Keep only the newest frame; an unprocessed older one is dropped
+            session.frame_received(replaced_pending=pending['frame'] is not None)
+            pending['frame'] = data
+            frame_ready.set()
+
+    async def send_playlist(mood: str, quality: QualityTier):
+        try:
+            if quality.playlists == 'none':
+                return
+            if quality.playlists == 'cache':
+                tracks = _recent_playlists.get((mood, language), ([], None))[0]
+            else:
+                tracks = await fetch_random_tracks(mood=mood, limit=10, language=language)
+            await websocket.send_json({
+                'type': 'playlist',
+                'emotion': mood,
+                'playlist': [track._asdict() for track in tracks]
+            })
+        except Exception as e:
+            logger.error(f"Error sending stream playlist: {e}")
+
+    async def analyze_frames():
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            data, pending['frame'] = pending['frame'], None
+            if data is None:
+                continue
+            controller = get_degradation_controller()
+            quality = controller.current()
+            try:
+                async with admit_image(data, quality.max_dimension):
+                    started = time.perf_counter()
+                    try:
+                        update = await session.process(data, quality)
+                    finally:
+                        controller.record_latency((time.perf_counter() - started) * 1000)
+            except AdmissionRejected as e:
+                await websocket.send_json({'type': 'busy', 'detail': e.reason, 'retry_after': e.retry_after})
+                continue
+            except ValueError as e:
+                await websocket.send_json({'type': 'error', 'detail': f"Failed to decode frame: {str(e)}"})
+                continue
+            if update is None:
+                continue
+            await websocket.send_json(update)
+            if include_playlists and update.get('mood_changed'):
+                task = asyncio.create_task(send_playlist(update['emotion'], quality))
+                playlist_tasks.add(task)
+                task.add_done_callback(playlist_tasks.discard)
+
+    receiver = asyncio.create_task(receive_frames())
+    analyzer = asyncio.create_task(analyze_frames())
+    try:
+        done, _ = await asyncio.wait({receiver, analyzer}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Emotion stream failed: {e}")
+        logger.error(traceback.format_exc())
+    finally:
+        for task in (receiver, analyzer, *playlist_tasks):
+            task.cancel()
+        logger.info(f"Emotion stream closed: {session.stats()}")
+
 @emotion_router.get("/languages")
 async def get_supported_languages_endpoint():
     """
@@ -5,7 +5,8 @@ import logging
 import traceback
 import numpy as np
 
-from ..services.emotion_detection import EmotionDetector, get_supported_emotions
+from ..services.emotion_detection import get_emotion_detector, get_supported_emotions, analyze_image
+from ..services.admission import AdmissionRejected, ImageTooLarge, admit_image
 from ..services.text_sentiment import TextSentimentAnalyzer
 from ..services.spotify_service import fetch_random_tracks, validate_language, SpotifyTrack
 
@@ -60,11 +61,12 @@ def randomize_mood(detected_mood: str, confidence: float) -> str:
 @mood_router.post("/detect", response_model=MoodDetectionResponse)
 async def detect_emotion(request: EmotionRequest):
     try:
-        # Initialize emotion detector
-        detector = EmotionDetector()
-        
-        # Detect emotion from image
-        emotion_result = detector.detect_emotion(request.image)
+        # Decode and detect emotion off the event loop, within the admission budget
+        try:
+            async with admit_image(request.image):
+                emotion_result = await analyze_image(request.image)
+        except ValueError as e:
+            raise HTTPException(status_code=413 if isinstance(e, ImageTooLarge) else 400, detail=f"Failed to decode image: {str(e)}")
         
         if not emotion_result:
             raise HTTPException(status_code=400, detail="No emotion detected in the image")
@@ -86,6 +88,8 @@ async def detect_emotion(request: EmotionRequest):
             "playlist": recommendations
         }
         
+    except (HTTPException, AdmissionRejected):
+        raise
     except Exception as e:
         logger.error(f"Error detecting emotion: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -191,7 +195,7 @@ def capture_webcam_image(timeout: int = 5) -> np.ndarray:
             if ret:
                 # Validate the captured image
                 try:
-                    result = EmotionDetector().detect_emotion(frame)
+                    result = get_emotion_detector().detect_emotion(frame)
                     logger.debug("Successfully captured webcam image")
                     return frame
                 except ValueError as val_error:
@@ -218,7 +222,7 @@ async def detect_mood_from_webcam():
         image_np = capture_webcam_image()
         
         # Detect emotion
-        emotion_result = EmotionDetector().detect_emotion(image_np)
+        emotion_result = get_emotion_detector().detect_emotion(image_np)
         
         if not emotion_result:
             raise HTTPException(status_code=400, detail="No emotion detected in the image")
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
+import asyncio
 from pydantic import BaseModel
 from ..services.recommender import MoodRecommender
 from ..ml_models.mood_classifier import MoodClassifier
@@ -20,7 +21,7 @@ async def get_mood_recommendations(
 ):
     """Get song recommendations based on mood"""
     try:
-        recommendations = recommender.get_recommendations_by_mood(mood, limit)
+        recommendations = await asyncio.to_thread(recommender.get_recommendations_by_mood, mood, limit)
         return {
             'status': 'success',
             'recommendations': recommendations
@@ -36,7 +37,7 @@ async def get_similar_songs(
 ):
     """Get similar songs based on a track ID"""
     try:
-        similar_songs = recommender.get_similar_songs(track_id, limit)
+        similar_songs = await asyncio.to_thread(recommender.get_similar_songs, track_id, limit)
         return {
             'status': 'success',
             'similar_songs': similar_songs
@@ -49,7 +50,7 @@ async def get_similar_songs(
 async def analyze_track(track: TrackAnalysis):
     """Analyze a track's mood based on its audio features"""
     try:
-        features = recommender.get_audio_features(track.track_id)
+        features = await asyncio.to_thread(recommender.get_audio_features, track.track_id)
         if not features:
             raise HTTPException(
                 status_code=404,
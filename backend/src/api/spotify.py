@@ -6,7 +6,8 @@ from ..services.spotify_service import (
     generate_mood_playlist, 
     search_tracks,
     fetch_random_tracks,
-    get_spotify_client
+    fetch_tracks_by_ids,
+    MAX_TRACK_IDS
 )
 from ..services.schemas import SpotifyTrack
 
@@ -37,8 +38,7 @@ async def search_spotify_tracks(
     Search Spotify tracks with optional mood filtering
     """
     try:
-        # Note: search_tracks is synchronous, but we can call it in an async endpoint
-        tracks = search_tracks(query, limit, language=language)
+        tracks = await search_tracks(query, limit, language=language)
         return tracks
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Track search error: {str(e)}")
@@ -52,7 +52,7 @@ async def get_random_tracks(
     Fetch random Spotify tracks based on mood
     """
     try:
-        tracks = fetch_random_tracks(mood, limit)
+        tracks = await fetch_random_tracks(mood, limit)
         return tracks
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Random tracks error: {str(e)}")
@@ -61,33 +61,12 @@ async def get_random_tracks(
 async def get_tracks_by_ids(ids: str):
     """
     Fetch track details for a comma-separated list of Spotify track IDs.
+    Tracks seen recently are served from the local metadata store.
     """
+    id_list = [tid.strip() for tid in ids.split(',') if tid.strip()]
+    if len(id_list) > MAX_TRACK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TRACK_IDS} track IDs per request")
     try:
-        client = get_spotify_client()
-        if not client:
-            raise HTTPException(status_code=500, detail="Spotify client not available")
-        id_list = [tid.strip() for tid in ids.split(',') if tid.strip()]
-        results = client.tracks(id_list)
-        tracks: List[SpotifyTrack] = []
-        for item in results.get('tracks', []):
-            album_art_url = None
-            images = item.get('album', {}).get('images', [])
-            if images:
-                album_art_url = images[0]['url']
-            track = SpotifyTrack(
-                id=item['id'],
-                name=item['name'],
-                artist=item['artists'][0]['name'] if item['artists'] else "Unknown",
-                album_name=item.get('album', {}).get('name'),
-                album_art_url=album_art_url,
-                preview_url=item.get('preview_url'),
-                external_url=item.get('external_urls', {}).get('spotify'),
-                uri=item['uri'],
-                mood='unknown'
-            )
-            tracks.append(track)
-        return tracks
-    except HTTPException:
-        raise
+        return [SpotifyTrack(**track._asdict()) for track in await fetch_tracks_by_ids(id_list)]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Tracks fetch error: {str(e)}")
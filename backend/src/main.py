@@ -10,13 +10,24 @@ load_dotenv()
 
 import uvicorn
 import logging
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from src.api.mood import mood_router
 from src.api.spotify import spotify_router
-from src.api.emotion import emotion_router
+from src.api.emotion import emotion_router, MAX_IMAGE_UPLOAD_BYTES
 from src.api.music import music_router
+from src.services.model_registry import get_model_registry
+from src.services.emotion_detection import get_emotion_scheduler
+from src.services.inference_pool import get_inference_pool
+from src.services.metrics import metrics
+from src.services.admission import AdmissionRejected
+from src.services.spotify_client import get_spotify_manager
+from src.services.candidate_pool import get_candidate_pools
 
 # Configure logging
 logging.basicConfig(
@@ -28,12 +39,109 @@ logging.basicConfig(
     ]
 )
 
+logger = logging.getLogger(__name__)
+
+# Reference point for cold-start reporting: module import until models are warm
+STARTED_AT = time.perf_counter()
+
+def report_cold_start() -> float:
+    """
+    Record the time from app import to warm models and check it against
+    COLD_START_BUDGET_SECONDS (default 60).
+    """
+    cold_start = time.perf_counter() - STARTED_AT
+    metrics.set_gauge('cold_start.seconds', cold_start)
+    budget = float(os.getenv('COLD_START_BUDGET_SECONDS', 60))
+    if cold_start > budget:
+        logger.warning(f"Cold start took {cold_start:.1f}s, over the {budget:.0f}s budget")
+    else:
+        logger.info(f"Cold start took {cold_start:.1f}s (budget {budget:.0f}s)")
+    return cold_start
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load and warm up the emotion models once per worker process.
+    Warm-up runs in a background thread so liveness probes are answered
+    immediately while readiness stays false until the models are warm.
+    When the inference pool is enabled the models live in the pool workers,
+    so the pool is warmed up instead of an in-process registry.
+    Cold-start time is reported once warm-up completes. A failed warm-up is
+    logged and reported by the readiness probe instead of being lost with the
+    background task.
+    The Spotify health probe and the candidate-pool refill loop run for the
+    lifetime of the worker.
+    """
+    pool = get_inference_pool()
+    registry = get_model_registry()
+    app.state.model_registry = registry
+    app.state.inference_pool = pool
+    warm_up = pool.warm_up if pool.enabled else registry.warm_up
+    app.state.cold_start_seconds = None
+    app.state.warmup_error = None
+
+    def warm_up_and_report():
+        warm_up()
+        app.state.cold_start_seconds = report_cold_start()
+
+    def warm_up_done(task: asyncio.Task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.exception("Model warm-up failed", exc_info=error)
+            app.state.warmup_error = f"{type(error).__name__}: {error}"
+            metrics.inc('warmup.failures')
+
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up_and_report))
+    warmup_task.add_done_callback(warm_up_done)
+    spotify_probe_task = asyncio.create_task(get_spotify_manager().run_health_probe())
+    candidate_pool_task = asyncio.create_task(get_candidate_pools().run_maintenance())
+    try:
+        yield
+    finally:
+        if not warmup_task.done():
+            warmup_task.cancel()
+        spotify_probe_task.cancel()
+        candidate_pool_task.cancel()
+        await get_spotify_manager().aclose()
+        await get_emotion_scheduler().stop()
+        pool.shutdown()
+
 app = FastAPI(
     title="Moodify",
     description="Personalized Music Recommendation Platform",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
+# JSON image endpoints parse the whole body before any handler runs, so their
+# size limit (the upload limit plus base64 overhead) is enforced from
+# Content-Length before the body is read. Registered before CORS so CORS stays
+# the outermost middleware and the 413 still carries CORS headers.
+IMAGE_JSON_PATHS = {"/api/emotion/detect", "/api/mood/detect"}
+MAX_IMAGE_JSON_BYTES = MAX_IMAGE_UPLOAD_BYTES * 4 // 3 + 64 * 1024
+
+@app.middleware("http")
+async def limit_image_request_size(request, call_next):
+    if request.url.path in IMAGE_JSON_PATHS:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_IMAGE_JSON_BYTES:
+            metrics.inc('admission.rejected.payload_too_large')
+            return JSONResponse(status_code=413, content={"detail": f"Image payload exceeds {MAX_IMAGE_JSON_BYTES} bytes"})
+    return await call_next(request)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    """
+    Shed load quickly: 503 with Retry-After instead of queueing without bound.
+    """
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is at capacity, retry later", "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # CORS Middleware
 frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 app.add_middleware(
@@ -57,6 +165,48 @@ async def root():
         "status": "🎵 Listening to your mood 🎧"
     }
 
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe: 503 until the emotion models have been warmed up, with
+    the error if warm-up failed.
+    """
+    pool = get_inference_pool()
+    status = get_model_registry().status()
+    status['inference_pool'] = pool.status()
+    status['cold_start_seconds'] = getattr(app.state, 'cold_start_seconds', None)
+    status['warmup_error'] = getattr(app.state, 'warmup_error', None)
+    # Informational only: without Spotify the endpoints serve mock playlists
+    status['spotify'] = get_spotify_manager().status()
+    status['candidate_pools'] = get_candidate_pools().status()
+    ready = pool.ready if pool.enabled else status['ready']
+    if status['warmup_error'] is not None:
+        return JSONResponse(status_code=503, content={"status": "warmup_failed", **status})
+    if not ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up", **status})
+    return {"status": "ready", **status}
+
+@app.get("/health/models")
+async def model_residency():
+    """
+    Loaded detector and emotion backends with their resident memory, for this
+    process and each inference pool worker.
+    """
+    pool = get_inference_pool()
+    workers = await pool.residency() if pool.enabled and pool.ready else []
+    return {"process": get_model_registry().residency.status(), "workers": workers}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    In-process counters, gauges and latency histograms for this worker.
+    """
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app", 
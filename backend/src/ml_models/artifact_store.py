@@ -0,0 +1,292 @@
+"""
+Model Artifact Store
+
+Versioned, checksummed storage for trained model files, plus lazy loading so
+importing a model module never trains, downloads or deserializes anything.
+
+Layout (root is MODEL_ARTIFACT_DIR, default `backend/models`):
+    models/<name>/manifest.json
+    models/<name>/<version>/<file>
+
+Key Architectural Decisions:
+1. Immutable Versions: `publish` copies a file into a new version directory and
+   records its SHA-256 in the manifest; the manifest's `current` pointer is the
+   only thing that changes. Rolling back is pointing `current` at an older
+   version, and every worker process loads exactly the same bytes.
+2. Verified Loads: `resolve` re-hashes the file before handing out its path and
+   raises ValueError on a mismatch, so a truncated copy or a hand-edited file
+   is caught at load time instead of producing silent garbage predictions. A
+   file is hashed once per process unless its size or mtime changes.
+3. Shipped Model Migration: `emotion_model.h5`, committed before the store
+   existed, is published as version v1 the first time the model is resolved
+   with nothing published (or by `scripts/model_artifacts.py bootstrap`), so
+   a fresh checkout or image serves the trained model without a manual step.
+   Every uvicorn worker and pool process may try this at once, so manifest
+   updates hold a per-model file lock and all writes go through unique temp
+   files renamed into place.
+4. Lazy Models: `LazyModel` loads on first use or on an explicit `warm_up()`
+   (the FastAPI lifespan path), never at import, and records how long the load
+   took so cold start can be tracked against a budget.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..services.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.lock'
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Model files shipped in the repository, imported as the first published version
+LEGACY_ARTIFACTS = {
+    'emotion_model': os.path.join(BACKEND_ROOT, 'emotion_model.h5'),
+}
+
+
+@contextmanager
+def _replacing(path: str, mode: str = 'w'):
+    """
+    Open a uniquely named temp file next to `path` and rename it over `path`
+    when the block completes, so readers never see a partial file and
+    concurrent writers never share a temp file.
+    """
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        # mkstemp creates the file owner-only; store files are world-readable
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelArtifactStore:
+    """
+    Versioned model files with SHA-256 checksums.
+
+    Args:
+        root: Store directory (env MODEL_ARTIFACT_DIR, default backend/models)
+        legacy_artifacts: Model name -> shipped file imported when nothing was
+            published yet (default LEGACY_ARTIFACTS)
+    """
+
+    def __init__(self, root: Optional[str] = None, legacy_artifacts: Optional[Dict[str, str]] = None):
+        self.root = root or os.getenv('MODEL_ARTIFACT_DIR', os.path.join(BACKEND_ROOT, 'models'))
+        self.legacy_artifacts = LEGACY_ARTIFACTS if legacy_artifacts is None else legacy_artifacts
+        self._lock = threading.Lock()
+        # path -> (size, mtime) of files already verified in this process
+        self._verified: Dict[str, Tuple[int, float]] = {}
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.root, name, MANIFEST_NAME)
+
+    @contextmanager
+    def _manifest_lock(self, name: str):
+        """
+        Serialize manifest read-modify-write across threads and processes.
+        """
+        model_dir = os.path.join(self.root, name)
+        os.makedirs(model_dir, exist_ok=True)
+        with self._lock, open(os.path.join(model_dir, LOCK_NAME), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def manifest(self, name: str) -> Dict[str, Any]:
+        """
+        Return the manifest of a model, or an empty one if nothing was published.
+        """
+        try:
+            with open(self._manifest_path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'current': None, 'versions': {}}
+
+    def _write_manifest(self, name: str, manifest: Dict[str, Any]) -> None:
+        # Write-then-rename so readers never see a half-written manifest
+        with _replacing(self._manifest_path(name)) as f:
+            json.dump(manifest, f, indent=2)
+
+    def publish(self, name: str, source_path: str, version: Optional[str] = None, make_current: bool = True) -> Dict[str, Any]:
+        """
+        Copy a model file into the store as a new version.
+
+        Args:
+            name (str): Model name, e.g. 'emotion_model'
+            source_path (str): File to publish
+            version (str, optional): Version label; defaults to v1, v2, ...
+            make_current (bool): Point the manifest's `current` at this version
+
+        Returns:
+            dict: The manifest entry of the new version
+        """
+        with self._manifest_lock(name):
+            manifest = self.manifest(name)
+            versions = manifest['versions']
+            version = version or f"v{len(versions) + 1}"
+            if version in versions:
+                raise ValueError(f"Model '{name}' already has a version '{version}'")
+
+            version_dir = os.path.join(self.root, name, version)
+            os.makedirs(version_dir, exist_ok=True)
+            file_name = os.path.basename(source_path)
+            target_path = os.path.join(version_dir, file_name)
+            # Copy-then-rename so a concurrent resolve never hashes a partial file
+            with _replacing(target_path, 'wb') as target, open(source_path, 'rb') as source:
+                shutil.copyfileobj(source, target)
+            shutil.copystat(source_path, target_path)
+
+            entry = {
+                'file': file_name,
+                'sha256': file_sha256(target_path),
+                'size': os.path.getsize(target_path),
+                'published_at': datetime.now(timezone.utc).isoformat(),
+            }
+            versions[version] = entry
+            if make_current or manifest['current'] is None:
+                manifest['current'] = version
+            self._write_manifest(name, manifest)
+
+        logger.info(f"Published {name} {version} ({entry['sha256'][:12]})")
+        return entry
+
+    def import_legacy(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Publish the model file shipped in the repository as v1 if nothing has
+        been published for `name` yet.
+
+        Returns:
+            dict: The new manifest entry, or None if there was nothing to import
+        """
+        source_path = self.legacy_artifacts.get(name)
+        if source_path is None or not os.path.exists(source_path) or self.manifest(name)['current'] is not None:
+            return None
+        try:
+            entry = self.publish(name, source_path, version='v1')
+        except ValueError:
+            # Another worker process imported it first
+            return None
+        logger.info(f"Imported shipped {os.path.basename(source_path)} as {name} v1")
+        return entry
+
+    def resolve(self, name: str, version: Optional[str] = None) -> str:
+        """
+        Return the verified path of a model version (default: current).
+
+        Raises:
+            FileNotFoundError: If the model or version was never published
+            ValueError: If the file does not match its recorded checksum
+        """
+        manifest = self.manifest(name)
+        if version is None and manifest['current'] is None:
+            self.import_legacy(name)
+            manifest = self.manifest(name)
+        version = version or manifest['current']
+        entry = manifest['versions'].get(version) if version else None
+        if entry is None:
+            raise FileNotFoundError(
+                f"No published artifact for model '{name}'"
+                + (f" version '{version}'" if version else '')
+                + f" in {self.root}"
+            )
+
+        path = os.path.join(self.root, name, version, entry['file'])
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime)
+        if self._verified.get(path) != signature:
+            checksum = file_sha256(path)
+            if checksum != entry['sha256']:
+                raise ValueError(f"Checksum mismatch for {name} {version}: expected {entry['sha256']}, got {checksum}")
+            self._verified[path] = signature
+        return path
+
+
+class LazyModel:
+    """
+    Load a model on first use and remember how long it took.
+
+    Args:
+        name: Label used in logs and the `model_load_seconds.<name>` gauge
+        loader: Zero-argument callable returning the loaded model
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self._loader = loader
+        self._model: Any = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        """
+        Return the model, loading it first if needed. Thread-safe; concurrent
+        first callers wait for a single load.
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self._loader()
+                    self.load_seconds = time.perf_counter() - start
+                    metrics.set_gauge(f"model_load_seconds.{self.name}", self.load_seconds)
+                    logger.info(f"Loaded {self.name} in {self.load_seconds:.2f}s")
+        return self._model
+
+    def warm_up(self) -> None:
+        self.get()
+
+
+_store: Optional[ModelArtifactStore] = None
+
+
+def get_artifact_store() -> ModelArtifactStore:
+    """
+    Return the process-wide artifact store.
+    """
+    global _store
+    if _store is None:
+        _store = ModelArtifactStore()
+    return _store
+
+
+__all__ = ['ModelArtifactStore', 'LazyModel', 'get_artifact_store', 'file_sha256', 'LEGACY_ARTIFACTS']
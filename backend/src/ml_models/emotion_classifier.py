@@ -1,9 +1,18 @@
+import os
+import tempfile
+
 import cv2
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import load_model
 from tensorflow.keras.preprocessing.image import img_to_array
 
+from .artifact_store import LazyModel, get_artifact_store
+from .inference_backends import load_backend
+
+# Artifact store name of the model trained by train_emotion_model
+MODEL_NAME = 'emotion_model'
+
 # Emotion labels
 EMOTION_LABELS = [
     'angry', 
@@ -16,19 +25,41 @@ EMOTION_LABELS = [
 ]
 
 # Load pre-trained model (you'll need to train this separately)
-def load_emotion_model(model_path='emotion_model.h5'):
+def load_emotion_model(version=None):
+    """
+    Load the emotion classification model from the artifact store
+    
+    :param version: Artifact version, defaults to the store's current version
+    :return: Keras model
+    """
+    return load_model(get_artifact_store().resolve(MODEL_NAME, version))
+
+# Loaded on first use or explicit warm-up, never at import
+emotion_model = LazyModel(MODEL_NAME, load_emotion_model)
+
+# Runtime used by classify_emotion, selected by EMOTION_INFERENCE_BACKEND
+_inference_backend = None
+
+def get_inference_backend():
     """
-    Load pre-trained emotion classification model
+    Return the configured inference backend for emotion_model.h5, building it on first use
     """
+    global _inference_backend
+    if _inference_backend is None:
+        _inference_backend = load_backend('emotion_model', _require_keras_model)
+    return _inference_backend
+
+def _require_keras_model():
     try:
-        model = load_model(model_path)
-        return model
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        return None
+        return emotion_model.get()
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Emotion model not loaded: {e}")
 
-# Global model variable
-emotion_model = load_emotion_model()
+def warm_up():
+    """
+    Load the model and its inference backend ahead of the first request
+    """
+    get_inference_backend()
 
 def preprocess_image(image):
     """
@@ -56,14 +87,13 @@ def classify_emotion(image):
     :param image: OpenCV image (numpy array)
     :return: Tuple of (emotion, confidence)
     """
-    if emotion_model is None:
-        raise ValueError("Emotion model not loaded")
+    backend = get_inference_backend()
     
     # Preprocess image
     processed_image = preprocess_image(image)
     
     # Predict
-    predictions = emotion_model.predict(processed_image)
+    predictions = backend.predict(processed_image)
     
     # Get the index of the highest confidence prediction
     emotion_index = np.argmax(predictions[0])
@@ -108,7 +138,10 @@ def train_emotion_model(train_data, train_labels, validation_data=None, validati
         validation_data=(validation_data, validation_labels) if validation_data is not None else None
     )
     
-    # Save the model
-    model.save('emotion_model.h5')
+    # Save the model as a new artifact version
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'emotion_model.h5')
+        model.save(model_path)
+        get_artifact_store().publish(MODEL_NAME, model_path)
     
     return model
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
@@ -5,6 +8,11 @@ from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropou
 from tensorflow.keras.preprocessing.image import img_to_array
 import cv2
 
+from .artifact_store import LazyModel, get_artifact_store
+
+# Artifact store name shared with emotion_classifier.py
+MODEL_NAME = 'emotion_model'
+
 class EmotionClassifier:
     def __init__(self, input_shape=(48, 48, 1), num_classes=7):
         """
@@ -105,20 +113,42 @@ class EmotionClassifier:
         """
         self.model = tf.keras.models.load_model(filepath)
 
-# Create and save a default model if not exists
-def create_default_emotion_model():
+# Create and publish a placeholder model trained on random data, for
+# experiments only. Must be called explicitly; importing this module never
+# trains anything. Deployments use the shipped emotion_model.h5, published by
+# `scripts/model_artifacts.py bootstrap` (or automatically on first load).
+def create_default_emotion_model(seed=42):
+    """
+    Train a placeholder model on seeded dummy data and publish it as a new artifact version
+    """
+    tf.keras.utils.set_random_seed(seed)
     classifier = EmotionClassifier()
     
     # Generate dummy training data for initial model
-    X_train = np.random.random((100, 48, 48, 1))
+    rng = np.random.default_rng(seed)
+    X_train = rng.random((100, 48, 48, 1))
     y_train = tf.keras.utils.to_categorical(
-        np.random.randint(7, size=(100, 1)), 
+        rng.integers(7, size=(100, 1)), 
         num_classes=7
     )
     
     classifier.train(X_train, y_train, epochs=5)
-    classifier.save_model()
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'emotion_model.h5')
+        classifier.save_model(model_path)
+        get_artifact_store().publish(MODEL_NAME, model_path)
     return classifier
 
-# Instantiate the model if not already present
-emotion_classifier = create_default_emotion_model()
+def _load_published_classifier():
+    classifier = EmotionClassifier()
+    classifier.load_model(get_artifact_store().resolve(MODEL_NAME))
+    return classifier
+
+# Loaded from the artifact store on first use or explicit warm-up
+_emotion_classifier = LazyModel('emotion_classifier', _load_published_classifier)
+
+def get_emotion_classifier():
+    """
+    Return the shared classifier holding the current published model
+    """
+    return _emotion_classifier.get()
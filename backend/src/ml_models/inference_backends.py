@@ -0,0 +1,142 @@
+"""
+Emotion Model Inference Backends
+
+Pluggable runtimes for the 48x48 emotion CNNs: the project's own model
+(`emotion_model.h5`) and the DeepFace emotion head. Both take a batch of
+48x48x1 grayscale faces scaled to 0-1 and return 7 class probabilities.
+
+Key Architectural Decisions:
+1. One Interface: Every backend exposes `predict(batch) -> (N, 7) array`, so
+   `classify_emotion` and `EmotionDetector` select a runtime through
+   configuration instead of code changes.
+2. ONNX Runtime: `model.predict` carries heavy per-call TensorFlow overhead on
+   CPU for such a small network. The ONNX backend runs the graph exported by
+   `scripts/export_onnx.py` through `onnxruntime`, optionally in its int8
+   quantized form. `onnxruntime` is imported only when an ONNX backend is
+   selected.
+3. Safe Fallback: If an ONNX backend is configured but its file is missing or
+   `onnxruntime` is not installed, the Keras model is used and a warning is
+   logged, so a misconfigured deployment degrades instead of failing to start.
+
+Configuration:
+    EMOTION_INFERENCE_BACKEND: 'keras' (default), 'onnx' or 'onnx-int8'
+    EMOTION_ONNX_DIR: Directory holding exported models (default models/onnx)
+"""
+
+import logging
+import os
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_BACKENDS = ('keras', 'onnx', 'onnx-int8')
+
+DEFAULT_ONNX_DIR = os.path.join('models', 'onnx')
+
+
+def get_configured_backend() -> str:
+    """
+    Read the inference backend name from the environment.
+    """
+    backend = os.getenv('EMOTION_INFERENCE_BACKEND', 'keras').strip().lower()
+    if backend not in INFERENCE_BACKENDS:
+        logger.warning(f"Unknown EMOTION_INFERENCE_BACKEND '{backend}', using 'keras'")
+        return 'keras'
+    return backend
+
+
+def onnx_model_path(model_name: str, quantized: bool = False, onnx_dir: Optional[str] = None) -> str:
+    """
+    Location of an exported model, e.g. models/onnx/deepface_emotion.int8.onnx.
+
+    Args:
+        model_name (str): 'emotion_model' or 'deepface_emotion'
+        quantized (bool): Whether to return the int8 variant
+        onnx_dir (str, optional): Overrides EMOTION_ONNX_DIR
+    """
+    onnx_dir = onnx_dir or os.getenv('EMOTION_ONNX_DIR', DEFAULT_ONNX_DIR)
+    suffix = '.int8.onnx' if quantized else '.onnx'
+    return os.path.join(onnx_dir, model_name + suffix)
+
+
+class KerasBackend:
+    """
+    Runs a Keras model through `model.predict`.
+    """
+
+    name = 'keras'
+
+    def __init__(self, model: Any):
+        # DeepFace clients wrap the Keras model in a `.model` attribute
+        self.model = getattr(model, 'model', model)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict(batch, verbose=0))
+
+
+class OnnxBackend:
+    """
+    Runs an exported model with ONNX Runtime on the CPU.
+
+    Args:
+        model_path (str): Path to the .onnx file
+        intra_op_threads (int, optional): Threads per inference call. Defaults
+            to TF_NUM_INTRAOP_THREADS so pool workers keep their one-thread limit.
+    """
+
+    def __init__(self, model_path: str, intra_op_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = intra_op_threads or int(os.getenv('TF_NUM_INTRAOP_THREADS', 0))
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+
+        self.model_path = model_path
+        self.name = 'onnx-int8' if model_path.endswith('.int8.onnx') else 'onnx'
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+def load_backend(model_name: str, keras_loader: Callable[[], Any], backend: Optional[str] = None):
+    """
+    Build the configured backend for one model.
+
+    Args:
+        model_name (str): Exported model name, see `onnx_model_path`
+        keras_loader (Callable): Returns the Keras model; only called when the
+            Keras backend is used
+        backend (str, optional): Overrides EMOTION_INFERENCE_BACKEND
+
+    Returns:
+        KerasBackend | OnnxBackend: Object with a `predict(batch)` method
+    """
+    backend = backend or get_configured_backend()
+    if backend != 'keras':
+        path = onnx_model_path(model_name, quantized=backend == 'onnx-int8')
+        if not os.path.exists(path):
+            logger.warning(f"{backend} backend requested but {path} does not exist; "
+                           f"run scripts/export_onnx.py. Falling back to Keras.")
+        else:
+            try:
+                onnx_backend = OnnxBackend(path)
+                logger.info(f"Using {onnx_backend.name} backend for {model_name} ({path})")
+                return onnx_backend
+            except ImportError:
+                logger.warning("onnxruntime is not installed; falling back to Keras")
+
+    return KerasBackend(keras_loader())
+
+
+__all__ = [
+    'INFERENCE_BACKENDS', 'KerasBackend', 'OnnxBackend',
+    'get_configured_backend', 'load_backend', 'onnx_model_path'
+]
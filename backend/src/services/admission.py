@@ -0,0 +1,246 @@
+"""
+Admission Control
+
+Bounds the work the image endpoints accept, so a burst of uploads queues
+briefly or is turned away with 503 instead of exhausting threads and memory.
+
+Key Architectural Decisions:
+1. Two Budgets: In-flight requests are limited both by count and by the
+   estimated bytes of their decoded bitmaps. A few 12MP PNGs use as much
+   memory as hundreds of webcam frames, so a count limit alone cannot protect
+   a memory-constrained container.
+2. Cost From the Header: The cost of a request is estimated from the image
+   header (width, height, format) before any pixels are decoded. JPEGs are
+   costed at their DCT-scaled draft size, matching `decode_image_bytes`.
+3. Decompression Bombs: Header dimensions above MAX_IMAGE_PIXELS are rejected
+   before a bitmap is allocated, here and again in `decode_image_bytes`.
+4. Short Bounded Queue: Requests that do not fit wait in a bounded queue for
+   at most `queue_timeout_ms`. A full queue or an expired wait raises
+   `AdmissionRejected`, which the app turns into 503 with Retry-After so
+   clients and load balancers back off instead of piling on.
+"""
+
+import asyncio
+import base64
+import io
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple, Union
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Largest decodable image, in pixels (40MP covers every current phone camera)
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40_000_000))
+# Bytes of an upload needed to read the image header (JPEG EXIF can be large)
+HEADER_PROBE_BYTES = 128 * 1024
+# Longest side of the decoded working image, as in emotion_detection
+WORKING_DIMENSION = 1024
+
+
+class ImageTooLarge(ValueError):
+    """Raised for images whose bitmap would exceed MAX_IMAGE_PIXELS; maps to 413."""
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to 503 with Retry-After."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def check_image_dimensions(width: int, height: int) -> None:
+    """
+    Raise ImageTooLarge for images whose bitmap would exceed MAX_IMAGE_PIXELS.
+    """
+    if width * height > MAX_IMAGE_PIXELS:
+        metrics.inc('admission.oversized_images')
+        raise ImageTooLarge(f"Image dimensions {width}x{height} exceed the {MAX_IMAGE_PIXELS} pixel limit")
+
+
+def image_header_bytes(image: Union[str, bytes]) -> bytes:
+    """
+    Return the leading bytes of an upload, base64-decoding only a prefix of
+    string payloads.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image[:HEADER_PROBE_BYTES])
+    # Strip a data URL prefix without copying the whole payload
+    comma = image.find(',', 0, 256)
+    start = comma + 1 if comma >= 0 else 0
+    length = (HEADER_PROBE_BYTES * 4 // 3) // 4 * 4
+    try:
+        return base64.b64decode(image[start:start + length])
+    except ValueError:
+        return b''
+
+
+def probe_image_size(image: Union[str, bytes]) -> Optional[Tuple[int, int, str]]:
+    """
+    Read (width, height, format) from the image header, or None if the header
+    cannot be parsed from the leading bytes.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(image_header_bytes(image))) as header:
+            return header.size[0], header.size[1], header.format or ''
+    except Exception:
+        return None
+
+
+def estimate_decoded_bytes(width: int, height: int, image_format: str, max_dimension: int = WORKING_DIMENSION) -> int:
+    """
+    Estimate peak bitmap bytes for decoding one image.
+
+    JPEGs are decoded with draft(), which scales by up to 1/8 while staying
+    at least `max_dimension`; other formats are decoded at full size. The
+    RGB working copy is added on top.
+    """
+    scale = 1
+    if image_format == 'JPEG':
+        while scale < 8 and max(width, height) / (scale * 2) >= max_dimension:
+            scale *= 2
+    channels = 3 if image_format == 'JPEG' else 4
+    decoded = -(-width // scale) * -(-height // scale) * channels
+    ratio = min(1.0, max_dimension / max(width, height, 1))
+    working = int(width * ratio) * int(height * ratio) * 3
+    return decoded + working
+
+
+class AdmissionController:
+    """
+    Count- and memory-budgeted gate in front of image inference.
+
+    Args:
+        max_inflight: Requests processed at once (env ADMISSION_MAX_INFLIGHT, default 32)
+        max_pixel_bytes: Estimated decoded bytes in flight
+            (env ADMISSION_MAX_PIXEL_BYTES, default 512 MiB)
+        max_queue: Requests allowed to wait (env ADMISSION_MAX_QUEUE, default 64)
+        queue_timeout_ms: Longest wait for a slot (env ADMISSION_QUEUE_TIMEOUT_MS, default 500)
+        retry_after_seconds: Retry-After sent with rejections
+            (env ADMISSION_RETRY_AFTER_SECONDS, default 2)
+    """
+
+    def __init__(
+        self,
+        max_inflight: Optional[int] = None,
+        max_pixel_bytes: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout_ms: Optional[float] = None,
+        retry_after_seconds: Optional[int] = None
+    ):
+        self.max_inflight = max_inflight or int(os.getenv('ADMISSION_MAX_INFLIGHT', 32))
+        self.max_pixel_bytes = max_pixel_bytes or int(os.getenv('ADMISSION_MAX_PIXEL_BYTES', 512 * 1024 * 1024))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('ADMISSION_MAX_QUEUE', 64))
+        self.queue_timeout_ms = queue_timeout_ms if queue_timeout_ms is not None else float(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', 500))
+        self.retry_after_seconds = retry_after_seconds or int(os.getenv('ADMISSION_RETRY_AFTER_SECONDS', 2))
+        self.inflight = 0
+        self.inflight_bytes = 0
+        self.waiting = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _fits(self, cost: int) -> bool:
+        if self.inflight >= self.max_inflight:
+            return False
+        # A lone request always runs, however large; the pixel limit guards against bombs
+        return self.inflight == 0 or self.inflight_bytes + cost <= self.max_pixel_bytes
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        metrics.inc('admission.rejected')
+        metrics.inc(f"admission.rejected.{reason}")
+        return AdmissionRejected(reason, self.retry_after_seconds)
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge('admission.inflight', self.inflight)
+        metrics.set_gauge('admission.inflight_bytes', self.inflight_bytes)
+        metrics.set_gauge('admission.waiting', self.waiting)
+
+    @asynccontextmanager
+    async def admit(self, cost_bytes: int):
+        """
+        Hold an admission slot for the duration of the `async with` block.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        condition = self._condition
+        started = time.perf_counter()
+
+        async with condition:
+            # Newcomers queue behind existing waiters instead of overtaking them
+            if self.waiting or not self._fits(cost_bytes):
+                if self.waiting >= self.max_queue:
+                    raise self._reject('queue_full')
+                self.waiting += 1
+                self._update_gauges()
+                try:
+                    await asyncio.wait_for(
+                        condition.wait_for(lambda: self._fits(cost_bytes)),
+                        self.queue_timeout_ms / 1000
+                    )
+                except asyncio.TimeoutError:
+                    raise self._reject('queue_timeout')
+                finally:
+                    self.waiting -= 1
+            self.inflight += 1
+            self.inflight_bytes += cost_bytes
+            self._update_gauges()
+
+        metrics.inc('admission.admitted')
+        metrics.observe('admission.wait_ms', (time.perf_counter() - started) * 1000)
+        try:
+            yield
+        finally:
+            async with condition:
+                self.inflight -= 1
+                self.inflight_bytes -= cost_bytes
+                self._update_gauges()
+                condition.notify_all()
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Return the process-wide admission controller.
+    """
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+@asynccontextmanager
+async def admit_image(image: Union[str, bytes], max_dimension: int = WORKING_DIMENSION):
+    """
+    Check an upload's header and hold an admission slot sized by its decoded cost.
+
+    Raises:
+        ImageTooLarge: If the header declares more than MAX_IMAGE_PIXELS
+        AdmissionRejected: If the service is at capacity
+    """
+    header = probe_image_size(image)
+    if header is None:
+        # Undecodable headers fail fast in decoding; cost them as a working frame
+        cost = max_dimension * max_dimension * 3
+    else:
+        width, height, image_format = header
+        check_image_dimensions(width, height)
+        cost = estimate_decoded_bytes(width, height, image_format, max_dimension)
+    async with get_admission_controller().admit(cost):
+        yield
+
+
+__all__ = [
+    'AdmissionController', 'AdmissionRejected', 'ImageTooLarge', 'admit_image', 'check_image_dimensions',
+    'estimate_decoded_bytes', 'get_admission_controller', 'probe_image_size', 'MAX_IMAGE_PIXELS'
+]
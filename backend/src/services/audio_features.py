@@ -0,0 +1,104 @@
+"""
+Bulk Audio Features
+
+Resolves Spotify audio features for many tracks at once. `get_similar_songs`
+used to request features one track at a time (41 sequential calls for
+limit=20); it now makes one bulk request for every track it needs.
+
+Key Architectural Decisions:
+1. Bulk Requests: Missing IDs are requested 100 at a time (Spotify's limit for
+   GET /audio-features), and several chunks run concurrently on a small
+   thread pool because the spotipy client is blocking.
+2. Permanent Cache: Audio features are computed once per track ID and never
+   change, so they are stored in the SQLite track store without expiry and
+   survive restarts. Tracks Spotify has no features for are not cached, so
+   they are asked for again next time.
+3. Partial Results: A failed chunk is logged and skipped; callers get the
+   features that could be resolved, as before when a single lookup failed.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import metrics
+from .track_store import TrackStore, get_track_store
+
+logger = logging.getLogger(__name__)
+
+# Spotify's limit for GET /audio-features
+AUDIO_FEATURES_PER_REQUEST = 100
+
+
+class AudioFeatureProvider:
+    """
+    Cached, batched audio-feature lookups.
+
+    Args:
+        fetch: Blocking call returning Spotify audio-feature objects (or None)
+            for up to 100 track IDs, e.g. `spotipy.Spotify.audio_features`
+        store: Persistent cache; defaults to the process-wide track store
+        max_workers: Chunks fetched concurrently (env AUDIO_FEATURES_CONCURRENCY, default 4)
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[str]], List[Optional[Dict[str, Any]]]],
+        store: Optional[TrackStore] = None,
+        max_workers: Optional[int] = None
+    ):
+        self._fetch = fetch
+        self._store = store
+        self.max_workers = max_workers or int(os.getenv('AUDIO_FEATURES_CONCURRENCY', 4))
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def store(self) -> TrackStore:
+        if self._store is None:
+            self._store = get_track_store()
+        return self._store
+
+    def _fetch_chunk(self, chunk: List[str]) -> List[Dict[str, Any]]:
+        try:
+            metrics.inc('audio_features.upstream_calls')
+            return [item for item in (self._fetch(chunk) or []) if item]
+        except Exception as e:
+            logger.error(f"Error fetching audio features for {len(chunk)} tracks: {e}")
+            return []
+
+    def get_many(self, track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Audio features by track ID; IDs Spotify has no features for are absent.
+        """
+        unique = list(dict.fromkeys(track_id for track_id in track_ids if track_id))
+        features = self.store.get_audio_features(unique)
+        missing = [track_id for track_id in unique if track_id not in features]
+        metrics.inc('audio_features.cache_hits', len(features))
+        metrics.inc('audio_features.cache_misses', len(missing))
+        if not missing:
+            return features
+
+        chunks = [missing[start:start + AUDIO_FEATURES_PER_REQUEST]
+                  for start in range(0, len(missing), AUDIO_FEATURES_PER_REQUEST)]
+        if len(chunks) == 1:
+            results = [self._fetch_chunk(chunks[0])]
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='audio-features')
+            results = list(self._executor.map(self._fetch_chunk, chunks))
+
+        fetched = [item for result in results for item in result]
+        try:
+            self.store.put_audio_features(fetched)
+        except Exception as e:
+            logger.error(f"Failed to store audio features: {e}")
+        features.update((item['id'], item) for item in fetched)
+        return features
+
+    def get(self, track_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([track_id]).get(track_id)
+
+
+__all__ = ['AudioFeatureProvider', 'AUDIO_FEATURES_PER_REQUEST']
@@ -0,0 +1,172 @@
+"""
+Candidate Track Pools
+
+Keeps a pool of deduplicated candidate tracks per (mood, language) so
+playlist requests sample locally instead of calling Spotify, and the upstream
+call rate depends on pool turnover rather than on user traffic.
+
+Key Architectural Decisions:
+1. Demand-Driven Keys: A pool is created the first time its (mood, language)
+   is requested rather than prefilled for every combination of `mood_params`
+   and `LANGUAGE_CONFIGS`, which would spend the rate limit on combinations
+   nobody asks for. Until a pool holds enough tracks, callers fall back to
+   the recommendation cache.
+2. Watermark Refills: Tracks expire after `track_ttl_seconds` so pools keep
+   rotating. When a pool drops below `low_watermark`, a background refill
+   tops it up to `target_size` with a few large upstream calls. Refills are
+   single-flight per pool, and a maintenance loop started by the FastAPI
+   lifespan refills idle pools too.
+3. Local Sampling: A request samples `limit` tracks from the pool in memory
+   (microseconds). Sampling does not consume tracks; expiry and refills are
+   what rotate the pool.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CandidatePoolService:
+    """
+    Per-key pools of candidate tracks with background refills.
+
+    Args:
+        fill: `await fill(key, round)` returns a batch of tracks (objects with
+            an `id`) for a pool; `round` counts the calls within one refill
+        target_size: Tracks a refill aims for (env CANDIDATE_POOL_SIZE, default 300)
+        low_watermark: Size below which a refill starts
+            (env CANDIDATE_POOL_LOW_WATERMARK, default 100)
+        track_ttl_seconds: Lifetime of a pooled track
+            (env CANDIDATE_POOL_TRACK_TTL_SECONDS, default 21600)
+        max_rounds: Upstream calls per refill at most (default 5)
+        clock: Monotonic time source (for tests)
+    """
+
+    def __init__(
+        self,
+        fill: Callable[[Hashable, int], Awaitable[List[Any]]],
+        target_size: Optional[int] = None,
+        low_watermark: Optional[int] = None,
+        track_ttl_seconds: Optional[float] = None,
+        max_rounds: int = 5,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._fill = fill
+        self.target_size = target_size or int(os.getenv('CANDIDATE_POOL_SIZE', 300))
+        self.low_watermark = low_watermark if low_watermark is not None else int(os.getenv('CANDIDATE_POOL_LOW_WATERMARK', 100))
+        self.track_ttl_seconds = track_ttl_seconds or float(os.getenv('CANDIDATE_POOL_TRACK_TTL_SECONDS', 6 * 3600))
+        self.max_rounds = max_rounds
+        self._clock = clock
+        # key -> track id -> (track, added_at), oldest first
+        self._pools: Dict[Hashable, "OrderedDict[str, tuple]"] = {}
+        self._refills: Dict[Hashable, asyncio.Task] = {}
+
+    def _prune(self, key: Hashable) -> "OrderedDict[str, tuple]":
+        pool = self._pools.setdefault(key, OrderedDict())
+        cutoff = self._clock() - self.track_ttl_seconds
+        while pool and next(iter(pool.values()))[1] < cutoff:
+            pool.popitem(last=False)
+        return pool
+
+    def size(self, key: Hashable) -> int:
+        return len(self._prune(key))
+
+    def sample(self, key: Hashable, limit: int) -> Optional[List[Any]]:
+        """
+        Draw `limit` distinct tracks from a pool, or None if it holds fewer.
+        Starts a background refill when the pool is below the watermark.
+        """
+        pool = self._prune(key)
+        if len(pool) < self.low_watermark:
+            self.schedule_refill(key)
+        if len(pool) < limit or not pool:
+            metrics.inc('candidate_pool.misses')
+            return None
+        metrics.inc('candidate_pool.hits')
+        return [track for track, _ in random.sample(list(pool.values()), limit)]
+
+    def schedule_refill(self, key: Hashable) -> Optional[asyncio.Task]:
+        """
+        Start a refill of one pool unless one is already running.
+        """
+        task = self._refills.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refill(key))
+            self._refills[key] = task
+        return task
+
+    async def _refill(self, key: Hashable) -> int:
+        added = 0
+        try:
+            for round_index in range(self.max_rounds):
+                pool = self._prune(key)
+                if len(pool) >= self.target_size:
+                    break
+                batch = await self._fill(key, round_index)
+                metrics.inc('candidate_pool.upstream_calls')
+                new = 0
+                now = self._clock()
+                for track in batch:
+                    if track.id not in pool:
+                        pool[track.id] = (track, now)
+                        new += 1
+                added += new
+                # Spotify has nothing new for this key (or is failing); stop early
+                if not new:
+                    break
+            # Keep the freshest target_size tracks
+            pool = self._prune(key)
+            while len(pool) > self.target_size:
+                pool.popitem(last=False)
+            metrics.inc('candidate_pool.refills')
+            logger.info(f"Refilled candidate pool {key}: +{added} tracks, {len(pool)} total")
+        except Exception as e:
+            logger.error(f"Candidate pool refill for {key} failed: {e}")
+        finally:
+            self._refills.pop(key, None)
+            metrics.set_gauge(f"candidate_pool.size.{'.'.join(str(part) for part in self._key_parts(key))}",
+                              len(self._pools.get(key, ())))
+        return added
+
+    @staticmethod
+    def _key_parts(key: Hashable) -> tuple:
+        return key if isinstance(key, tuple) else (key,)
+
+    async def run_maintenance(self, interval_seconds: Optional[float] = None) -> None:
+        """
+        Refill every known pool below its watermark, forever; cancel the task to stop.
+        """
+        interval = interval_seconds or float(os.getenv('CANDIDATE_POOL_MAINTENANCE_SECONDS', 60))
+        while True:
+            await asyncio.sleep(interval)
+            for key in list(self._pools):
+                if self.size(key) < self.low_watermark:
+                    self.schedule_refill(key)
+
+    def status(self) -> Dict[str, int]:
+        return {'/'.join(str(part) for part in self._key_parts(key)): self.size(key) for key in list(self._pools)}
+
+
+_service: Optional[CandidatePoolService] = None
+
+
+def get_candidate_pools() -> CandidatePoolService:
+    """
+    Return the process-wide candidate pools, filled from Spotify recommendations.
+    """
+    global _service
+    if _service is None:
+        from .spotify_service import fill_candidate_pool
+        _service = CandidatePoolService(fill_candidate_pool)
+    return _service
+
+
+__all__ = ['CandidatePoolService', 'get_candidate_pools']
@@ -0,0 +1,166 @@
+"""
+Load-Adaptive Quality Tiers
+
+Degradation controller for the detection-to-playlist pipeline. Under load it
+steps down through progressively cheaper quality tiers and steps back up once
+the load subsides, so a traffic spike costs answer quality instead of timeouts.
+
+Key Architectural Decisions:
+1. Ordered Tiers: Each tier gives up one more expensive stage, cheapest cut
+   first: the 'retinaface' detector fallback, then working resolution, then
+   live Spotify calls (playlists only from the recent-results cache), then
+   playlists altogether. Emotion detection itself is never skipped.
+2. Load Signals: The controller watches the inference scheduler's queue depth
+   and the p95 of end-to-end detection latency over a short time window. The
+   window is time-based rather than count-based so an idle service does not
+   keep judging itself by the last spike.
+3. Hysteresis: Stepping down needs either signal above its limit; stepping up
+   needs both below half their limits for `recovery_seconds`. Each step waits
+   at least `step_seconds`, so the tier does not flap on a single slow request.
+4. Evaluated Inline: `current()` re-evaluates lazily on each request instead of
+   in a background task; it is a few comparisons plus a sort of the recent
+   latencies, and needs no lifecycle management.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QualityTier(NamedTuple):
+    """What a request may spend at one level of degradation."""
+    name: str
+    # Try the fallback detector backends after the first one misses
+    detector_fallback: bool
+    # Longest side of the decoded working image
+    max_dimension: int
+    # 'live' (Spotify + recommended playlists), 'cache' (recent results only) or 'none'
+    playlists: str
+
+
+QUALITY_TIERS = (
+    QualityTier('full', True, 1024, 'live'),
+    QualityTier('no_detector_fallback', False, 1024, 'live'),
+    QualityTier('reduced_resolution', False, 640, 'live'),
+    QualityTier('cached_playlists', False, 640, 'cache'),
+    QualityTier('no_playlists', False, 640, 'none'),
+)
+
+
+class DegradationController:
+    """
+    Pick the quality tier for the next request from current load.
+
+    Args:
+        max_queue_depth: Scheduler queue depth that triggers a step down
+            (env DEGRADE_QUEUE_DEPTH, default 16)
+        max_p95_ms: End-to-end detection p95 that triggers a step down
+            (env DEGRADE_P95_MS, default 1500)
+        step_seconds: Minimum time between tier changes (env DEGRADE_STEP_SECONDS, default 5)
+        recovery_seconds: Time load must stay low before stepping up
+            (env DEGRADE_RECOVERY_SECONDS, default 15)
+        max_tier: Deepest tier index allowed (env DEGRADE_MAX_TIER, default
+            the last tier; 0 disables degradation)
+        window_seconds: Latency window for the p95 (default 10)
+        queue_gauge: Metrics gauge holding the scheduler queue depth
+    """
+
+    def __init__(
+        self,
+        max_queue_depth: Optional[int] = None,
+        max_p95_ms: Optional[float] = None,
+        step_seconds: Optional[float] = None,
+        recovery_seconds: Optional[float] = None,
+        max_tier: Optional[int] = None,
+        window_seconds: float = 10.0,
+        queue_gauge: str = 'emotion_batch.queue_depth'
+    ):
+        self.max_queue_depth = max_queue_depth if max_queue_depth is not None else int(os.getenv('DEGRADE_QUEUE_DEPTH', 16))
+        self.max_p95_ms = max_p95_ms if max_p95_ms is not None else float(os.getenv('DEGRADE_P95_MS', 1500))
+        self.step_seconds = step_seconds if step_seconds is not None else float(os.getenv('DEGRADE_STEP_SECONDS', 5))
+        self.recovery_seconds = recovery_seconds if recovery_seconds is not None else float(os.getenv('DEGRADE_RECOVERY_SECONDS', 15))
+        if max_tier is None:
+            max_tier = int(os.getenv('DEGRADE_MAX_TIER', len(QUALITY_TIERS) - 1))
+        self.max_tier = max(0, min(max_tier, len(QUALITY_TIERS) - 1))
+        self.window_seconds = window_seconds
+        self.queue_gauge = queue_gauge
+        self.level = 0
+        # (timestamp, latency_ms) of recent requests
+        self._latencies: Deque[Tuple[float, float]] = deque()
+        self._changed_at = 0.0
+        self._calm_since: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record_latency(self, latency_ms: float) -> None:
+        """
+        Feed the end-to-end latency of one detection request.
+        """
+        with self._lock:
+            self._latencies.append((time.monotonic(), latency_ms))
+
+    def _p95(self, now: float) -> float:
+        while self._latencies and now - self._latencies[0][0] > self.window_seconds:
+            self._latencies.popleft()
+        if not self._latencies:
+            return 0.0
+        values = sorted(latency for _, latency in self._latencies)
+        return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+    def current(self) -> QualityTier:
+        """
+        Re-evaluate load and return the tier for the next request.
+        """
+        now = time.monotonic()
+        queue_depth = metrics.gauge(self.queue_gauge) or 0
+        with self._lock:
+            p95 = self._p95(now)
+            overloaded = queue_depth > self.max_queue_depth or p95 > self.max_p95_ms
+            calm = queue_depth <= self.max_queue_depth / 2 and p95 <= self.max_p95_ms / 2
+            self._calm_since = (self._calm_since or now) if calm else None
+            can_step = now - self._changed_at >= self.step_seconds
+
+            previous = self.level
+            if overloaded and can_step and self.level < self.max_tier:
+                self.level += 1
+            elif (calm and can_step and self.level > 0
+                  and now - self._calm_since >= self.recovery_seconds):
+                self.level -= 1
+                # Each further step up needs its own calm period
+                self._calm_since = now
+            if self.level != previous:
+                self._changed_at = now
+            level = self.level
+
+        if level != previous:
+            logger.warning(f"Quality tier {QUALITY_TIERS[previous].name} -> {QUALITY_TIERS[level].name} "
+                           f"(queue depth {queue_depth:.0f}, p95 {p95:.0f}ms)")
+            metrics.inc('degradation.tier_changes')
+        metrics.set_gauge('degradation.tier', level)
+        return QUALITY_TIERS[level]
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            return {'tier': QUALITY_TIERS[self.level].name, 'level': self.level, 'max_tier': self.max_tier}
+
+
+_controller: Optional[DegradationController] = None
+
+
+def get_degradation_controller() -> DegradationController:
+    """
+    Return the process-wide degradation controller.
+    """
+    global _controller
+    if _controller is None:
+        _controller = DegradationController()
+    return _controller
+
+
+__all__ = ['QualityTier', 'QUALITY_TIERS', 'DegradationController', 'get_degradation_controller']
@@ -1,37 +1,297 @@
-"""
-Emotion Detection Service
-
-This module is responsible for parsing base64 image data and using DeepFace
-to extract facial expressions and map them to emotions.
-
-Key Architectural Decisions:
-1. Fallback Cascades: Facial detection is tricky in varying lighting conditions.
-   If the default 'opencv' backend fails (it's fast but less accurate), the code
-   falls back to 'retinaface' (slower but highly accurate).
-2. Image Normalization: Inputs are resized to prevent Out-Of-Memory (OOM) errors.
-   Images are bounded between min_dimension (480px) for accuracy and max_dimension
-   (1024px) for performance.
-"""
-
-import numpy as np
-import logging
-import traceback
-import cv2
-import sys
-import base64
-import io
-import os
-from PIL import Image
-from typing import Dict, Optional, Union
-from deepface import DeepFace
+"""
+Emotion Detection Service
+
+This module is responsible for parsing base64 image data and using DeepFace
+to extract facial expressions and map them to emotions.
+
+Key Architectural Decisions:
+1. Fallback Cascades: Facial detection is tricky in varying lighting conditions.
+   If the default 'opencv' backend fails (it's fast but less accurate), the code
+   falls back to 'retinaface' (slower but highly accurate).
+2. Image Normalization: Inputs are resized to prevent Out-Of-Memory (OOM) errors.
+   Images are bounded by MAX_DIMENSION (1024px) for performance; large JPEGs are
+   DCT-scaled during decode so they are never fully decompressed. Frames are
+   only upscaled when smaller than MIN_DETECTION_DIMENSION (240px), the point
+   below which the detectors stop finding faces.
+3. Batched Classification: `detect_emotion_batch` separates face detection from
+   emotion classification so the inference scheduler can classify the face
+   crops of many concurrent requests in one forward pass.
+4. Off-Loop Inference: `analyze_image` is the async entry point used by the
+   endpoints; it routes decoding and inference through the process pool in
+   `inference_pool.py` so the event loop stays responsive. Repeated webcam
+   frames are answered from the perceptual-hash cache in `frame_cache.py`.
+5. Group Mood: `detect_group_emotion` classifies every detected face in one
+   batched forward pass and combines them into a confidence-weighted
+   aggregate, so a crowd costs one detection pass plus one model call rather
+   than one full analysis per face.
+6. Confidence-Gated Cascade: With EMOTION_CASCADE=true, face crops are first
+   classified by the project's own 48x48 CNN (Keras or ONNX). Only faces whose
+   top-class margin is below EMOTION_CASCADE_MARGIN escalate to the DeepFace
+   emotion model. Results report the answering `tier` and /metrics tracks
+   the escalation rate.
+7. Frame Quality Gate: Before detection, brightness, contrast and a
+   Laplacian-variance sharpness score are measured on a tiny grayscale
+   thumbnail (well under a millisecond). Dark, washed-out, flat or blurry
+   frames skip detection and inference and come back as the neutral fallback
+   with a machine-readable `quality_issue`, so clients can re-capture. The
+   gate is opt-in (FRAME_QUALITY_GATE=true): its thresholds are conservative
+   guesses that reject only clearly unusable synthetic frames, not values
+   tuned on real webcam captures, and a soft but usable frame must never be
+   turned into a neutral result by default.
+8. Two-Resolution Detection: Faces are located on a grayscale copy downscaled
+   to DETECTION_DIMENSION (detector cost falls roughly with the square of the
+   scale), and the boxes are mapped back to the working frame. The emotion
+   model only sees a FACE_CROP_MARGIN-padded crop cut from the working-frame
+   pixels. If the small copy yields no confident face, detection is retried
+   once on the working frame so small faces are not lost.
+"""
+
+import asyncio
+import numpy as np
+import logging
+import traceback
+import cv2
+import sys
+import base64
+import io
+import os
+import time
+from PIL import Image
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+from deepface import DeepFace
+
+from .model_registry import ModelRegistry, get_model_registry, cascade_enabled
+from .inference_scheduler import InferenceScheduler
+from .inference_pool import await_shared_frame, get_inference_pool, frame_to_shared
+from .frame_cache import get_frame_cache, dhash
+from .metrics import metrics
+from .admission import ImageTooLarge, check_image_dimensions
+from .face_tracker import expand_region
 
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Longest side of the decoded working image
+MAX_DIMENSION = 1024
+# Frames with a shorter side than this are upscaled before detection
+MIN_DETECTION_DIMENSION = 240
+# Longest side of the grayscale copy faces are detected on (0 detects on the working frame)
+DETECTION_DIMENSION = int(os.getenv('FACE_DETECTION_DIMENSION', 320))
+# Fraction of the face box added on each side of the crop sent to the emotion model
+FACE_CROP_MARGIN = float(os.getenv('FACE_CROP_MARGIN', 0.1))
+# Most faces classified per image in group mode; the largest faces are kept
+GROUP_MAX_FACES = int(os.getenv('GROUP_MOOD_MAX_FACES', 32))
+# Fast-tier top-1 minus top-2 probability below which a face escalates to DeepFace
+CASCADE_MARGIN = float(os.getenv('EMOTION_CASCADE_MARGIN', 0.3))
+
+# Frame quality gate, measured on a QUALITY_THUMBNAIL_WIDTH-wide grayscale
+# thumbnail (0-255 scale). Sharpness is the Laplacian variance at that scale.
+# Off by default until the thresholds are validated against real captures.
+QUALITY_GATE_ENABLED = os.getenv('FRAME_QUALITY_GATE', 'false').lower() == 'true'
+QUALITY_THUMBNAIL_WIDTH = 128
+QUALITY_MIN_BRIGHTNESS = float(os.getenv('FRAME_QUALITY_MIN_BRIGHTNESS', 35))
+QUALITY_MAX_BRIGHTNESS = float(os.getenv('FRAME_QUALITY_MAX_BRIGHTNESS', 230))
+QUALITY_MIN_CONTRAST = float(os.getenv('FRAME_QUALITY_MIN_CONTRAST', 12))
+QUALITY_MIN_SHARPNESS = float(os.getenv('FRAME_QUALITY_MIN_SHARPNESS', 25))
+
+def neutral_fallback() -> Dict[str, Union[str, float, Dict[str, float]]]:
+    """
+    Neutral result returned whenever detection fails, so callers always get a
+    well-formed response.
+    """
+    return {
+        'emotion': 'neutral',
+        'confidence': 0.5,
+        'emotion_scores': {
+            'angry': 0.05, 'disgust': 0.05, 'fear': 0.05, 
+            'happy': 0.1, 'sad': 0.1, 'surprise': 0.05, 
+            'neutral': 0.6
+        }
+    }
+
+def scores_to_result(emotion_scores: Dict[str, float]) -> Dict[str, Union[str, float, Dict[str, float]]]:
+    """
+    Build the detector result from per-emotion probabilities (0-1).
+    
+    Args:
+        emotion_scores (dict): Emotion label to probability
+        
+    Returns:
+        dict: Contains emotion, confidence score, and emotion scores
+    """
+    # Find the dominant emotion
+    dominant_emotion = max(emotion_scores.items(), key=lambda x: x[1])
+    
+    # Normalize emotion names to match our supported list
+    emotion_name = dominant_emotion[0].lower()
+    # Map 'disgust' to 'disgusted', etc. to match spotify_service.py mood names
+    emotion_map = {
+        'disgust': 'disgusted',
+        'fear': 'fearful',
+        'surprise': 'surprised'
+    }
+    emotion_name = emotion_map.get(emotion_name, emotion_name)
+    
+    return {
+        'emotion': emotion_name,
+        'confidence': float(dominant_emotion[1]),
+        'emotion_scores': {k.lower(): float(v) for k, v in emotion_scores.items()}
+    }
+
+def aggregate_group_mood(faces: List[Dict]) -> Dict[str, Union[str, float, Dict[str, float]]]:
+    """
+    Combine per-face results into one confidence-weighted group result.
+    
+    Each face votes with its full score distribution, weighted by how sure the
+    emotion model is (top-class probability) and how sure the detector is that
+    it is a face at all, so blurry background faces count for less.
+    
+    Args:
+        faces (list): Per-face results with 'confidence', 'emotion_scores' and
+            optionally 'face_region' carrying the detector confidence
+            
+    Returns:
+        dict: Contains emotion, confidence score, and emotion scores
+    """
+    totals: Dict[str, float] = {}
+    total_weight = 0.0
+    for face in faces:
+        detector_confidence = (face.get('face_region') or {}).get('confidence') or 1.0
+        weight = face['confidence'] * detector_confidence
+        for label, score in face['emotion_scores'].items():
+            totals[label] = totals.get(label, 0.0) + weight * score
+        total_weight += weight
+    if total_weight <= 0:
+        return neutral_fallback()
+    return scores_to_result({label: value / total_weight for label, value in totals.items()})
+
+def assess_frame_quality(image_array: np.ndarray) -> Dict[str, Union[bool, float, Optional[str]]]:
+    """
+    Measure whether a frame is worth running face detection on.
+    
+    Args:
+        image_array (np.ndarray): RGB or grayscale frame
+        
+    Returns:
+        dict: 'usable', 'reason' ('too_dark', 'too_bright', 'low_contrast',
+            'blurry' or None) and the 'brightness', 'contrast' and
+            'sharpness' measurements
+    """
+    height, width = image_array.shape[:2]
+    size = (QUALITY_THUMBNAIL_WIDTH, max(1, height * QUALITY_THUMBNAIL_WIDTH // max(1, width)))
+    # Shrink before the color conversion so only the thumbnail is converted
+    thumbnail = cv2.resize(image_array, size, interpolation=cv2.INTER_AREA)
+    if thumbnail.ndim == 3:
+        thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_RGB2GRAY)
+    brightness = float(thumbnail.mean())
+    contrast = float(thumbnail.std())
+    sharpness = float(cv2.Laplacian(thumbnail, cv2.CV_32F).var())
+    
+    reason = None
+    if brightness < QUALITY_MIN_BRIGHTNESS:
+        reason = 'too_dark'
+    elif brightness > QUALITY_MAX_BRIGHTNESS:
+        reason = 'too_bright'
+    elif contrast < QUALITY_MIN_CONTRAST:
+        reason = 'low_contrast'
+    elif sharpness < QUALITY_MIN_SHARPNESS:
+        reason = 'blurry'
+    return {
+        'usable': reason is None,
+        'reason': reason,
+        'brightness': brightness,
+        'contrast': contrast,
+        'sharpness': sharpness,
+    }
+
+def unusable_frame_result(reason: str) -> Dict[str, Union[str, float, Dict[str, float]]]:
+    """
+    Neutral fallback flagged with why no inference was run.
+    """
+    return {**neutral_fallback(), 'quality_issue': reason}
+
+def top_class_margin(emotion_scores: Dict[str, float]) -> float:
+    """
+    Gap between the two most likely emotions; small means the model is unsure.
+    """
+    top = sorted(emotion_scores.values(), reverse=True)
+    return top[0] - (top[1] if len(top) > 1 else 0.0)
+
+def record_results(results: List[Dict]) -> None:
+    """
+    Count quality-gate rejections and which cascade tier answered each fresh result.
+    
+    Called in the serving process (pool worker metrics are not visible here).
+    """
+    for result in results:
+        if result.get('quality_issue'):
+            metrics.inc('frame_quality.rejected')
+            metrics.inc(f"frame_quality.rejected.{result['quality_issue']}")
+    if not cascade_enabled():
+        return
+    for result in results:
+        tier = result.get('tier')
+        if tier == 'fast':
+            metrics.inc('emotion_cascade.fast')
+        elif tier == 'deepface':
+            metrics.inc('emotion_cascade.escalated')
+    answered = metrics.counter('emotion_cascade.fast') + metrics.counter('emotion_cascade.escalated')
+    if answered:
+        metrics.set_gauge('emotion_cascade.escalation_rate', metrics.counter('emotion_cascade.escalated') / answered)
+
+def crop_face(image_array: np.ndarray, region: Dict[str, int]) -> np.ndarray:
+    """
+    Cut a face region (x, y, w, h) out of an image, clamped to the image bounds.
+    """
+    height, width = image_array.shape[:2]
+    x0 = max(0, int(region['x']))
+    y0 = max(0, int(region['y']))
+    x1 = min(width, x0 + max(1, int(region['w'])))
+    y1 = min(height, y0 + max(1, int(region['h'])))
+    return image_array[y0:y1, x0:x1]
+
+def detection_copy(image_array: np.ndarray, max_dimension: int = DETECTION_DIMENSION) -> Tuple[np.ndarray, float]:
+    """
+    Downscale a frame to a grayscale copy for face detection.
+    
+    The shorter side is kept at or above MIN_DETECTION_DIMENSION. The gray
+    copy is expanded back to three channels because the DeepFace detectors
+    expect color input.
+    
+    Returns:
+        tuple: (detection image, scale from working-frame to detection coordinates)
+    """
+    height, width = image_array.shape[:2]
+    scale = 1.0
+    if max_dimension > 0:
+        scale = min(1.0, max(max_dimension / max(height, width), MIN_DETECTION_DIMENSION / max(1, min(height, width))))
+    if scale >= 1.0:
+        return image_array, 1.0
+    small = cv2.resize(image_array, (max(1, round(width * scale)), max(1, round(height * scale))),
+                       interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), cv2.COLOR_GRAY2RGB)
+    return small, scale
+
+def face_crop(image_array: np.ndarray, region: Dict[str, float], margin: float = FACE_CROP_MARGIN) -> np.ndarray:
+    """
+    Cut a detected face out of the working frame, padded by `margin` on every side.
+    """
+    height, width = image_array.shape[:2]
+    return crop_face(image_array, expand_region(region, margin, width, height))
+
 class EmotionDetector:
-    def __init__(self):
-        pass
+    def __init__(self, registry: Optional[ModelRegistry] = None, cascade_margin: float = CASCADE_MARGIN):
+        """
+        Args:
+            registry (ModelRegistry, optional): Shared model registry. Defaults to
+                the process-wide registry warmed up by the FastAPI lifespan.
+            cascade_margin (float): Fast-tier top-class margin below which a
+                face escalates to DeepFace (env EMOTION_CASCADE_MARGIN)
+        """
+        self.registry = registry or get_model_registry()
+        self.cascade_margin = cascade_margin
         
     def detect_emotion(self, image_array: np.ndarray) -> Dict[str, Union[str, float, Dict[str, float]]]:
         """
@@ -46,44 +306,37 @@ class EmotionDetector:
         try:
             logger.debug(f"Input image array shape: {image_array.shape}, dtype: {image_array.dtype}")
             
-            debug_images = os.getenv("DEBUG_IMAGES", "false").lower() == "true"
-            if debug_images:
-                debug_path = "debug_input.png"
-                Image.fromarray(image_array).save(debug_path)
-                logger.debug(f"Saved input image to {debug_path}")
+            debug_images = os.getenv("DEBUG_IMAGES", "false").lower() == "true"
+            if debug_images:
+                debug_path = "debug_input.png"
+                Image.fromarray(image_array).save(debug_path)
+                logger.debug(f"Saved input image to {debug_path}")
+            
+            # Make sure the shared models exist even if warm-up has not run
+            # (e.g. scripts that use the detector outside the FastAPI app)
+            self.registry.load()
             
             # Use DeepFace for emotion detection with fallback
             try:
-                # First try with enforce_detection=False to be more lenient
-                result = DeepFace.analyze(
-                    image_array,
-                    actions=['emotion'],
-                    enforce_detection=False,  # More lenient face detection
-                    detector_backend='opencv'  # Use OpenCV for faster detection
-                )
-                
-                if not result or not isinstance(result, list) or len(result) == 0:
-                    logger.warning("DeepFace returned no results with lenient detection, trying with different backend")
-                    # Try with a different detector backend
-                    result = DeepFace.analyze(
-                        image_array,
-                        actions=['emotion'],
-                        enforce_detection=False,
-                        detector_backend='retinaface'  # Try alternative face detector
-                    )
+                # Try each configured backend in order (fast 'opencv' first,
+                # accurate 'retinaface' after), lenient about face detection
+                result = None
+                for backend in self.registry.detector_backends:
+                    with self.registry.using_detector(backend):
+                        result = DeepFace.analyze(
+                            image_array,
+                            actions=['emotion'],
+                            enforce_detection=False,  # More lenient face detection
+                            detector_backend=backend
+                        )
+                    if result and isinstance(result, list) and len(result) > 0:
+                        break
+                    logger.warning(f"DeepFace returned no results with backend '{backend}', trying next backend")
                 
                 if not result or not isinstance(result, list) or len(result) == 0:
                     logger.warning("DeepFace returned no results with all detection methods")
                     # Return a neutral fallback when detection fails
-                    return {
-                        'emotion': 'neutral',
-                        'confidence': 0.5,
-                        'emotion_scores': {
-                            'angry': 0.05, 'disgust': 0.05, 'fear': 0.05, 
-                            'happy': 0.1, 'sad': 0.1, 'surprise': 0.05, 
-                            'neutral': 0.6
-                        }
-                    }
+                    return neutral_fallback()
                     
                 # Get the first face result
                 face_result = result[0]
@@ -93,69 +346,455 @@ class EmotionDetector:
                 emotion_scores = face_result.get('emotion', {})
                 if not emotion_scores:
                     logger.warning("No emotion scores in DeepFace result, using fallback")
-                    return {
-                        'emotion': 'neutral',
-                        'confidence': 0.5,
-                        'emotion_scores': {
-                            'angry': 0.05, 'disgust': 0.05, 'fear': 0.05, 
-                            'happy': 0.1, 'sad': 0.1, 'surprise': 0.05, 
-                            'neutral': 0.6
-                        }
-                    }
+                    return neutral_fallback()
                     
-                # Find the dominant emotion
-                dominant_emotion = max(emotion_scores.items(), key=lambda x: x[1])
-                
-                # Normalize emotion names to match our supported list
-                emotion_name = dominant_emotion[0].lower()
-                # Map 'disgust' to 'disgusted', etc. to match spotify_service.py mood names
-                emotion_map = {
-                    'disgust': 'disgusted',
-                    'fear': 'fearful',
-                    'surprise': 'surprised'
-                }
-                emotion_name = emotion_map.get(emotion_name, emotion_name)
-                
-                return {
-                    'emotion': emotion_name,
-                    'confidence': dominant_emotion[1] / 100.0,  # Convert percentage to decimal
-                    'emotion_scores': {k.lower(): v/100.0 for k, v in emotion_scores.items()}
-                }
+                # DeepFace reports percentages; convert to decimals
+                return scores_to_result({k.lower(): v/100.0 for k, v in emotion_scores.items()})
                 
             except Exception as e:
                 logger.error(f"DeepFace analysis failed: {str(e)}")
                 logger.error(traceback.format_exc())
                 # Return a fallback emotion rather than None
-                return {
-                    'emotion': 'neutral',
-                    'confidence': 0.5,
-                    'emotion_scores': {
-                        'angry': 0.05, 'disgust': 0.05, 'fear': 0.05, 
-                        'happy': 0.1, 'sad': 0.1, 'surprise': 0.05, 
-                        'neutral': 0.6
-                    }
-                }
+                return neutral_fallback()
             
         except Exception as e:
             logger.error(f"Error detecting emotion: {e}")
             logger.error(traceback.format_exc())
             # Return a fallback emotion rather than None
-            return {
-                'emotion': 'neutral',
-                'confidence': 0.5,
-                'emotion_scores': {
-                    'angry': 0.05, 'disgust': 0.05, 'fear': 0.05, 
-                    'happy': 0.1, 'sad': 0.1, 'surprise': 0.05, 
-                    'neutral': 0.6
-                }
-            }
-
-def decode_image(image_str: str) -> np.ndarray:
+            return neutral_fallback()
+
+    def detect_faces(
+        self,
+        image_array: np.ndarray,
+        detector_backends: Optional[List[str]] = None
+    ) -> List[Dict[str, float]]:
+        """
+        Locate faces using the configured detector cascade.
+        
+        Detection runs on a downscaled grayscale copy and the boxes are mapped
+        back to `image_array` coordinates; when the copy yields no confident
+        face, it is retried once at full resolution.
+        
+        Args:
+            image_array (np.ndarray): Image as NumPy array
+            detector_backends (list, optional): Backends to try instead of the
+                registry's cascade, e.g. only 'opencv' under load
+            
+        Returns:
+            list: Face regions as dicts with x, y, w, h and confidence
+        """
+        self.registry.load()
+        small, scale = detection_copy(image_array)
+        started = time.perf_counter()
+        faces = self._locate_faces(small, detector_backends)
+        metrics.observe('face_detection.latency_ms', (time.perf_counter() - started) * 1000)
+        if scale < 1.0:
+            if any(face['confidence'] > 0 for face in faces):
+                return [
+                    {
+                        **{key: int(round(face[key] / scale)) for key in ('x', 'y', 'w', 'h')},
+                        'confidence': face['confidence']
+                    }
+                    for face in faces
+                ]
+            # Faces too small to survive the downscale
+            metrics.inc('face_detection.full_resolution_retries')
+            faces = self._locate_faces(image_array, detector_backends)
+        return faces
+    
+    def _locate_faces(self, image_array: np.ndarray, detector_backends: Optional[List[str]]) -> List[Dict[str, float]]:
+        for backend in detector_backends or self.registry.detector_backends:
+            try:
+                with self.registry.using_detector(backend):
+                    faces = DeepFace.extract_faces(
+                        image_array,
+                        detector_backend=backend,
+                        enforce_detection=False
+                    )
+            except Exception as e:
+                logger.warning(f"Face detection failed with backend '{backend}': {e}")
+                continue
+            if faces:
+                # Newer DeepFace releases add eye positions to facial_area; keep the box only
+                return [
+                    {
+                        **{key: face['facial_area'][key] for key in ('x', 'y', 'w', 'h')},
+                        'confidence': float(face.get('confidence') or 0.0)
+                    }
+                    for face in faces
+                ]
+            logger.warning(f"No faces found with backend '{backend}', trying next backend")
+        return []
+    
+    def detect_emotion_batch(
+        self,
+        images: List[np.ndarray],
+        face_regions: Optional[List[Optional[Dict[str, float]]]] = None,
+        detector_backends: Optional[List[Optional[List[str]]]] = None
+    ) -> List[Dict[str, Union[str, float, Dict[str, float]]]]:
+        """
+        Detect emotions for several images with a single emotion model forward pass.
+        
+        Face detection still runs per image, but the resulting face crops are
+        classified together, which is what the inference scheduler batches.
+        
+        Args:
+            images (list): Images as NumPy arrays
+            face_regions (list, optional): Known face box per image (e.g. from a
+                face tracker). Images with a box skip face detection entirely
+                and are cropped to the box as given.
+            detector_backends (list, optional): Detector cascade override per
+                image; None entries use the registry's cascade
+            
+        Returns:
+            list: One result dict per image, in input order. Results of detected
+                faces carry the box used under 'face_region'.
+        """
+        face_regions = face_regions or [None] * len(images)
+        detector_backends = detector_backends or [None] * len(images)
+        results: List[Optional[Dict]] = [None] * len(images)
+        crops, owners, used_regions = [], [], []
+        for index, (image_array, region, backends) in enumerate(zip(images, face_regions, detector_backends)):
+            if QUALITY_GATE_ENABLED:
+                quality = assess_frame_quality(image_array)
+                if not quality['usable']:
+                    logger.info(f"Skipping unusable frame: {quality}")
+                    results[index] = unusable_frame_result(quality['reason'])
+                    continue
+            if region is None:
+                try:
+                    faces = self.detect_faces(image_array, backends)
+                except Exception as e:
+                    logger.error(f"Error detecting faces: {e}")
+                    faces = []
+                if not faces:
+                    results[index] = unusable_frame_result('no_face')
+                    continue
+                # Keep the first face, matching detect_emotion
+                region = faces[0]
+                crops.append(face_crop(image_array, region))
+            else:
+                # Supplied boxes (e.g. the tracker's) already carry their own margin
+                crops.append(crop_face(image_array, region))
+            owners.append(index)
+            used_regions.append(region)
+        
+        try:
+            classified = self.classify_faces(crops)
+        except Exception as e:
+            logger.error(f"Batched emotion inference failed: {e}")
+            logger.error(traceback.format_exc())
+            classified = [(None, None)] * len(crops)
+        
+        for index, (emotion_scores, tier), region in zip(owners, classified, used_regions):
+            if emotion_scores:
+                results[index] = {**scores_to_result(emotion_scores), 'face_region': region, 'tier': tier}
+            else:
+                results[index] = neutral_fallback()
+        return results
+    
+    def classify_faces(self, crops: List[np.ndarray]) -> List[Tuple[Dict[str, float], str]]:
+        """
+        Classify face crops, through the confidence-gated cascade when enabled.
+        
+        Each tier runs as one batched forward pass: all crops through the fast
+        tier, then only the uncertain ones through DeepFace.
+        
+        Args:
+            crops (list): RGB face crops
+            
+        Returns:
+            list: (emotion scores, tier) per crop; tier is 'fast' or 'deepface'
+        """
+        if not crops:
+            return []
+        if not (cascade_enabled() and self.registry.load_fast_tier()):
+            return [(scores, 'deepface') for scores in self.registry.predict_emotions(crops)]
+        
+        try:
+            classified = [(scores, 'fast') for scores in self.registry.predict_fast(crops)]
+        except Exception as e:
+            logger.error(f"Fast-tier inference failed, escalating all faces: {e}")
+            classified = [({}, 'fast')] * len(crops)
+        
+        escalate = [
+            index for index, (scores, _) in enumerate(classified)
+            if not scores or top_class_margin(scores) < self.cascade_margin
+        ]
+        if escalate:
+            accurate = self.registry.predict_emotions([crops[index] for index in escalate])
+            for index, scores in zip(escalate, accurate):
+                classified[index] = (scores, 'deepface')
+        return classified
+
+    def detect_group_emotion(
+        self,
+        image_array: np.ndarray,
+        max_faces: int = GROUP_MAX_FACES,
+        detector_backends: Optional[List[str]] = None
+    ) -> Dict[str, Union[str, float, Dict[str, float], List[Dict]]]:
+        """
+        Detect the emotion of every face in an image and the group's aggregate mood.
+        
+        All face crops are classified in a single batched forward pass.
+        
+        Args:
+            image_array (np.ndarray): Image as NumPy array
+            max_faces (int): Most faces to classify; the largest are kept
+            detector_backends (list, optional): Detector cascade override
+            
+        Returns:
+            dict: Aggregate emotion, confidence and emotion scores, plus
+                'faces' (per-face results with 'face_region') and 'face_count'
+        """
+        if QUALITY_GATE_ENABLED:
+            quality = assess_frame_quality(image_array)
+            if not quality['usable']:
+                logger.info(f"Skipping unusable group frame: {quality}")
+                return {**unusable_frame_result(quality['reason']), 'faces': [], 'face_count': 0}
+        
+        try:
+            faces = self.detect_faces(image_array, detector_backends)
+        except Exception as e:
+            logger.error(f"Error detecting faces: {e}")
+            faces = []
+        
+        # Without enforce_detection the detectors return the whole image with
+        # confidence 0 when they find nothing; only keep that if it is all we have
+        regions = [face for face in faces if face['confidence'] > 0] or faces[:1]
+        regions = sorted(regions, key=lambda face: face['w'] * face['h'], reverse=True)[:max_faces]
+        if not regions:
+            return {**unusable_frame_result('no_face'), 'faces': [], 'face_count': 0}
+        
+        try:
+            classified = self.classify_faces([face_crop(image_array, region) for region in regions])
+        except Exception as e:
+            logger.error(f"Batched group emotion inference failed: {e}")
+            logger.error(traceback.format_exc())
+            return {**neutral_fallback(), 'faces': [], 'face_count': 0}
+        
+        face_results = [
+            {**scores_to_result(emotion_scores), 'face_region': region, 'tier': tier}
+            for (emotion_scores, tier), region in zip(classified, regions)
+        ]
+        # The group answer is only as cheap as its most expensive face
+        tier = 'deepface' if any(face['tier'] == 'deepface' for face in face_results) else 'fast'
+        return {
+            **aggregate_group_mood(face_results),
+            'tier': tier,
+            'faces': face_results,
+            'face_count': len(face_results)
+        }
+
+def run_inference_batch(items: List[Tuple[np.ndarray, Optional[Dict[str, float]], Optional[List[str]]]]) -> List[Dict]:
+    """
+    Scheduler batch function: items are (image, optional face region,
+    optional detector backends) triples.
+    """
+    images = [image for image, _, _ in items]
+    regions = [region for _, region, _ in items]
+    backends = [detector_backends for _, _, detector_backends in items]
+    return get_emotion_detector().detect_emotion_batch(images, regions, backends)
+
+_detector: Optional[EmotionDetector] = None
+_scheduler: Optional[InferenceScheduler] = None
+
+def get_emotion_detector() -> EmotionDetector:
+    """
+    Return the shared EmotionDetector bound to the process-wide model registry.
+    
+    Returns:
+        EmotionDetector: Detector reused across requests
+    """
+    global _detector
+    if _detector is None:
+        _detector = EmotionDetector()
+    return _detector
+
+def get_emotion_scheduler() -> InferenceScheduler:
+    """
+    Return the micro-batching scheduler in front of the shared detector.
+    
+    Returns:
+        InferenceScheduler: Scheduler whose batches run detect_emotion_batch on
+            (frame, face region, detector backends) items
+    """
+    global _scheduler
+    if _scheduler is None:
+        pool = get_inference_pool()
+        if pool.enabled:
+            # Each batch runs in a pool worker; allow one batch per worker
+            _scheduler = InferenceScheduler(pool.detect_batch, name='emotion_batch',
+                                            max_concurrent_batches=pool.workers)
+        else:
+            _scheduler = InferenceScheduler(run_inference_batch, name='emotion_batch')
+    return _scheduler
+
+async def analyze_image(
+    image: Union[str, bytes],
+    max_dimension: int = MAX_DIMENSION,
+    detector_backends: Optional[List[str]] = None
+) -> Dict[str, Union[str, float, Dict[str, float]]]:
+    """
+    Decode an image and detect its emotion without blocking the event loop.
+    
+    With the inference pool enabled, decoding and inference both run in worker
+    processes and the decoded frame is handed over through shared memory.
+    Otherwise both stages run in threads of the serving process.
+    
+    Args:
+        image (str | bytes): Base64 encoded image string, or raw image bytes
+            from the binary upload endpoint
+        max_dimension (int): Longest side of the decoded working image
+        detector_backends (list, optional): Detector cascade override
+        
+    Returns:
+        dict: Contains emotion, confidence score, and emotion scores
+        
+    Raises:
+        ValueError: If the image cannot be decoded
+    """
+    pool = get_inference_pool()
+    cache = get_frame_cache()
+    
+    if not pool.enabled:
+        image_array, frame_hash = await asyncio.to_thread(_decode_and_hash, image, cache.enabled, max_dimension)
+        return await _analyze_cached(image_array, frame_hash, detector_backends=detector_backends,
+                                     max_dimension=max_dimension)
+    
+    frame = await pool.decode(image, with_hash=cache.enabled, max_dimension=max_dimension)
+    try:
+        return await _analyze_cached(frame, frame.frame_hash, detector_backends=detector_backends,
+                                     max_dimension=max_dimension)
+    finally:
+        pool.release(frame)
+
+async def analyze_group_image(
+    image: Union[str, bytes],
+    max_dimension: int = MAX_DIMENSION,
+    detector_backends: Optional[List[str]] = None
+) -> Dict[str, Union[str, float, Dict[str, float], List[Dict]]]:
+    """
+    Decode an image and detect the group mood of all faces in it, off the event loop.
+    
+    Each image is already a batch of faces, so this bypasses the per-request
+    micro-batching scheduler and the single-face frame cache.
+    
+    Args:
+        image (str | bytes): Base64 encoded image string, or raw image bytes
+        max_dimension (int): Longest side of the decoded working image
+        detector_backends (list, optional): Detector cascade override
+        
+    Returns:
+        dict: See EmotionDetector.detect_group_emotion
+        
+    Raises:
+        ValueError: If the image cannot be decoded
+    """
+    pool = get_inference_pool()
+    started = time.perf_counter()
+    if not pool.enabled:
+        image_array = await asyncio.to_thread(decode_any, image, max_dimension)
+        result = await asyncio.to_thread(
+            get_emotion_detector().detect_group_emotion, image_array, GROUP_MAX_FACES, detector_backends
+        )
+    else:
+        frame = await pool.decode(image, max_dimension=max_dimension)
+        try:
+            result = await pool.detect_group(frame, detector_backends)
+        finally:
+            pool.release(frame)
+    record_results(result['faces'] or [result])
+    metrics.observe('group_mood.faces', result['face_count'])
+    metrics.observe('group_mood.latency_ms', (time.perf_counter() - started) * 1000)
+    return result
+
+async def analyze_frame(
+    image_array: np.ndarray,
+    face_region: Optional[Dict[str, float]] = None,
+    detector_backends: Optional[List[str]] = None,
+    max_dimension: int = MAX_DIMENSION,
+    cache_scope: Optional[Hashable] = None
+) -> Dict[str, Union[str, float, Dict[str, float]]]:
+    """
+    Detect emotion in an already decoded frame without blocking the event loop.
+    
+    Used by callers that need the pixels themselves, such as the streaming
+    endpoint's frame-difference check. With the inference pool enabled the
+    frame is copied once into shared memory for the worker.
+    
+    Args:
+        image_array (np.ndarray): Decoded RGB frame
+        face_region (dict, optional): Known face box (x, y, w, h); when given,
+            face detection is skipped and the crop goes straight to the model
+        detector_backends (list, optional): Detector cascade override (degraded tiers)
+        max_dimension (int): Longest side the frame was decoded at; keeps
+            degraded-tier results apart from full-quality ones in the cache
+        cache_scope (hashable, optional): Client the frame belongs to (e.g. a
+            stream session); near-duplicate cache hits stay within it
+        
+    Returns:
+        dict: Contains emotion, confidence score, and emotion scores
+    """
+    pool = get_inference_pool()
+    cache = get_frame_cache()
+    frame_hash = await asyncio.to_thread(dhash, image_array) if cache.enabled else None
+    
+    if not pool.enabled:
+        return await _analyze_cached(image_array, frame_hash, face_region, detector_backends, max_dimension, cache_scope)
+    
+    frame = await await_shared_frame(asyncio.ensure_future(asyncio.to_thread(frame_to_shared, image_array, frame_hash)))
+    try:
+        return await _analyze_cached(frame, frame_hash, face_region, detector_backends, max_dimension, cache_scope)
+    finally:
+        pool.release(frame)
+
+async def _analyze_cached(
+    frame,
+    frame_hash: Optional[int],
+    face_region: Optional[Dict[str, float]] = None,
+    detector_backends: Optional[List[str]] = None,
+    max_dimension: int = MAX_DIMENSION,
+    cache_scope: Optional[Hashable] = None
+) -> Dict[str, Union[str, float, Dict[str, float]]]:
+    # frame is an ndarray, or a SharedFrame when the pool is enabled.
+    # Results are cached per quality variant so a degraded-tier result is
+    # never served to a full-quality request, or the other way round, and
+    # per client scope so near matches never cross users.
+    cache = get_frame_cache()
+    variant = (max_dimension, tuple(detector_backends) if detector_backends else None)
+    cached = cache.get(frame_hash, variant, cache_scope)
+    if cached is not None:
+        return dict(cached)
+    started = time.perf_counter()
+    result = await get_emotion_scheduler().submit((frame, face_region, detector_backends))
+    record_results([result])
+    cache.put(frame_hash, result, (time.perf_counter() - started) * 1000, variant, cache_scope)
+    return result
+
+def _decode_and_hash(
+    image: Union[str, bytes],
+    with_hash: bool,
+    max_dimension: int = MAX_DIMENSION
+) -> Tuple[np.ndarray, Optional[int]]:
+    image_array = decode_any(image, max_dimension)
+    return image_array, dhash(image_array) if with_hash else None
+
+def decode_any(image: Union[str, bytes], max_dimension: int = MAX_DIMENSION) -> np.ndarray:
+    """
+    Decode either a base64 string or raw image bytes.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return decode_image_bytes(image, max_dimension)
+    return decode_image(image, max_dimension)
+
+def decode_image(image_str: str, max_dimension: int = MAX_DIMENSION) -> np.ndarray:
     """
     Decode base64 image string to NumPy array.
     
     Args:
         image_str (str): Base64 encoded image string
+        max_dimension (int): Longest side of the decoded working image
     
     Returns:
         np.ndarray: Decoded image as NumPy array
@@ -177,7 +816,30 @@ def decode_image(image_str: str) -> np.ndarray:
             logger.error(f"Base64 decoding failed: {e}")
             raise ValueError("Invalid base64 data")
         
-        # Convert to PIL Image
+        return decode_image_bytes(image_data, max_dimension)
+    
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error decoding image: {e}")
+        logger.error(traceback.format_exc())
+        raise ValueError("Invalid image format")
+
+def decode_image_bytes(image_data: bytes, max_dimension: int = MAX_DIMENSION) -> np.ndarray:
+    """
+    Decode raw JPEG/PNG bytes to NumPy array.
+    
+    Used directly by the binary upload endpoint, which skips the base64 step.
+    
+    Args:
+        image_data (bytes): Encoded image file contents
+        max_dimension (int): Longest side of the decoded working image
+    
+    Returns:
+        np.ndarray: Decoded image as NumPy array
+    """
+    try:
+        # Convert to PIL Image (only the header is read at this point)
         try:
             image = Image.open(io.BytesIO(image_data))
             logger.debug(f"Successfully opened image: format={image.format}, size={image.size}, mode={image.mode}")
@@ -185,44 +847,61 @@ def decode_image(image_str: str) -> np.ndarray:
             logger.error(f"Failed to open image data: {e}")
             raise ValueError("Invalid image format")
         
+        # Refuse decompression bombs before the bitmap is allocated
+        check_image_dimensions(*image.size)
+        
+        # Decode large JPEGs directly near the working size: draft() makes
+        # libjpeg scale the DCT by 1/2, 1/4 or 1/8, so a 12MP phone photo is
+        # never fully decompressed. The result is still >= the requested size.
+        if image.format == 'JPEG' and max(image.size) > max_dimension:
+            ratio = max_dimension / max(image.size)
+            requested = tuple(max(1, int(dim * ratio)) for dim in image.size)
+            original_size = image.size
+            image.draft('RGB', requested)
+            logger.debug(f"JPEG draft decode from {original_size} to {image.size}")
+        
         # Convert to RGB if needed and ensure proper size
         if image.mode != 'RGB':
             logger.debug(f"Converting image from {image.mode} to RGB")
             image = image.convert('RGB')
         
-        debug_images = os.getenv("DEBUG_IMAGES", "false").lower() == "true"
-        if debug_images:
-            debug_path = "debug_original.png"
-            image.save(debug_path)
-            logger.debug(f"Saved original image to {debug_path}")
-        
-        # Ensure minimum size for face detection
-        min_dimension = 480
-        if min(image.size) < min_dimension:
-            ratio = min_dimension / min(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            logger.debug(f"Upscaling image from {image.size} to {new_size}")
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
+        debug_images = os.getenv("DEBUG_IMAGES", "false").lower() == "true"
+        if debug_images:
+            debug_path = "debug_original.png"
+            image.save(debug_path)
+            logger.debug(f"Saved original image to {debug_path}")
         
-        # Resize if image is too large
-        max_dimension = 1024
+        # Resize if image is too large. Bilinear is plenty for face detection
+        # and much cheaper than LANCZOS, especially after a draft decode.
         if max(image.size) > max_dimension:
             ratio = max_dimension / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
+            new_size = tuple(max(1, int(dim * ratio)) for dim in image.size)
             logger.debug(f"Downscaling image from {image.size} to {new_size}")
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
+            image = image.resize(new_size, Image.Resampling.BILINEAR)
+        
+        # Upscaling adds no detail; only do it when the frame is too small for
+        # the detectors to find a face at all, and never past max_dimension
+        # (a long, thin strip would otherwise grow beyond it)
+        if min(image.size) < MIN_DETECTION_DIMENSION:
+            ratio = min(MIN_DETECTION_DIMENSION / min(image.size), max_dimension / max(image.size))
+            new_size = tuple(max(1, int(dim * ratio)) for dim in image.size)
+            logger.debug(f"Upscaling image from {image.size} to {new_size}")
+            image = image.resize(new_size, Image.Resampling.BILINEAR)
         
         # Convert to NumPy array
         image_array = np.array(image)
         logger.debug(f"Converted to NumPy array with shape: {image_array.shape}, dtype: {image_array.dtype}")
         
-        if debug_images:
-            debug_path = "debug_processed.png"
-            Image.fromarray(image_array).save(debug_path)
-            logger.debug(f"Saved processed image to {debug_path}")
+        if debug_images:
+            debug_path = "debug_processed.png"
+            Image.fromarray(image_array).save(debug_path)
+            logger.debug(f"Saved processed image to {debug_path}")
         
         return image_array
     
+    except ImageTooLarge:
+        # A size limit, not a broken file: keep the reason and skip the traceback
+        raise
     except Exception as e:
         logger.error(f"Error decoding image: {e}")
         logger.error(traceback.format_exc())
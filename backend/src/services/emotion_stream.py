@@ -0,0 +1,197 @@
+"""
+Emotion Streaming Sessions
+
+Per-connection state for the `/api/emotion/stream` WebSocket, which replaces
+the frontend's polling of `/api/emotion/detect` with a continuous stream of
+binary frames.
+
+Key Architectural Decisions:
+1. Latest Frame Wins: The endpoint keeps a single pending-frame slot. If a new
+   frame arrives while the previous one is still being analysed, the older one
+   is dropped instead of queued, so latency never grows with the backlog.
+2. Frame Skipping: Each frame is reduced to a tiny grayscale thumbnail and
+   compared with the last analysed one. Frames whose mean absolute pixel
+   difference is below `diff_threshold` are skipped without inference.
+3. Temporal Smoothing: Emotion scores are smoothed with an exponential moving
+   average, which removes single-frame flicker from the dominant mood.
+4. Keyframe Detection: A per-session `FaceTracker` follows the face between
+   detector keyframes, and its margin-padded box is sent straight to the
+   emotion model. `detector_calls` versus `frames_analyzed` and the
+   `emotion_stream.frame_latency_ms` histogram show the saving.
+5. Load-Adaptive Frames: The endpoint passes the degradation controller's
+   current tier, so each frame is decoded at the tier's `max_dimension` and
+   detected with its detector cascade, like `/detect` requests. A change of
+   working resolution drops the face track and the last thumbnail, so the
+   next frame is a keyframe in the new coordinates.
+6. Change-Driven Playlists: `mood_changed` is only set when the smoothed
+   dominant mood differs from the last one sent, so the endpoint fetches a
+   playlist once per real mood change instead of once per frame.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from .degradation import QUALITY_TIERS, QualityTier
+from .emotion_detection import analyze_frame, decode_image_bytes, scores_to_result
+from .model_registry import get_configured_backends
+from .face_tracker import FaceTracker
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Size of the thumbnail used for frame differencing
+DIFF_THUMBNAIL_SIZE = (32, 24)
+
+
+def frame_thumbnail(image_array: np.ndarray) -> np.ndarray:
+    """
+    Tiny grayscale copy of a frame used for cheap change detection.
+    """
+    gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY) if image_array.ndim == 3 else image_array
+    return cv2.resize(gray, DIFF_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class EmotionStreamSession:
+    """
+    Smoothing and skipping state for one streaming client.
+
+    Args:
+        diff_threshold: Mean absolute pixel difference (0-255) below which a
+            frame is skipped (env STREAM_DIFF_THRESHOLD, default 4)
+        smoothing_alpha: Weight of the newest frame in the moving average
+            (env STREAM_SMOOTHING_ALPHA, default 0.3)
+    """
+
+    def __init__(self, diff_threshold: Optional[float] = None, smoothing_alpha: Optional[float] = None):
+        self.diff_threshold = diff_threshold if diff_threshold is not None else float(os.getenv('STREAM_DIFF_THRESHOLD', 4))
+        self.smoothing_alpha = smoothing_alpha if smoothing_alpha is not None else float(os.getenv('STREAM_SMOOTHING_ALPHA', 0.3))
+        self.smoothed_scores: Optional[Dict[str, float]] = None
+        self.current_mood: Optional[str] = None
+        self._last_thumbnail: Optional[np.ndarray] = None
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_skipped = 0
+        self.frames_analyzed = 0
+        self.detector_calls = 0
+        self.tracker = FaceTracker()
+        self._detector_backends = None
+        self._max_dimension = QUALITY_TIERS[0].max_dimension
+        # Frame-cache scope: near-duplicate hits only come from this session
+        self.cache_scope = uuid.uuid4().hex
+
+    def frame_received(self, replaced_pending: bool) -> None:
+        """
+        Count an incoming frame; `replaced_pending` means an unprocessed frame was dropped.
+        """
+        self.frames_received += 1
+        metrics.inc('emotion_stream.frames_received')
+        if replaced_pending:
+            self.frames_dropped += 1
+            metrics.inc('emotion_stream.frames_dropped')
+
+    def smooth(self, emotion_scores: Dict[str, float]) -> Dict[str, float]:
+        """
+        Fold new scores into the exponential moving average.
+        """
+        if self.smoothed_scores is None:
+            self.smoothed_scores = dict(emotion_scores)
+        else:
+            alpha = self.smoothing_alpha
+            labels = set(self.smoothed_scores) | set(emotion_scores)
+            self.smoothed_scores = {
+                label: alpha * emotion_scores.get(label, 0.0) + (1 - alpha) * self.smoothed_scores.get(label, 0.0)
+                for label in labels
+            }
+        return self.smoothed_scores
+
+    async def process(self, image_bytes: bytes, quality: Optional[QualityTier] = None) -> Optional[Dict[str, Any]]:
+        """
+        Analyse one frame and return the update to push, or None if skipped.
+
+        Args:
+            image_bytes: Encoded frame
+            quality: Degradation tier to analyse at (default: full quality)
+
+        Raises:
+            ValueError: If the frame cannot be decoded
+        """
+        quality = quality or QUALITY_TIERS[0]
+        self._detector_backends = None if quality.detector_fallback else get_configured_backends()[:1]
+        if quality.max_dimension != self._max_dimension:
+            # The tracker's box and template are in the old frame size
+            self.tracker.lose()
+            self._last_thumbnail = None
+            self._max_dimension = quality.max_dimension
+        image_array = await asyncio.to_thread(decode_image_bytes, image_bytes, quality.max_dimension)
+        thumbnail = frame_thumbnail(image_array)
+        if self._last_thumbnail is not None:
+            difference = float(np.mean(np.abs(thumbnail - self._last_thumbnail)))
+            if difference < self.diff_threshold:
+                self.frames_skipped += 1
+                metrics.inc('emotion_stream.frames_skipped')
+                return None
+
+        started = time.perf_counter()
+        result = await self._analyze(image_array)
+        metrics.observe('emotion_stream.frame_latency_ms', (time.perf_counter() - started) * 1000)
+        self._last_thumbnail = thumbnail
+        self.frames_analyzed += 1
+        metrics.inc('emotion_stream.frames_analyzed')
+        metrics.set_gauge('emotion_stream.detector_call_rate',
+                          metrics.counter('emotion_stream.detector_calls') / metrics.counter('emotion_stream.frames_analyzed'))
+
+        if result.get('quality_issue'):
+            # An unusable frame carries no mood; leave the smoothed state untouched
+            return {'type': 'quality', 'quality_issue': result['quality_issue'], 'stats': self.stats()}
+
+        smoothed = scores_to_result(self.smooth(result['emotion_scores']))
+        mood_changed = smoothed['emotion'] != self.current_mood
+        self.current_mood = smoothed['emotion']
+
+        return {
+            'type': 'emotion',
+            'emotion': smoothed['emotion'],
+            'confidence': smoothed['confidence'],
+            'emotion_scores': smoothed['emotion_scores'],
+            'mood_changed': mood_changed,
+            'stats': self.stats(),
+        }
+
+    async def _analyze(self, image_array: np.ndarray) -> Dict[str, Any]:
+        # Between keyframes the tracker supplies the face box and detection is skipped
+        if not self.tracker.needs_detection():
+            region = await asyncio.to_thread(self.tracker.track, image_array)
+            if region is not None:
+                return await analyze_frame(image_array, face_region=self.tracker.crop_region(image_array),
+                                           detector_backends=self._detector_backends,
+                                           max_dimension=self._max_dimension, cache_scope=self.cache_scope)
+
+        self.detector_calls += 1
+        metrics.inc('emotion_stream.detector_calls')
+        result = await analyze_frame(image_array, detector_backends=self._detector_backends,
+                                     max_dimension=self._max_dimension, cache_scope=self.cache_scope)
+        region = result.get('face_region')
+        if region and region.get('confidence', 1.0) > 0:
+            await asyncio.to_thread(self.tracker.start, image_array, region)
+        else:
+            self.tracker.lose()
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'frames_received': self.frames_received,
+            'frames_analyzed': self.frames_analyzed,
+            'frames_skipped': self.frames_skipped,
+            'frames_dropped': self.frames_dropped,
+            'detector_calls': self.detector_calls,
+        }
+
+
+__all__ = ['EmotionStreamSession', 'frame_thumbnail']
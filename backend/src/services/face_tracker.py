@@ -0,0 +1,152 @@
+"""
+Face Tracker
+
+Per-session face tracking for the streaming endpoint, so the face detector
+(DeepFace's 'opencv' backend with its 'retinaface' fallback) only runs on
+keyframes.
+
+Key Architectural Decisions:
+1. Keyframes: Full detection runs on the first frame, every
+   `keyframe_interval` frames after that, and whenever tracking is lost. This
+   bounds drift while skipping detection on most frames.
+2. Template Matching: Between keyframes the face patch from the last keyframe
+   is located with normalized cross-correlation in a search window around the
+   previous box. Matching runs on a copy scaled so the face is only
+   ~`TEMPLATE_SIZE` pixels wide, which keeps the cost well under a millisecond.
+   A match score below `min_score` counts as lost (face left, occluded, or
+   moved too fast).
+3. Margin Crops: The tracked box is widened by `margin` before it is handed to
+   the emotion model, so small tracking errors never cut into the face.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Width in pixels of the face template after scaling
+TEMPLATE_SIZE = 40
+
+
+def expand_region(region: Dict[str, float], margin: float, width: int, height: int) -> Dict[str, int]:
+    """
+    Grow a face box by `margin` of its size on every side, clamped to the image.
+    """
+    pad_x = region['w'] * margin
+    pad_y = region['h'] * margin
+    x0 = max(0, int(region['x'] - pad_x))
+    y0 = max(0, int(region['y'] - pad_y))
+    x1 = min(width, int(region['x'] + region['w'] + pad_x))
+    y1 = min(height, int(region['y'] + region['h'] + pad_y))
+    return {'x': x0, 'y': y0, 'w': max(1, x1 - x0), 'h': max(1, y1 - y0)}
+
+
+class FaceTracker:
+    """
+    Track one face between detector keyframes.
+
+    Args:
+        keyframe_interval: Frames between forced detections
+            (env FACE_TRACKER_KEYFRAME_INTERVAL, default 10)
+        margin: Fraction of the box added on each side for search and crops
+            (env FACE_TRACKER_MARGIN, default 0.2)
+        min_score: Lowest template match score still considered tracked
+            (env FACE_TRACKER_MIN_SCORE, default 0.6)
+    """
+
+    def __init__(
+        self,
+        keyframe_interval: Optional[int] = None,
+        margin: Optional[float] = None,
+        min_score: Optional[float] = None
+    ):
+        self.keyframe_interval = keyframe_interval or int(os.getenv('FACE_TRACKER_KEYFRAME_INTERVAL', 10))
+        self.margin = margin if margin is not None else float(os.getenv('FACE_TRACKER_MARGIN', 0.2))
+        self.min_score = min_score if min_score is not None else float(os.getenv('FACE_TRACKER_MIN_SCORE', 0.6))
+        self.region: Optional[Dict[str, float]] = None
+        self._template: Optional[np.ndarray] = None
+        self._scale = 1.0
+        self._frames_since_keyframe = 0
+
+    def needs_detection(self) -> bool:
+        """True when the next frame should be a detector keyframe."""
+        return self.region is None or self._frames_since_keyframe >= self.keyframe_interval
+
+    def _scaled_gray(self, image_array: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY) if image_array.ndim == 3 else image_array
+        return cv2.resize(gray, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+
+    def start(self, image_array: np.ndarray, region: Dict[str, float]) -> None:
+        """
+        Begin tracking from a detector result on a keyframe.
+        """
+        self.region = {key: float(region[key]) for key in ('x', 'y', 'w', 'h')}
+        self._scale = min(1.0, TEMPLATE_SIZE / max(1.0, self.region['w'], self.region['h']))
+        gray = self._scaled_gray(image_array)
+        x, y = int(self.region['x'] * self._scale), int(self.region['y'] * self._scale)
+        w = max(1, int(self.region['w'] * self._scale))
+        h = max(1, int(self.region['h'] * self._scale))
+        self._template = gray[y:y + h, x:x + w].copy()
+        self._frames_since_keyframe = 0
+        metrics.inc('face_tracker.keyframes')
+
+    def lose(self) -> None:
+        self.region = None
+        self._template = None
+
+    def track(self, image_array: np.ndarray) -> Optional[Dict[str, float]]:
+        """
+        Locate the face in a new frame without running the detector.
+
+        Returns:
+            dict | None: Updated face box, or None if tracking was lost
+        """
+        if self.region is None or self._template is None or self._template.size == 0:
+            return None
+
+        gray = self._scaled_gray(image_array)
+        height, width = gray.shape[:2]
+        scaled = {key: value * self._scale for key, value in self.region.items()}
+        window = expand_region(scaled, self.margin, width, height)
+        search = gray[window['y']:window['y'] + window['h'], window['x']:window['x'] + window['w']]
+        template_h, template_w = self._template.shape[:2]
+        if search.shape[0] < template_h or search.shape[1] < template_w:
+            self.lose()
+            metrics.inc('face_tracker.lost')
+            return None
+
+        scores = cv2.matchTemplate(search, self._template, cv2.TM_CCOEFF_NORMED)
+        _, best_score, _, best_location = cv2.minMaxLoc(scores)
+        if best_score < self.min_score:
+            logger.debug(f"Face tracking lost (match score {best_score:.2f})")
+            self.lose()
+            metrics.inc('face_tracker.lost')
+            return None
+
+        self.region = {
+            'x': (window['x'] + best_location[0]) / self._scale,
+            'y': (window['y'] + best_location[1]) / self._scale,
+            'w': self.region['w'],
+            'h': self.region['h'],
+        }
+        self._frames_since_keyframe += 1
+        metrics.inc('face_tracker.tracked_frames')
+        return self.region
+
+    def crop_region(self, image_array: np.ndarray) -> Optional[Dict[str, int]]:
+        """
+        Current box widened by the margin, ready to be cut from the frame.
+        """
+        if self.region is None:
+            return None
+        height, width = image_array.shape[:2]
+        return expand_region(self.region, self.margin, width, height)
+
+
+__all__ = ['FaceTracker', 'expand_region']
@@ -0,0 +1,203 @@
+"""
+Frame Result Cache
+
+Webcam clients send near-identical frames over and over. This module caches
+emotion results keyed by a perceptual hash of the frame so a repeat frame is
+answered without another DeepFace pass.
+
+Key Architectural Decisions:
+1. Difference Hash (dHash): The frame is shrunk to a 9x8 grayscale thumbnail
+   and each bit records whether a pixel is brighter than its right neighbour.
+   Small changes in noise, compression or exposure flip only a few of the 64
+   bits, so "the same scene" is a small Hamming distance rather than an exact
+   match.
+2. Bounded LRU + TTL: At most `max_entries` results are kept and each expires
+   after `ttl_seconds`, so a user who actually changes expression is
+   re-analysed within seconds and memory stays constant.
+3. Thread Safety: All cache operations take a lock, so the same instance can be
+   used from the async endpoints and from scheduler/pool threads. The hash is
+   computed wherever the pixels are (a pool worker computes it while
+   decoding), so frames never need to be copied just to be hashed.
+4. Quality Variants: A result is only as good as the resolution and detector
+   cascade it was computed with, so entries carry a `variant` key (the
+   degradation tier's settings) and a lookup only matches entries of the same
+   variant. Results from a degraded tier are never served at full quality.
+5. Client Scopes: Two users' frames can hash within a few bits of each other
+   (a small face against a plain wall), and a near match would hand one user
+   the other's emotion and face box. Callers that know their client (a
+   stream session) pass a `scope`, and near matches are only made within that
+   scope. Unscoped lookups (one-off uploads) only match the exact hash.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from .metrics import metrics
+
+# Bits per side of the dHash grid (hash_size x hash_size bits)
+HASH_SIZE = 8
+
+
+def dhash(image_array, hash_size: int = HASH_SIZE) -> int:
+    """
+    Compute a difference hash of an RGB or grayscale frame.
+
+    Args:
+        image_array (np.ndarray): Frame as NumPy array
+        hash_size (int): Grid size; the hash has hash_size**2 bits
+
+    Returns:
+        int: Perceptual hash
+    """
+    import cv2
+    import numpy as np
+
+    gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY) if image_array.ndim == 3 else image_array
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class FrameResultCache:
+    """
+    LRU/TTL cache of emotion results keyed by perceptual frame hash.
+
+    Args:
+        max_entries: Capacity (env FRAME_CACHE_SIZE, default 512; 0 disables)
+        ttl_seconds: Entry lifetime (env FRAME_CACHE_TTL_SECONDS, default 5)
+        max_distance: Largest Hamming distance counted as the same frame
+            (env FRAME_CACHE_MAX_DISTANCE, default 4 of 64 bits)
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        max_distance: Optional[int] = None
+    ):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('FRAME_CACHE_SIZE', 512))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('FRAME_CACHE_TTL_SECONDS', 5))
+        self.max_distance = max_distance if max_distance is not None else int(os.getenv('FRAME_CACHE_MAX_DISTANCE', 4))
+        # (variant, scope, hash) -> (result, stored_at, inference_ms)
+        self._entries: "OrderedDict[Tuple[Hashable, Hashable, int], Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _find(self, frame_hash: int, variant: Hashable, scope: Hashable, now: float) -> Optional[Tuple[Hashable, Hashable, int]]:
+        exact = (variant, scope, frame_hash)
+        entry = self._entries.get(exact)
+        if entry is not None and now - entry[1] <= self.ttl_seconds:
+            return exact
+        if scope is None:
+            return None
+        best_key, best_distance = None, self.max_distance + 1
+        for key, (_, stored_at, _) in self._entries.items():
+            if key[:2] != (variant, scope) or now - stored_at > self.ttl_seconds:
+                continue
+            distance = hamming_distance(frame_hash, key[2])
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def get(self, frame_hash: Optional[int], variant: Hashable = None, scope: Hashable = None) -> Optional[Any]:
+        """
+        Return the cached result for a frame within `max_distance`, or None.
+        Only entries stored under the same `variant` and `scope` match, and
+        without a scope only the exact hash does.
+        """
+        if not self.enabled or frame_hash is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            key = self._find(frame_hash, variant, scope, now)
+            if key is None:
+                self.misses += 1
+                hit = None
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit = self._entries[key]
+            ratio = self.hits / (self.hits + self.misses)
+
+        metrics.set_gauge('frame_cache.hit_ratio', ratio)
+        if hit is None:
+            metrics.inc('frame_cache.misses')
+            return None
+        metrics.inc('frame_cache.hits')
+        metrics.inc('frame_cache.saved_inference_ms', hit[2])
+        return hit[0]
+
+    def put(
+        self,
+        frame_hash: Optional[int],
+        result: Any,
+        inference_ms: float = 0.0,
+        variant: Hashable = None,
+        scope: Hashable = None
+    ) -> None:
+        """
+        Store a result together with the inference time it cost, under the
+        quality `variant` it was computed at and the client `scope` it belongs to.
+        """
+        if not self.enabled or frame_hash is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            key = (variant, scope, frame_hash)
+            self._entries[key] = (result, now, inference_ms)
+            self._entries.move_to_end(key)
+            # Drop expired entries from the cold end, then enforce capacity
+            while self._entries:
+                oldest_key, (_, stored_at, _) = next(iter(self._entries.items()))
+                if now - stored_at <= self.ttl_seconds and len(self._entries) <= self.max_entries:
+                    break
+                self._entries.popitem(last=False)
+            size = len(self._entries)
+        metrics.set_gauge('frame_cache.entries', size)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_cache: Optional[FrameResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_frame_cache() -> FrameResultCache:
+    """
+    Return the process-wide frame result cache.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FrameResultCache()
+    return _cache
+
+
+__all__ = ['FrameResultCache', 'get_frame_cache', 'dhash', 'hamming_distance']
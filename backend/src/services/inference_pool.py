@@ -0,0 +1,313 @@
+"""
+Inference Process Pool
+
+Runs image decoding and emotion inference in a dedicated pool of worker
+processes so a DeepFace forward pass never blocks the uvicorn event loop.
+
+Key Architectural Decisions:
+1. Preloaded Workers: Each worker process builds and warms up its own model
+   registry in the pool initializer, so no request pays model construction.
+   TensorFlow is limited to one intra-op thread per worker; the pool itself
+   provides the parallelism. Every uvicorn worker process has its own pool, so
+   by default the cores are split between them: cpu_count // WEB_CONCURRENCY
+   (uvicorn's worker-count variable), at least one each.
+2. Shared-Memory Handoff: Decoded frames are written into a
+   `multiprocessing.shared_memory` block by the decoding worker and read in
+   place by the inference worker. Only a small `SharedFrame` descriptor
+   (block name, shape, dtype) crosses the process boundary, never the pixels.
+3. Ownership: The parent process owns every block it receives from `decode`
+   and must call `release` once inference is done; the endpoint does this in a
+   `finally` so blocks are unlinked even when inference fails. If the request
+   is cancelled while a block is being created, the block is released as soon
+   as it arrives (`await_shared_frame`). A caller cancelled after its frame
+   joined a batch releases the block early; the worker then fails only that
+   item, not the batch.
+4. Spawn Context: Workers are spawned rather than forked because forking a
+   process that already started TensorFlow threads is unsafe.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .frame_cache import dhash
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SharedFrame(NamedTuple):
+    """Descriptor of a decoded frame living in shared memory."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+    # Perceptual hash computed by the decoding worker, for the frame cache
+    frame_hash: Optional[int] = None
+
+
+def frame_to_shared(image_array: np.ndarray, frame_hash: Optional[int] = None) -> SharedFrame:
+    """
+    Copy an array into a new shared memory block and describe it.
+    The caller becomes responsible for eventually releasing the block.
+    """
+    block = shared_memory.SharedMemory(create=True, size=max(1, image_array.nbytes))
+    try:
+        view = np.ndarray(image_array.shape, dtype=image_array.dtype, buffer=block.buf)
+        view[...] = image_array
+        del view
+        return SharedFrame(block.name, tuple(image_array.shape), image_array.dtype.str, frame_hash)
+    finally:
+        block.close()
+
+
+def release_shared(frame: SharedFrame) -> None:
+    """
+    Unlink the shared memory block behind a frame. Safe to call twice.
+    """
+    try:
+        block = shared_memory.SharedMemory(name=frame.name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+# --- Worker-side functions (executed inside pool processes) ---
+
+def _release_completed(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        release_shared(future.result())
+
+
+async def await_shared_frame(future: asyncio.Future) -> SharedFrame:
+    """
+    Await a future that creates a shared-memory frame. If the awaiting task is
+    cancelled (e.g. the client disconnected), the block is still created, so it
+    is released once it arrives instead of leaking until reboot.
+    """
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_release_completed)
+        raise
+
+
+def _init_worker() -> None:
+    # Must run before TensorFlow is imported in this process
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', '1')
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+    from .model_registry import get_model_registry
+    get_model_registry().warm_up()
+
+
+def _worker_ready() -> int:
+    from .model_registry import get_model_registry
+    return os.getpid() if get_model_registry().ready else 0
+
+
+def _worker_residency() -> Dict[str, Any]:
+    from .model_registry import get_model_registry
+    residency = get_model_registry().residency
+    # Idle workers get no other chance to apply the idle policy
+    residency.enforce()
+    return residency.status()
+
+
+def _decode_to_shared(image: Union[str, bytes], with_hash: bool = False, max_dimension: Optional[int] = None) -> SharedFrame:
+    from .emotion_detection import MAX_DIMENSION, decode_any
+    image_array = decode_any(image, max_dimension or MAX_DIMENSION)
+    return frame_to_shared(image_array, dhash(image_array) if with_hash else None)
+
+
+def _detect_shared_batch(items: List[Tuple[SharedFrame, Optional[Dict[str, float]], Optional[List[str]]]]) -> List[Any]:
+    """
+    Run a batch on shared frames. A frame whose block is already gone (its
+    caller was cancelled and released it) gets a per-item FileNotFoundError
+    instead of failing the rest of the batch.
+    """
+    from .emotion_detection import get_emotion_detector
+    results: List[Any] = [None] * len(items)
+    blocks, attached = [], []
+    try:
+        for index, (frame, region, detector_backends) in enumerate(items):
+            try:
+                block = shared_memory.SharedMemory(name=frame.name)
+            except FileNotFoundError as e:
+                results[index] = e
+                continue
+            blocks.append(block)
+            attached.append((index, np.ndarray(frame.shape, dtype=np.dtype(frame.dtype), buffer=block.buf),
+                             region, detector_backends))
+        if attached:
+            detected = get_emotion_detector().detect_emotion_batch(
+                [image for _, image, _, _ in attached],
+                [region for _, _, region, _ in attached],
+                [backends for _, _, _, backends in attached]
+            )
+            for (index, _, _, _), result in zip(attached, detected):
+                results[index] = result
+        del attached
+        return results
+    finally:
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                # A lingering view still references the buffer; the mapping is
+                # dropped when the view is garbage collected
+                pass
+
+
+def _detect_group_shared(frame: SharedFrame, detector_backends: Optional[List[str]] = None) -> Dict[str, Any]:
+    from .emotion_detection import GROUP_MAX_FACES, get_emotion_detector
+    block = shared_memory.SharedMemory(name=frame.name)
+    try:
+        image = np.ndarray(frame.shape, dtype=np.dtype(frame.dtype), buffer=block.buf)
+        result = get_emotion_detector().detect_group_emotion(image, GROUP_MAX_FACES, detector_backends)
+        del image
+        return result
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            pass
+
+
+# --- Parent-side pool ---
+
+def default_pool_workers() -> int:
+    """
+    Share of the CPU cores for this uvicorn process's pool: each uvicorn worker
+    (WEB_CONCURRENCY, default 1) builds its own pool with full DeepFace models,
+    so one pool per core in every process would oversubscribe CPU and memory.
+    """
+    uvicorn_workers = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+    return max(1, (os.cpu_count() or 1) // uvicorn_workers)
+
+
+class InferencePool:
+    """
+    Process pool for the decode and inference stages.
+
+    Args:
+        workers: Number of worker processes (env EMOTION_POOL_WORKERS, default
+            `default_pool_workers()`). 0 disables the pool and inference runs
+            in a thread of the serving process instead.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        if workers is None:
+            configured = os.getenv('EMOTION_POOL_WORKERS')
+            workers = int(configured) if configured is not None else default_pool_workers()
+        self.workers = max(0, workers)
+        self.ready = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker
+                    )
+        return self._executor
+
+    def warm_up(self) -> None:
+        """
+        Start every worker and wait until each has loaded its models.
+        Blocking; the FastAPI lifespan runs it in a background thread.
+        """
+        executor = self._get_executor()
+        # One probe per worker forces the executor to spawn the full pool
+        futures = [executor.submit(_worker_ready) for _ in range(self.workers)]
+        pids = {future.result() for future in futures}
+        self.ready = True
+        logger.info(f"Inference pool ready with {self.workers} workers (pids: {sorted(pids)})")
+
+    async def decode(
+        self,
+        image: Union[str, bytes],
+        with_hash: bool = False,
+        max_dimension: Optional[int] = None
+    ) -> SharedFrame:
+        """
+        Decode a base64 string or raw image bytes in a worker; the pixels land
+        in shared memory. With `with_hash` the worker also computes the frame's
+        perceptual hash. Raises ValueError for undecodable input, like decode_image.
+        """
+        loop = asyncio.get_running_loop()
+        return await await_shared_frame(
+            loop.run_in_executor(self._get_executor(), _decode_to_shared, image, with_hash, max_dimension)
+        )
+
+    def detect_batch(
+        self,
+        items: List[Tuple[SharedFrame, Optional[Dict[str, float]], Optional[List[str]]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run detect_emotion_batch on (shared frame, optional face region,
+        optional detector backends) items in a worker. Blocking; called from the inference scheduler's worker thread.
+        """
+        return self._get_executor().submit(_detect_shared_batch, items).result()
+
+    async def detect_group(self, frame: SharedFrame, detector_backends: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Run detect_group_emotion on a shared frame in a worker.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), _detect_group_shared, frame, detector_backends)
+
+    async def residency(self) -> List[Dict[str, Any]]:
+        """
+        Model residency of the workers, one entry per distinct pid. Probes are
+        not pinned to workers, so a busy pool may report fewer than all of them.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        reports = await asyncio.gather(*(
+            loop.run_in_executor(executor, _worker_residency) for _ in range(self.workers)
+        ))
+        return list({report['pid']: report for report in reports}.values())
+
+    def release(self, frame: SharedFrame) -> None:
+        release_shared(frame)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.ready = False
+
+    def status(self) -> Dict[str, Any]:
+        return {'enabled': self.enabled, 'workers': self.workers, 'ready': self.ready}
+
+
+_pool: Optional[InferencePool] = None
+
+
+def get_inference_pool() -> InferencePool:
+    """
+    Return the process-wide inference pool.
+    """
+    global _pool
+    if _pool is None:
+        _pool = InferencePool()
+        metrics.set_gauge('inference_pool.workers', _pool.workers)
+    return _pool
+
+
+__all__ = ['InferencePool', 'SharedFrame', 'get_inference_pool', 'frame_to_shared', 'release_shared', 'await_shared_frame']
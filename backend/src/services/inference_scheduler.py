@@ -0,0 +1,182 @@
+"""
+Inference Scheduler
+
+Micro-batching queue that sits in front of the emotion model. Concurrent
+requests submit one item each; the scheduler groups them into batches and runs
+a single batched call, then fans the per-item results back out to the waiting
+coroutines.
+
+Key Architectural Decisions:
+1. Size or Deadline: A batch is dispatched as soon as it reaches
+   `max_batch_size` or when the oldest item has waited `max_wait_ms`, whichever
+   comes first. A lone request therefore pays at most `max_wait_ms` of extra
+   latency, while bursts fill the model's vector width.
+2. Off the Event Loop: The batch function is blocking (TensorFlow), so it runs
+   in a worker thread. While the running batches occupy every slot
+   (`max_concurrent_batches`), new submissions pile up and form the next batch.
+3. Observability: Batch size, queue wait and per-batch latency are recorded in
+   `metrics` under the scheduler's name so the throughput/latency tradeoff can
+   be tuned from `/metrics`.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, List, Optional, Sequence, Set, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT_MS = 15.0
+
+
+class InferenceScheduler:
+    """
+    Collect items from concurrent callers into batches for `batch_fn`.
+
+    Args:
+        batch_fn: Blocking callable taking a list of items and returning a list
+            of results in the same order; an exception instance in the list
+            fails only that item's caller
+        max_batch_size: Largest batch handed to `batch_fn`
+            (env EMOTION_BATCH_MAX_SIZE, default 8)
+        max_wait_ms: Longest time the first item of a batch waits for company
+            (env EMOTION_BATCH_MAX_WAIT_MS, default 15)
+        name: Prefix for the exported metrics
+        max_concurrent_batches: Batches allowed to run at once. 1 for in-process
+            inference; the process pool raises it to its worker count.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        name: str = 'emotion_batch',
+        max_concurrent_batches: int = 1
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size or int(os.getenv('EMOTION_BATCH_MAX_SIZE', DEFAULT_MAX_BATCH_SIZE))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None
+                         else float(os.getenv('EMOTION_BATCH_MAX_WAIT_MS', DEFAULT_MAX_WAIT_MS))) / 1000.0
+        self.name = name
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    def _ensure_started(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item and wait for its result.
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        metrics.set_gauge(f'{self.name}.queue_depth', self._queue.qsize())
+        return await future
+
+    async def stop(self) -> None:
+        """
+        Cancel the worker and fail any requests still waiting.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for task in list(self._inflight):
+            task.cancel()
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference scheduler stopped"))
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            # Wait for a free slot before collecting, so the next batch keeps
+            # filling while every slot is busy
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        try:
+            await self._execute(batch)
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference scheduler stopped"))
+            raise
+        finally:
+            self._slots.release()
+
+    async def _execute(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        # Requests that gave up (client disconnect, timeout) are dropped
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        for _, _, submitted in batch:
+            metrics.observe(f'{self.name}.queue_wait_ms', (started - submitted) * 1000)
+        metrics.observe(f'{self.name}.size', len(batch))
+        metrics.set_gauge(f'{self.name}.queue_depth', self._queue.qsize())
+
+        items = [item for item, _, _ in batch]
+        try:
+            results = await asyncio.to_thread(self.batch_fn, items)
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            logger.error(f"Batched inference failed: {e}")
+            metrics.inc(f'{self.name}.errors')
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            metrics.observe(f'{self.name}.latency_ms', (time.perf_counter() - started) * 1000)
+
+        metrics.inc(f'{self.name}.batches')
+        metrics.inc(f'{self.name}.items', len(items))
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+__all__ = ['InferenceScheduler', 'DEFAULT_MAX_BATCH_SIZE', 'DEFAULT_MAX_WAIT_MS']
@@ -0,0 +1,110 @@
+"""
+In-process Metrics
+
+Lightweight counters, gauges and latency histograms shared by the backend
+services and exposed as JSON at `/metrics`.
+
+Key Architectural Decisions:
+1. No External Dependency: Values live in process memory, so each uvicorn
+   worker reports its own numbers. That is enough to tune batching, caching and
+   throttling without running a Prometheus stack next to the app.
+2. Bounded Histograms: Only the most recent observations are kept per metric,
+   so percentiles reflect current behaviour and memory stays constant.
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+# Number of recent observations kept per histogram
+HISTOGRAM_WINDOW = 1024
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Metrics:
+    """
+    Thread-safe registry of named counters, gauges and histograms.
+    """
+
+    def __init__(self, histogram_window: int = HISTOGRAM_WINDOW):
+        self.histogram_window = histogram_window
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, Deque[float]] = {}
+        self._histogram_totals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation in a histogram."""
+        with self._lock:
+            window = self._histograms.get(name)
+            if window is None:
+                window = deque(maxlen=self.histogram_window)
+                self._histograms[name] = window
+            window.append(value)
+            self._histogram_totals[name] = self._histogram_totals.get(name, 0) + 1
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def gauge(self, name: str) -> Optional[float]:
+        with self._lock:
+            return self._gauges.get(name)
+
+    def percentile(self, name: str, fraction: float) -> float:
+        """Return a percentile (0.0-1.0) over the recent window of a histogram."""
+        with self._lock:
+            values = sorted(self._histograms.get(name, ()))
+        return _percentile(values, fraction)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Return all metrics as plain dicts suitable for a JSON response.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {name: (sorted(window), self._histogram_totals[name])
+                          for name, window in self._histograms.items()}
+
+        summaries = {}
+        for name, (values, total) in histograms.items():
+            summaries[name] = {
+                'count': total,
+                'window': len(values),
+                'mean': sum(values) / len(values) if values else 0.0,
+                'p50': _percentile(values, 0.50),
+                'p95': _percentile(values, 0.95),
+                'max': values[-1] if values else 0.0,
+            }
+        return {'counters': counters, 'gauges': gauges, 'histograms': summaries}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._histogram_totals.clear()
+
+
+# Process-wide metrics instance
+metrics = Metrics()
+
+__all__ = ['Metrics', 'metrics']
@@ -0,0 +1,320 @@
+"""
+Model Registry
+
+This module owns the DeepFace models used by the emotion detection service so
+they are constructed once per process instead of lazily on the first request.
+
+Key Architectural Decisions:
+1. Single Owner: The FastAPI lifespan creates the registry at startup and the
+   `EmotionDetector` receives the shared instance, so no request ever pays the
+   multi-second model construction cost.
+2. Warm-up Inference: Building the models is not enough; TensorFlow also traces
+   and allocates on the first forward pass. A synthetic frame is pushed through
+   every configured detector backend before the process reports itself ready.
+3. Readiness: `ready` stays False until warm-up has finished, which lets the
+   `/health/ready` probe keep traffic away from a cold worker.
+4. Pluggable Runtime: Batched classification goes through the backend chosen
+   by EMOTION_INFERENCE_BACKEND (see `ml_models.inference_backends`), so the
+   DeepFace emotion head can run on ONNX Runtime instead of Keras.
+5. Fast Tier: The project's own 48x48 CNN (the `emotion_model` artifact) can
+   be loaded alongside DeepFace as the cheap first tier of the detector's
+   confidence-gated cascade. It is optional; without a published artifact
+   every face goes to the DeepFace tier.
+6. Residency: Every model use goes through a `ModelResidencyManager`, which
+   records each backend's memory footprint and may evict the fallback
+   detectors under MODEL_MEMORY_BUDGET_MB or after MODEL_IDLE_EVICT_SECONDS.
+   The emotion models and the primary detector are pinned. Eviction can only
+   return what Python and TensorFlow let go of: TensorFlow's allocator keeps
+   some freed tensor memory for reuse, so the RSS drop is usually smaller
+   than the measured footprint. The manager re-measures on the next load.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+from deepface import DeepFace
+
+from ..ml_models.inference_backends import load_backend
+from .model_residency import ModelResidencyManager
+
+logger = logging.getLogger(__name__)
+
+# Detector backends tried in order by EmotionDetector. 'opencv' is fast but
+# misses faces in poor lighting, 'retinaface' is slower but more accurate.
+DEFAULT_DETECTOR_BACKENDS = ['opencv', 'retinaface']
+
+# Output order of the DeepFace emotion model
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# Input size of the DeepFace emotion model
+EMOTION_INPUT_SIZE = 48
+
+
+def get_configured_backends() -> List[str]:
+    """
+    Read the detector backend cascade from the environment.
+
+    Returns:
+        List[str]: Backend names, e.g. EMOTION_DETECTOR_BACKENDS=opencv,retinaface
+    """
+    configured = os.getenv('EMOTION_DETECTOR_BACKENDS')
+    if not configured:
+        return list(DEFAULT_DETECTOR_BACKENDS)
+    backends = [backend.strip() for backend in configured.split(',') if backend.strip()]
+    return backends or list(DEFAULT_DETECTOR_BACKENDS)
+
+
+# Module-level caches in which DeepFace releases keep built detectors, as
+# (module, attribute); newer releases nest them by task
+DEEPFACE_MODEL_CACHES = (
+    ('deepface.modules.modeling', 'cached_models'),
+    ('deepface.detectors.DetectorWrapper', 'face_detector_obj'),
+    ('deepface.detectors.FaceDetector', 'face_detector_obj'),
+)
+
+# Module-level singletons of detector packages DeepFace wraps, as
+# (backend, module, attribute); these hold the weights even after DeepFace's
+# own cache entry is gone
+DETECTOR_MODULE_SINGLETONS = (
+    ('retinaface', 'retinaface.RetinaFace', 'model'),
+)
+
+
+def drop_deepface_detector(backend: str) -> None:
+    """
+    Remove a built detector from DeepFace's caches so it can be garbage
+    collected; DeepFace rebuilds it on the next call that needs it.
+
+    The detector package's own singleton is dropped too. Keras' global
+    session is deliberately left alone: eviction runs while other threads
+    keep building and running models, and `clear_session()` would reset
+    state under them. Releasing the references is what frees the weights.
+    """
+    for module_name, attribute in DEEPFACE_MODEL_CACHES:
+        cache = getattr(sys.modules.get(module_name), attribute, None)
+        if not isinstance(cache, dict):
+            continue
+        cache.pop(backend, None)
+        for nested in cache.values():
+            if isinstance(nested, dict):
+                nested.pop(backend, None)
+
+    for singleton_backend, module_name, attribute in DETECTOR_MODULE_SINGLETONS:
+        module = sys.modules.get(module_name)
+        if singleton_backend == backend and module is not None and hasattr(module, attribute):
+            # retinaface rebuilds only when the global is missing, not when it is None
+            delattr(module, attribute)
+
+
+def cascade_enabled() -> bool:
+    """
+    Whether the detector runs the fast-tier cascade (env EMOTION_CASCADE=true).
+    """
+    return os.getenv('EMOTION_CASCADE', 'false').lower() == 'true'
+
+
+def make_warmup_frame(size: int = 480) -> np.ndarray:
+    """
+    Build a synthetic RGB frame for warm-up inference.
+
+    A smooth gradient is used instead of a flat colour so the detectors run
+    their full code path rather than bailing out on an empty image.
+    """
+    gradient = np.linspace(0, 255, size, dtype=np.uint8)
+    gray = np.add.outer(gradient // 2, gradient // 2).astype(np.uint8)
+    return np.stack([gray, gray, gray], axis=-1)
+
+
+def preprocess_face(face: np.ndarray) -> np.ndarray:
+    """
+    Convert an RGB face crop to the 48x48x1 grayscale tensor the emotion model expects.
+    """
+    if face.ndim == 3:
+        face = cv2.cvtColor(face, cv2.COLOR_RGB2GRAY)
+    resized = cv2.resize(face, (EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE), interpolation=cv2.INTER_AREA)
+    normalized = resized.astype(np.float32) / 255.0
+    return normalized[..., np.newaxis]
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the DeepFace emotion model and detector backends.
+    """
+
+    def __init__(self, detector_backends: Optional[List[str]] = None):
+        self.detector_backends = detector_backends or get_configured_backends()
+        self.emotion_model: Any = None
+        self.emotion_backend: Any = None
+        self.fast_backend: Any = None
+        self._fast_tier_failed = False
+        self.residency = ModelResidencyManager()
+        self.residency.register('emotion.deepface', pinned=True)
+        self.residency.register('emotion.fast', pinned=True)
+        self.ready = False
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """
+        Build the DeepFace emotion model if it has not been built yet.
+        Safe to call from several threads; only the first caller does the work.
+        """
+        if self.emotion_model is not None:
+            return
+        with self._lock:
+            if self.emotion_model is not None:
+                return
+            start = time.perf_counter()
+            with self.residency.use('emotion.deepface'):
+                try:
+                    # Newer DeepFace releases group models by task
+                    self.emotion_model = DeepFace.build_model(model_name='Emotion', task='facial_attribute')
+                except TypeError:
+                    self.emotion_model = DeepFace.build_model('Emotion')
+                # DeepFace.analyze still uses the Keras model; only our batched
+                # classification switches runtime
+                self.emotion_backend = load_backend('deepface_emotion', lambda: self.emotion_model)
+            self.load_seconds = time.perf_counter() - start
+            logger.info(f"Loaded DeepFace emotion model in {self.load_seconds:.2f}s")
+
+    def load_fast_tier(self) -> bool:
+        """
+        Load the project's own emotion CNN for the cascade's fast tier.
+
+        Returns:
+            bool: False if no model artifact is available; the failure is
+                remembered so it is logged only once per process
+        """
+        if self.fast_backend is not None:
+            return True
+        if self._fast_tier_failed:
+            return False
+        with self._lock:
+            if self.fast_backend is None and not self._fast_tier_failed:
+                from ..ml_models import emotion_classifier
+                try:
+                    with self.residency.use('emotion.fast'):
+                        self.fast_backend = emotion_classifier.get_inference_backend()
+                    logger.info(f"Loaded fast-tier emotion model ({self.fast_backend.name})")
+                except ValueError as e:
+                    self._fast_tier_failed = True
+                    logger.warning(f"Fast-tier emotion model unavailable, using DeepFace only: {e}")
+        return self.fast_backend is not None
+
+    def using_detector(self, backend: str):
+        """
+        Context manager wrapped around every call into a DeepFace detector
+        backend, so its footprint and use are tracked. Only the first backend
+        of the configured cascade is pinned.
+        """
+        name = f"detector.{backend}"
+        if name not in self.residency:
+            primary = backend == self.detector_backends[0]
+            self.residency.register(name, unload=lambda: drop_deepface_detector(backend), pinned=primary)
+        return self.residency.use(name)
+
+    def warm_up(self) -> None:
+        """
+        Load the models and run one inference per detector backend on a
+        synthetic frame. Marks the registry ready once every backend has run.
+        """
+        self.load()
+        if cascade_enabled() and self.load_fast_tier():
+            self.predict_fast([make_warmup_frame(EMOTION_INPUT_SIZE)])
+        frame = make_warmup_frame()
+        for backend in self.detector_backends:
+            start = time.perf_counter()
+            try:
+                with self.using_detector(backend):
+                    DeepFace.analyze(
+                        frame,
+                        actions=['emotion'],
+                        enforce_detection=False,
+                        detector_backend=backend
+                    )
+            except Exception as e:
+                # A broken optional backend should not keep the worker unready;
+                # EmotionDetector already falls through to the next backend.
+                logger.error(f"Warm-up failed for detector backend '{backend}': {e}")
+                continue
+            self.warmup_seconds[backend] = time.perf_counter() - start
+            logger.info(f"Warmed up detector backend '{backend}' in {self.warmup_seconds[backend]:.2f}s")
+        self.ready = True
+        logger.info("Model registry is ready")
+
+    def predict_emotions(self, faces: List[np.ndarray]) -> List[Dict[str, float]]:
+        """
+        Run the emotion model on several face crops in one forward pass.
+
+        Args:
+            faces (List[np.ndarray]): RGB face crops of any size
+
+        Returns:
+            List[Dict[str, float]]: Per-face emotion probabilities (0-1)
+        """
+        if not faces:
+            return []
+        self.load()
+        batch = np.stack([preprocess_face(face) for face in faces])
+        # Calling the underlying model directly lets us feed the whole batch
+        # instead of one face per DeepFace predict() call
+        predictions = self.emotion_backend.predict(batch)
+        return [
+            {label: float(score) for label, score in zip(EMOTION_LABELS, row)}
+            for row in predictions
+        ]
+
+    def predict_fast(self, faces: List[np.ndarray]) -> List[Dict[str, float]]:
+        """
+        Run the fast-tier model on several face crops in one forward pass.
+        Call `load_fast_tier` first; same output format as `predict_emotions`.
+        """
+        if not faces:
+            return []
+        batch = np.stack([preprocess_face(face) for face in faces])
+        predictions = self.fast_backend.predict(batch)
+        return [
+            {label: float(score) for label, score in zip(EMOTION_LABELS, row)}
+            for row in predictions
+        ]
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Summarize load state for health and readiness probes.
+        """
+        return {
+            'ready': self.ready,
+            'emotion_model_loaded': self.emotion_model is not None,
+            'inference_backend': getattr(self.emotion_backend, 'name', None),
+            'fast_tier_backend': getattr(self.fast_backend, 'name', None),
+            'detector_backends': self.detector_backends,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'residency': self.residency.status(),
+        }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Return the process-wide model registry, creating it on first use.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+__all__ = ['ModelRegistry', 'get_model_registry', 'get_configured_backends', 'cascade_enabled', 'make_warmup_frame', 'preprocess_face', 'DEFAULT_DETECTOR_BACKENDS', 'EMOTION_LABELS']
@@ -0,0 +1,264 @@
+"""
+Model Residency
+
+Tracks which detector and emotion backends are loaded in this process, what
+each one costs in resident memory, and evicts rarely used ones so several
+workers fit in a memory-constrained container.
+
+Key Architectural Decisions:
+1. Measured, Not Declared: A backend's footprint is the growth of the
+   process's resident set across its first use (DeepFace builds detectors
+   lazily on first call). It is an estimate, since concurrent allocations are
+   counted too, but it is what the container limit actually sees.
+2. Pinned vs Evictable: The emotion models and the primary detector serve
+   every request and are pinned. Fallback detectors such as 'retinaface' are
+   only needed when the primary misses, so they may be evicted and are
+   rebuilt by DeepFace on their next use.
+3. Two Triggers: A backend unused for `idle_seconds` is evicted, and while the
+   measured total exceeds `budget_mb` the least recently used evictable
+   backends go first. Both are checked after each use, never in a background
+   task. A backend in use is never evicted.
+4. Returning Memory: Eviction drops the cached model objects, runs the garbage
+   collector and, on glibc, trims the malloc arenas so freed pages leave the
+   resident set instead of staying with the allocator.
+"""
+
+import ctypes
+import ctypes.util
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def read_rss_bytes() -> Optional[int]:
+    """
+    Current resident set size of this process, or None where /proc is unavailable.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def release_freed_memory() -> None:
+    """
+    Collect garbage and hand freed heap pages back to the OS where possible.
+    """
+    gc.collect()
+    libc_name = ctypes.util.find_library('c')
+    if not libc_name:
+        return
+    try:
+        ctypes.CDLL(libc_name).malloc_trim(0)
+    except (OSError, AttributeError):
+        # Not glibc (musl, macOS); the allocator keeps its pages
+        pass
+
+
+class ResidentModel:
+    """Residency bookkeeping for one named backend."""
+
+    def __init__(self, name: str, unload: Optional[Callable[[], None]] = None, pinned: bool = False):
+        self.name = name
+        self.unload = unload
+        self.pinned = pinned
+        self.resident = False
+        self.resident_bytes: Optional[int] = None
+        self.uses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.active = 0
+        self.last_used: Optional[float] = None
+
+    @property
+    def evictable(self) -> bool:
+        return self.resident and not self.pinned and self.unload is not None and self.active == 0
+
+
+class ModelResidencyManager:
+    """
+    Per-process registry of loaded backends with an eviction policy.
+
+    Args:
+        budget_mb: Measured backend memory above which the least recently
+            used evictable backends are unloaded (env MODEL_MEMORY_BUDGET_MB,
+            default 0 = no budget)
+        idle_seconds: Unload evictable backends unused for this long
+            (env MODEL_IDLE_EVICT_SECONDS, default 0 = never)
+        rss_reader: Returns the process RSS in bytes (for tests)
+        clock: Monotonic time source (for tests)
+    """
+
+    def __init__(
+        self,
+        budget_mb: Optional[float] = None,
+        idle_seconds: Optional[float] = None,
+        rss_reader: Callable[[], Optional[int]] = read_rss_bytes,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.budget_mb = budget_mb if budget_mb is not None else float(os.getenv('MODEL_MEMORY_BUDGET_MB', 0))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else float(os.getenv('MODEL_IDLE_EVICT_SECONDS', 0))
+        self._rss_reader = rss_reader
+        self._clock = clock
+        self._models: Dict[str, ResidentModel] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, unload: Optional[Callable[[], None]] = None, pinned: bool = False) -> None:
+        """
+        Declare a backend and how to unload it. Backends first seen in `use`
+        without registration are tracked but never evicted.
+        """
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                self._models[name] = ResidentModel(name, unload, pinned)
+            else:
+                model.unload = unload
+                model.pinned = pinned
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._models
+
+    @contextmanager
+    def use(self, name: str):
+        """
+        Mark a backend as in use for the duration of the block. The first use
+        after a (re)load records its resident-set growth as its footprint.
+        """
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                model = self._models[name] = ResidentModel(name)
+            model.active += 1
+            measure = not model.resident
+        before = self._rss_reader() if measure else None
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            after = self._rss_reader() if measure else None
+            with self._lock:
+                model.active -= 1
+                model.uses += 1
+                model.last_used = self._clock()
+                # A failed load leaves nothing resident
+                if measure and completed and not model.resident:
+                    model.resident = True
+                    model.loads += 1
+                    if before is not None and after is not None:
+                        model.resident_bytes = max(0, after - before)
+                    logger.info(f"Model '{name}' resident ({self._format_mb(model.resident_bytes)})")
+            self.enforce()
+
+    def evict(self, name: str) -> bool:
+        """
+        Unload one backend now if it is evictable.
+
+        Returns:
+            bool: Whether the backend was unloaded
+        """
+        with self._lock:
+            model = self._models.get(name)
+            if model is None or not model.evictable:
+                return False
+            model.resident = False
+        self._unload([model], 'manual')
+        return True
+
+    def enforce(self) -> List[str]:
+        """
+        Apply the idle and budget policies.
+
+        Returns:
+            list: Names of the evicted backends
+        """
+        now = self._clock()
+        with self._lock:
+            candidates = sorted(
+                (model for model in self._models.values() if model.evictable),
+                key=lambda model: model.last_used or 0.0
+            )
+            victims = []
+            if self.idle_seconds > 0:
+                victims = [model for model in candidates if now - (model.last_used or 0.0) >= self.idle_seconds]
+            if self.budget_mb > 0:
+                total = self._total_bytes() - sum(model.resident_bytes or 0 for model in victims)
+                for model in candidates:
+                    if total <= self.budget_mb * 1024 * 1024:
+                        break
+                    if model not in victims:
+                        victims.append(model)
+                        total -= model.resident_bytes or 0
+            # Mark first so a concurrent use re-measures the reload
+            for model in victims:
+                model.resident = False
+        if victims:
+            self._unload(victims, 'policy')
+        self._update_gauges()
+        return [model.name for model in victims]
+
+    def _unload(self, models: List[ResidentModel], cause: str) -> None:
+        for model in models:
+            try:
+                model.unload()
+            except Exception as e:
+                logger.error(f"Failed to unload model '{model.name}': {e}")
+                continue
+            model.evictions += 1
+            metrics.inc('model_residency.evictions')
+            logger.info(f"Evicted model '{model.name}' ({cause}, {self._format_mb(model.resident_bytes)})")
+        release_freed_memory()
+
+    def _total_bytes(self) -> int:
+        return sum(model.resident_bytes or 0 for model in self._models.values() if model.resident)
+
+    def _update_gauges(self) -> None:
+        with self._lock:
+            for model in self._models.values():
+                resident_mb = (model.resident_bytes or 0) / (1024 * 1024) if model.resident else 0.0
+                metrics.set_gauge(f"model_resident_mb.{model.name}", resident_mb)
+            metrics.set_gauge('model_resident_mb.total', self._total_bytes() / (1024 * 1024))
+
+    @staticmethod
+    def _format_mb(size: Optional[int]) -> str:
+        return 'size unknown' if size is None else f"{size / (1024 * 1024):.1f} MB"
+
+    def status(self) -> Dict[str, object]:
+        """
+        Per-backend residency for health endpoints.
+        """
+        rss = self._rss_reader()
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'process_rss_mb': rss / (1024 * 1024) if rss is not None else None,
+                'budget_mb': self.budget_mb or None,
+                'idle_evict_seconds': self.idle_seconds or None,
+                'resident_mb': self._total_bytes() / (1024 * 1024),
+                'models': {
+                    model.name: {
+                        'resident': model.resident,
+                        'resident_mb': (model.resident_bytes / (1024 * 1024)
+                                        if model.resident_bytes is not None else None),
+                        'pinned': model.pinned,
+                        'uses': model.uses,
+                        'loads': model.loads,
+                        'evictions': model.evictions,
+                    }
+                    for model in self._models.values()
+                },
+            }
+
+
+__all__ = ['ModelResidencyManager', 'ResidentModel', 'read_rss_bytes', 'release_freed_memory']
@@ -0,0 +1,187 @@
+"""
+Recommendation Cache
+
+Caches Spotify recommendation results so popular (mood, language) requests
+are answered without an upstream call.
+
+Key Architectural Decisions:
+1. Quantized Targets: The mood's audio-feature targets used to be drawn with
+   `random.uniform` on every request, which made no two calls alike. Each
+   range is now split into `TARGET_BUCKETS` buckets; a request picks a bucket
+   at random and uses its midpoint. The cache key is (mood, market, bucket,
+   limit), so variety is preserved across buckets while each bucket is
+   cacheable.
+2. Stale-While-Revalidate: An entry is fresh for `ttl_seconds` and may then be
+   served stale for up to `stale_seconds` more while one background task
+   refreshes it, so hot keys never wait on Spotify. The refresh is a
+   prefetch, so it runs at BACKGROUND Spotify priority whatever the priority
+   of the request that noticed the entry was stale. Expiry is jittered by
+   +/-`jitter` so entries filled together do not all expire together.
+3. Stampede Protection: Concurrent misses for the same key await one shared
+   upstream fetch instead of each calling Spotify.
+4. Only Real Results: Empty results (Spotify errors, which callers replace
+   with mock tracks) are never cached, so an outage is not remembered.
+5. Event-Loop Bound: Fetches run as asyncio tasks on the serving loop; the
+   cache is per worker process like the other in-process caches.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .metrics import metrics
+from .spotify_scheduler import background_priority
+
+logger = logging.getLogger(__name__)
+
+# Buckets per audio-feature target range
+TARGET_BUCKETS = max(1, int(os.getenv('RECOMMENDATION_TARGET_BUCKETS', 3)))
+
+
+def bucket_target(value_range: Tuple[float, float], bucket: int, buckets: int = TARGET_BUCKETS) -> float:
+    """
+    Midpoint of one of `buckets` equal slices of a (low, high) target range.
+    """
+    low, high = value_range
+    return low + (high - low) * (bucket + 0.5) / buckets
+
+
+class StaleWhileRevalidateCache:
+    """
+    Async TTL cache with stale-while-revalidate and single-flight fetches.
+
+    Args:
+        ttl_seconds: Freshness lifetime (env RECOMMENDATION_CACHE_TTL_SECONDS, default 300)
+        stale_seconds: How long past freshness an entry may still be served
+            while it is refreshed (env RECOMMENDATION_CACHE_STALE_SECONDS, default 3600)
+        jitter: Fractional +/- jitter applied to each entry's TTL
+            (env RECOMMENDATION_CACHE_JITTER, default 0.1)
+        max_entries: Capacity, least recently used evicted first
+            (env RECOMMENDATION_CACHE_SIZE, default 1024; 0 disables caching)
+        name: Metrics prefix
+        clock: Monotonic time source (for tests)
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        stale_seconds: Optional[float] = None,
+        jitter: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        name: str = 'recommendation_cache',
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('RECOMMENDATION_CACHE_TTL_SECONDS', 300))
+        self.stale_seconds = stale_seconds if stale_seconds is not None else float(os.getenv('RECOMMENDATION_CACHE_STALE_SECONDS', 3600))
+        self.jitter = jitter if jitter is not None else float(os.getenv('RECOMMENDATION_CACHE_JITTER', 0.1))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('RECOMMENDATION_CACHE_SIZE', 1024))
+        self.name = name
+        self._clock = clock
+        # key -> (value, fresh_until, stale_until)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        now = self._clock()
+        ttl = self.ttl_seconds * (1 + random.uniform(-self.jitter, self.jitter))
+        self._entries[key] = (value, now + ttl, now + ttl + self.stale_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Start (or join) the single upstream fetch for a key.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.inc(f"{self.name}.coalesced")
+            return task
+
+        async def run():
+            try:
+                value = await fetch()
+                if value:
+                    self._store(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        return task
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._inflight:
+            return
+        metrics.inc(f"{self.name}.refreshes")
+        # The task copies the context here, so its Spotify calls queue as background
+        with background_priority():
+            task = self._fetch(key, fetch)
+
+        def log_failure(done: asyncio.Task) -> None:
+            if not done.cancelled() and done.exception() is not None:
+                logger.error(f"Background refresh of {key} failed: {done.exception()}")
+
+        task.add_done_callback(log_failure)
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for `key`, fetching it with `fetch` on a miss.
+
+        Fresh entries are returned as is; stale ones are returned immediately
+        while a background refresh runs. Falsy values are returned but not cached.
+        """
+        if not self.enabled:
+            return await fetch()
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None and now < entry[2]:
+            value, fresh_until, _ = entry
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if now < fresh_until:
+                metrics.inc(f"{self.name}.hits")
+            else:
+                metrics.inc(f"{self.name}.stale_hits")
+                self._refresh(key, fetch)
+            self._update_ratio()
+            return value
+
+        self.misses += 1
+        metrics.inc(f"{self.name}.misses")
+        self._update_ratio()
+        # Shielded so one cancelled caller does not cancel the fetch the others await
+        return await asyncio.shield(self._fetch(key, fetch))
+
+    def _update_ratio(self) -> None:
+        metrics.set_gauge(f"{self.name}.hit_ratio", self.hits / (self.hits + self.misses))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_cache: Optional[StaleWhileRevalidateCache] = None
+
+
+def get_recommendation_cache() -> StaleWhileRevalidateCache:
+    """
+    Return the process-wide recommendation cache.
+    """
+    global _cache
+    if _cache is None:
+        _cache = StaleWhileRevalidateCache()
+    return _cache
+
+
+__all__ = ['StaleWhileRevalidateCache', 'bucket_target', 'get_recommendation_cache', 'TARGET_BUCKETS']
@@ -1,25 +1,16 @@
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 import os
 from typing import List, Dict
 
+from .audio_features import AudioFeatureProvider
+from .spotify_client import get_spotify_manager
+
 class MoodRecommender:
     def __init__(self):
-        # Initialize Spotify client
-        client_id = os.getenv('SPOTIFY_CLIENT_ID')
-        client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
-        if not client_id or not client_secret:
-            print("Warning: Spotify credentials not found in environment variables.")
-            self.sp = None
-        else:
-            self.sp = spotipy.Spotify(
-                client_credentials_manager=SpotifyClientCredentials(
-                    client_id=client_id,
-                    client_secret=client_secret
-                )
-            )
+        # Batched, persistently cached audio-feature lookups; the client is
+        # resolved per call so an instance built at import follows the manager
+        self.features = AudioFeatureProvider(lambda track_ids: self.sp.audio_features(track_ids))
             
         self.feature_weights = {
             'valence': 0.3,
@@ -30,19 +21,28 @@ class MoodRecommender:
             'acousticness': 0.1
         }
 
+    @property
+    def sp(self):
+        """
+        The process-wide Spotify client, or None while it is unconfigured or
+        unhealthy. Looked up on every access rather than captured once, so
+        instances created at import time see the client once it is healthy.
+        """
+        return get_spotify_manager().get_client()
+
     def get_audio_features(self, track_id: str) -> Dict:
-        """Get audio features for a track from Spotify"""
+        """Get audio features for a track, from the feature cache or Spotify"""
         if not self.sp: return None
         try:
-            features = self.sp.audio_features(track_id)
-            return features[0] if features else None
+            return self.features.get(track_id)
         except Exception as e:
             print(f"Error fetching audio features: {e}")
             return None
 
     def get_recommendations_by_mood(self, mood: str, limit: int = 12) -> List[Dict]:
         """Get song recommendations based on mood"""
-        if not self.sp: return []
+        sp = self.sp
+        if not sp: return []
         
         # Comprehensive mood-based mapping
         mood_configs = {
@@ -88,7 +88,7 @@ class MoodRecommender:
 
         try:
             # Get recommendations from Spotify
-            recommendations = self.sp.recommendations(
+            recommendations = sp.recommendations(
                 seed_genres=config['genres'][:3],
                 limit=limit,
                 **config['targets']
@@ -124,7 +124,8 @@ class MoodRecommender:
 
     def get_similar_songs(self, track_id: str, limit: int = 6) -> List[Dict]:
         """Get similar songs based on audio features"""
-        if not self.sp: return []
+        sp = self.sp
+        if not sp: return []
         
         try:
             base_features = self.get_audio_features(track_id)
@@ -132,14 +133,17 @@ class MoodRecommender:
                 return []
 
             # Get a pool of recommendations
-            recommendations = self.sp.recommendations(
+            recommendations = sp.recommendations(
                 seed_tracks=[track_id],
                 limit=limit * 2
             )
 
+            # One bulk lookup for the whole pool instead of one call per track
+            pool_features = self.features.get_many([track['id'] for track in recommendations['tracks']])
+
             similar_songs = []
             for track in recommendations['tracks']:
-                features = self.get_audio_features(track['id'])
+                features = pool_features.get(track['id'])
                 if features:
                     similarity = self.compute_similarity(base_features, features)
                     similar_songs.append({
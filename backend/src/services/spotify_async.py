@@ -0,0 +1,200 @@
+"""
+Asyncio Spotify Transport
+
+A small asyncio-native client for the Spotify Web API endpoints this service
+uses (search, recommendations, tracks, audio features, artist top tracks and
+related artists). spotipy is built on blocking `requests`, so every call made
+from an async function froze the event loop for the whole round-trip,
+including its timeouts and retries.
+
+Key Architectural Decisions:
+1. spotipy-Shaped API: Methods take the same arguments and return the same
+   JSON dicts as their spotipy counterparts, so service code changes from
+   `spotify.search(...)` to `await spotify.search(...)` and nothing else.
+2. Keep-Alive and Bounded Concurrency: One `httpx.AsyncClient` per process
+   keeps connections to api.spotify.com open. A semaphore bounds the requests
+   in flight (SPOTIFY_MAX_CONCURRENCY), so a burst queues in the worker instead
+   of opening hundreds of sockets and tripping the rate limit.
+3. Explicit Timeouts and Retries: Connect and read timeouts are separate, and
+   only connection errors, 429 and 5xx are retried, with exponential backoff.
+   Every attempt first takes a slot from the shared `SpotifyScheduler`, which
+   paces calls and turns a 429's Retry-After into a pause for all callers.
+   While a request waits out a backoff it gives its concurrency slot back.
+4. Shared Token: The access token comes from the manager's `SingleFlightToken`,
+   so the async and blocking clients share one token and one refresh.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from .metrics import metrics
+from .spotify_scheduler import MAX_RETRY_AFTER_SECONDS, RateLimited, SpotifyScheduler, get_spotify_scheduler
+
+logger = logging.getLogger(__name__)
+
+API_BASE_URL = 'https://api.spotify.com/v1/'
+
+
+class SpotifyAPIError(Exception):
+    """
+    Failed Spotify API call; mirrors spotipy's SpotifyException attributes.
+    """
+
+    def __init__(self, http_status: int, msg: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"http status: {http_status}, {msg}")
+        self.http_status = http_status
+        self.msg = msg
+        self.headers = headers or {}
+
+
+def _id(value: str, kind: str) -> str:
+    """Accept bare IDs as well as spotify:<kind>:<id> URIs."""
+    prefix = f"spotify:{kind}:"
+    return value[len(prefix):] if value.startswith(prefix) else value
+
+
+class AsyncSpotifyClient:
+    """
+    Asyncio Spotify Web API client.
+
+    Args:
+        token: Object with an async `aget()` returning an access token
+        max_concurrency: Requests in flight (env SPOTIFY_MAX_CONCURRENCY, default 32)
+        timeout: Read timeout in seconds (env SPOTIFY_REQUEST_TIMEOUT, default 15)
+        connect_timeout: Connect timeout in seconds (default 5)
+        retries: Retries on connection errors, 429 and 5xx (env SPOTIFY_RETRIES, default 5)
+        scheduler: Rate-limit scheduler; defaults to the process-wide one
+    """
+
+    def __init__(
+        self,
+        token: Any,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: float = 5.0,
+        retries: Optional[int] = None,
+        scheduler: Optional[SpotifyScheduler] = None
+    ):
+        self.token = token
+        self.max_concurrency = max_concurrency or int(os.getenv('SPOTIFY_MAX_CONCURRENCY', 32))
+        self.timeout = timeout or float(os.getenv('SPOTIFY_REQUEST_TIMEOUT', 15))
+        self.connect_timeout = connect_timeout
+        self.retries = retries if retries is not None else int(os.getenv('SPOTIFY_RETRIES', 5))
+        self.scheduler = scheduler or get_spotify_scheduler()
+        self._http = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _client(self):
+        if self._http is None:
+            import httpx
+            self._http = httpx.AsyncClient(
+                base_url=API_BASE_URL,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        import httpx
+
+        client = self._client()
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        endpoint = path.split('/')[0]
+        for attempt in range(self.retries + 1):
+            delay = 0.3 * (2 ** attempt)
+            try:
+                await self.scheduler.acquire()
+            except RateLimited as e:
+                raise SpotifyAPIError(429, str(e))
+            started = time.perf_counter()
+            try:
+                async with self._semaphore:
+                    headers = {'Authorization': f"Bearer {await self.token.aget()}"}
+                    response = await client.get(path, params=params, headers=headers)
+            except httpx.TransportError as e:
+                metrics.inc('spotify.transport_errors')
+                if attempt == self.retries:
+                    raise SpotifyAPIError(-1, f"{type(e).__name__}: {e}")
+                await asyncio.sleep(delay)
+                continue
+            metrics.observe(f"spotify.latency_ms.{endpoint}", (time.perf_counter() - started) * 1000)
+
+            if response.status_code == 401 and attempt == 0:
+                # Token revoked or expired early; fetch a new one once
+                self.token.invalidate()
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                metrics.inc(f"spotify.status.{response.status_code}")
+                if attempt == self.retries:
+                    break
+                if response.status_code == 429:
+                    # Pauses every caller; the next acquire() waits it out
+                    retry_after = float(response.headers.get('Retry-After', delay))
+                    self.scheduler.throttle(retry_after)
+                    if retry_after > MAX_RETRY_AFTER_SECONDS:
+                        break
+                    continue
+                await asyncio.sleep(delay)
+                continue
+            break
+
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('error', {}).get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise SpotifyAPIError(response.status_code, message, dict(response.headers))
+        return response.json()
+
+    async def search(self, q: str, limit: int = 10, offset: int = 0, type: str = 'track', market: Optional[str] = None) -> Dict[str, Any]:
+        return await self._get('search', {'q': q, 'limit': limit, 'offset': offset, 'type': type, 'market': market})
+
+    async def recommendations(
+        self,
+        seed_artists: Optional[List[str]] = None,
+        seed_genres: Optional[List[str]] = None,
+        seed_tracks: Optional[List[str]] = None,
+        limit: int = 20,
+        country: Optional[str] = None,
+        **kwargs: Any
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {'limit': limit, 'market': country, **kwargs}
+        if seed_artists:
+            params['seed_artists'] = ','.join(_id(artist, 'artist') for artist in seed_artists)
+        if seed_genres:
+            params['seed_genres'] = ','.join(seed_genres)
+        if seed_tracks:
+            params['seed_tracks'] = ','.join(_id(track, 'track') for track in seed_tracks)
+        return await self._get('recommendations', params)
+
+    async def tracks(self, tracks: List[str], market: Optional[str] = None) -> Dict[str, Any]:
+        """Up to 50 tracks per call."""
+        return await self._get('tracks', {'ids': ','.join(_id(track, 'track') for track in tracks), 'market': market})
+
+    async def audio_features(self, tracks: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Up to 100 tracks per call; entries are None for tracks without features."""
+        if isinstance(tracks, str):
+            tracks = [tracks]
+        result = await self._get('audio-features', {'ids': ','.join(_id(track, 'track') for track in tracks)})
+        return result.get('audio_features', [])
+
+    async def artist_top_tracks(self, artist_id: str, country: str = 'US') -> Dict[str, Any]:
+        return await self._get(f"artists/{_id(artist_id, 'artist')}/top-tracks", {'country': country})
+
+    async def artist_related_artists(self, artist_id: str) -> Dict[str, Any]:
+        return await self._get(f"artists/{_id(artist_id, 'artist')}/related-artists")
+
+
+__all__ = ['AsyncSpotifyClient', 'SpotifyAPIError', 'API_BASE_URL']
@@ -0,0 +1,413 @@
+"""
+Spotify Client Manager
+
+Owns the process-wide Spotify Web API client. Every request used to build a
+new `spotipy.Spotify`, fetch a new access token and fire a test search before
+doing any real work; the manager builds the client once and keeps it.
+
+Key Architectural Decisions:
+1. One Client Per Process: A single `spotipy.Spotify` shares one
+   `requests.Session` whose connection pool (SPOTIFY_POOL_SIZE) keeps TLS
+   connections to api.spotify.com alive across requests.
+2. Single-Flight Tokens: The client-credentials access token is cached until
+   shortly before it expires. The first caller to see it expire fetches a new
+   one while concurrent callers wait for that result, so any number of
+   simultaneous expiries costs exactly one token request. Sync and async
+   callers share the same in-flight refresh; a sync refresh on an event-loop
+   thread raises rather than blocking the coroutine it would wait for.
+3. Background Health: Instead of a test search per call, a probe task started
+   by the FastAPI lifespan checks the API every SPOTIFY_HEALTH_INTERVAL_SECONDS.
+   While the last probe failed, `get_client()` returns None and callers fall
+   back to mock data immediately instead of waiting out timeouts and retries.
+4. Two Transports: Async service code uses the asyncio-native client from
+   `spotify_async.py` (`get_async_client()`); the blocking spotipy client
+   remains for synchronous callers. Both share the same token cache and the
+   same rate-limit scheduler (`spotify_scheduler.py`).
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .metrics import metrics
+from .spotify_scheduler import MAX_RETRY_AFTER_SECONDS, background_priority, get_spotify_scheduler, running_loop
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+API_BASE_URL = 'https://api.spotify.com/v1/'
+
+
+class SingleFlightToken:
+    """
+    Thread-safe access token cache with single-flight refresh.
+
+    Args:
+        fetch: Requests a new token; returns (access token, expiry as epoch seconds)
+        afetch: Async equivalent of `fetch`, used by `aget`
+        refresh_margin_seconds: Refresh this long before the token expires
+        clock: Epoch time source (for tests)
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Tuple[str, float]],
+        afetch: Optional[Callable[[], Awaitable[Tuple[str, float]]]] = None,
+        refresh_margin_seconds: float = 60.0,
+        clock: Callable[[], float] = time.time
+    ):
+        self._fetch = fetch
+        self._afetch = afetch
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._clock = clock
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        # The refresh in progress, shared by sync and async callers
+        self._inflight: Optional[Future] = None
+        self.fetches = 0
+
+    def _valid(self) -> bool:
+        return self._token is not None and self._clock() < self._expires_at - self.refresh_margin_seconds
+
+    def _join_refresh(self) -> Tuple[Optional[Future], bool]:
+        """
+        Return (refresh future, whether this caller must run the fetch), or
+        (None, False) if another caller has already refreshed the token.
+        """
+        with self._lock:
+            # Whoever held the lock before us may already have refreshed it
+            if self._valid():
+                return None, False
+            if self._inflight is None:
+                self._inflight = Future()
+                return self._inflight, True
+            return self._inflight, False
+
+    def _finish_refresh(self, inflight: Future, result: Optional[Tuple[str, float]], error: Optional[BaseException]) -> None:
+        with self._lock:
+            if error is None:
+                self._token, self._expires_at = result
+                self.fetches += 1
+            self._inflight = None
+        if error is None:
+            metrics.inc('spotify.token_requests')
+            inflight.set_result(result[0])
+        else:
+            inflight.set_exception(error)
+
+    def get(self) -> str:
+        """
+        Return a valid access token, fetching one if the cached token expired.
+
+        Raises:
+            RuntimeError: A refresh is needed on a thread running an event
+                loop; waiting there would block the coroutine doing the
+                refresh, so async code must use `aget`
+        """
+        if self._valid():
+            return self._token
+        if running_loop() is not None:
+            raise RuntimeError("Blocking token refresh on the event loop thread; use aget()")
+        inflight, owner = self._join_refresh()
+        if inflight is None:
+            return self._token
+        if not owner:
+            return inflight.result()
+        try:
+            result = self._fetch()
+        except BaseException as e:
+            self._finish_refresh(inflight, None, e)
+            raise
+        self._finish_refresh(inflight, result, None)
+        return result[0]
+
+    async def aget(self) -> str:
+        """
+        Async `get`: a refresh already running in a thread or another
+        coroutine is awaited rather than repeated.
+        """
+        if self._valid():
+            return self._token
+        inflight, owner = self._join_refresh()
+        if inflight is None:
+            return self._token
+        if not owner:
+            return await asyncio.wrap_future(inflight)
+        try:
+            result = await self._afetch()
+        except BaseException as e:
+            self._finish_refresh(inflight, None, e)
+            raise
+        self._finish_refresh(inflight, result, None)
+        return result[0]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+
+class SpotipyAuth:
+    """
+    Auth manager adapter: spotipy asks it for a token before every call.
+    """
+
+    def __init__(self, token: SingleFlightToken):
+        self.token = token
+
+    def get_access_token(self, as_dict: bool = False, check_cache: bool = True):
+        access_token = self.token.get()
+        return {'access_token': access_token, 'token_type': 'Bearer'} if as_dict else access_token
+
+
+def build_session(pool_size: int, retries: int):
+    """
+    Pooled requests session with spotipy's retry policy (spotipy only applies
+    its own retries to sessions it creates). API calls take a slot from the
+    shared scheduler, and 429s are handed to it instead of being retried by
+    urllib3 behind its back.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        status=retries,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    scheduler = get_spotify_scheduler()
+    send = session.request
+
+    def scheduled_request(method, url, *args, **kwargs):
+        if not url.startswith(API_BASE_URL):
+            return send(method, url, *args, **kwargs)
+        for attempt in range(retries + 1):
+            scheduler.acquire_blocking()
+            response = send(method, url, *args, **kwargs)
+            if response.status_code != 429:
+                break
+            retry_after = float(response.headers.get('Retry-After', 1))
+            scheduler.throttle(retry_after)
+            if retry_after > MAX_RETRY_AFTER_SECONDS:
+                break
+        return response
+
+    session.request = scheduled_request
+    return session
+
+
+class SpotifyClientManager:
+    """
+    Lazily built, shared Spotify client plus its health state.
+
+    Args:
+        client_id: Defaults to env SPOTIFY_CLIENT_ID
+        client_secret: Defaults to env SPOTIFY_CLIENT_SECRET
+        pool_size: Keep-alive connections per host (env SPOTIFY_POOL_SIZE, default 20)
+        timeout: Per-request timeout in seconds (env SPOTIFY_REQUEST_TIMEOUT, default 15)
+        retries: Retries on connection errors and 429/5xx (env SPOTIFY_RETRIES, default 5)
+        health_interval: Seconds between health probes
+            (env SPOTIFY_HEALTH_INTERVAL_SECONDS, default 60)
+    """
+
+    def __init__(
+        self,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        health_interval: Optional[float] = None
+    ):
+        # Strip whitespace that may have been included in the environment variables
+        self.client_id = (client_id or os.getenv('SPOTIFY_CLIENT_ID') or '').strip()
+        self.client_secret = (client_secret or os.getenv('SPOTIFY_CLIENT_SECRET') or '').strip()
+        self.pool_size = pool_size or int(os.getenv('SPOTIFY_POOL_SIZE', 20))
+        self.timeout = timeout or float(os.getenv('SPOTIFY_REQUEST_TIMEOUT', 15))
+        self.retries = retries if retries is not None else int(os.getenv('SPOTIFY_RETRIES', 5))
+        self.health_interval = health_interval or float(os.getenv('SPOTIFY_HEALTH_INTERVAL_SECONDS', 60))
+        # None until the first probe has finished
+        self.healthy: Optional[bool] = None
+        self.last_error: Optional[str] = None
+        self.last_probe_at: Optional[float] = None
+        self.token = SingleFlightToken(self._request_token, self._arequest_token)
+        self._session = None
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = build_session(self.pool_size, self.retries)
+        return self._session
+
+    def _request_token(self) -> Tuple[str, float]:
+        response = self.session.post(
+            TOKEN_URL,
+            data={'grant_type': 'client_credentials'},
+            auth=(self.client_id, self.client_secret),
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        payload = response.json()
+        logger.info("Fetched Spotify access token")
+        return payload['access_token'], time.time() + float(payload.get('expires_in', 3600))
+
+    async def _arequest_token(self) -> Tuple[str, float]:
+        import httpx
+
+        # Once an hour; a short-lived connection is fine
+        async with httpx.AsyncClient(timeout=self.timeout) as http:
+            response = await http.post(
+                TOKEN_URL,
+                data={'grant_type': 'client_credentials'},
+                auth=(self.client_id, self.client_secret)
+            )
+        response.raise_for_status()
+        payload = response.json()
+        logger.info("Fetched Spotify access token")
+        return payload['access_token'], time.time() + float(payload.get('expires_in', 3600))
+
+    @property
+    def async_client(self) -> Any:
+        """
+        The shared `AsyncSpotifyClient`, built on first use.
+        """
+        if self._async_client is None:
+            from .spotify_async import AsyncSpotifyClient
+            self._async_client = AsyncSpotifyClient(self.token, timeout=self.timeout, retries=self.retries)
+        return self._async_client
+
+    def get_async_client(self) -> Any:
+        """
+        Async counterpart of `get_client`, with the same availability rules.
+        """
+        if not self.configured:
+            return None
+        if self.healthy is False:
+            metrics.inc('spotify.unhealthy_skips')
+            return None
+        return self.async_client
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+
+    @property
+    def client(self) -> Any:
+        """
+        The shared `spotipy.Spotify`, built on first use.
+        """
+        if self._client is None:
+            import spotipy
+            session = self.session
+            with self._lock:
+                if self._client is None:
+                    self._client = spotipy.Spotify(
+                        auth_manager=SpotipyAuth(self.token),
+                        requests_session=session,
+                        requests_timeout=self.timeout,
+                        retries=self.retries
+                    )
+                    logger.info("Initialized shared Spotify client")
+        return self._client
+
+    def get_client(self) -> Any:
+        """
+        Return the shared client, or None without credentials or while the
+        last health probe failed.
+        """
+        if not self.configured:
+            return None
+        if self.healthy is False:
+            metrics.inc('spotify.unhealthy_skips')
+            return None
+        return self.client
+
+    async def probe(self) -> bool:
+        """
+        Check the API with a one-result search and record the outcome.
+        """
+        if not self.configured:
+            return False
+        started = time.perf_counter()
+        try:
+            with background_priority():
+                result = await self.async_client.search(q='test', limit=1, type='track')
+            if not result or 'tracks' not in result:
+                raise ValueError("Invalid response format")
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e)
+        metrics.observe('spotify.health_probe_ms', (time.perf_counter() - started) * 1000)
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("Spotify API is healthy")
+            else:
+                logger.error(f"Spotify API health probe failed: {error}")
+        self.healthy, self.last_error, self.last_probe_at = healthy, error, time.time()
+        metrics.set_gauge('spotify.healthy', 1 if healthy else 0)
+        return healthy
+
+    async def run_health_probe(self) -> None:
+        """
+        Probe forever; cancel the task to stop. Failed probes are retried
+        sooner so recovery is noticed quickly.
+        """
+        if not self.configured:
+            logger.error("Spotify credentials not found in environment variables")
+            return
+        while True:
+            healthy = await self.probe()
+            await asyncio.sleep(self.health_interval if healthy else min(self.health_interval, 10))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'configured': self.configured,
+            'healthy': self.healthy,
+            'last_error': self.last_error,
+            'last_probe_at': self.last_probe_at,
+            'token_requests': self.token.fetches,
+            'scheduler': get_spotify_scheduler().status(),
+        }
+
+
+_manager: Optional[SpotifyClientManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_spotify_manager() -> SpotifyClientManager:
+    """
+    Return the process-wide Spotify client manager.
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = SpotifyClientManager()
+    return _manager
+
+
+__all__ = ['SingleFlightToken', 'SpotifyClientManager', 'SpotipyAuth', 'get_spotify_manager']
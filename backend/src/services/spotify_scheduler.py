@@ -0,0 +1,243 @@
+"""
+Spotify Request Scheduler
+
+Every Spotify Web API call, from the async client and from spotipy, takes a
+slot from one process-wide scheduler before it is sent. Previously each code
+path retried 429s on its own, so a rate-limit hit in one place did not slow
+the others down and the retries deepened the penalty.
+
+Key Architectural Decisions:
+1. Token Bucket: Calls are paced to SPOTIFY_RATE_LIMIT_PER_SECOND with bursts
+   of up to SPOTIFY_RATE_LIMIT_BURST, sized to the app's quota rather than
+   discovered through 429s. A rate of 0 disables pacing.
+2. Global Retry-After: A 429 on any call blocks all calls until its
+   Retry-After has passed. If that is longer than MAX_RETRY_AFTER_SECONDS,
+   calls fail with `RateLimited` at once so callers fall back to mock data
+   instead of hanging.
+3. Priorities: Waiting async calls are served in priority order, then FIFO.
+   User-facing requests run at INTERACTIVE, the default. Pool refills and
+   other prefetches run inside `background_priority()`. The priority is a
+   context variable, so it follows the task without being threaded through
+   the service functions.
+4. Blocking Callers: spotipy runs in worker threads and cannot join the
+   asyncio queue. It shares the bucket and the Retry-After block, but only
+   takes a slot while no async call is waiting, which ranks it as background.
+   Called on an event-loop thread it would stall the loop the queued async
+   calls need to drain, so it raises instead; blocking clients belong in
+   `asyncio.to_thread`.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+# Longest Retry-After waited out before failing calls instead
+MAX_RETRY_AFTER_SECONDS = 10.0
+
+spotify_priority: contextvars.ContextVar = contextvars.ContextVar('spotify_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """
+    Run the Spotify calls made inside the block at BACKGROUND priority.
+    """
+    reset = spotify_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        spotify_priority.reset(reset)
+
+
+def running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """
+    The event loop running on the current thread, or None.
+    """
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class RateLimited(Exception):
+    """
+    Spotify asked us to back off for longer than we are willing to wait.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Spotify rate limit: retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class SpotifyScheduler:
+    """
+    Token bucket with a global Retry-After block and a priority queue.
+
+    Args:
+        rate: Calls per second (env SPOTIFY_RATE_LIMIT_PER_SECOND, default 10; 0 disables pacing)
+        burst: Bucket capacity (env SPOTIFY_RATE_LIMIT_BURST, default 20)
+        max_block_seconds: Longest Retry-After block that calls wait out
+        clock: Monotonic time source (for tests)
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_block_seconds: float = MAX_RETRY_AFTER_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = rate if rate is not None else float(os.getenv('SPOTIFY_RATE_LIMIT_PER_SECOND', 10))
+        self.burst = burst or int(os.getenv('SPOTIFY_RATE_LIMIT_BURST', 20))
+        self.max_block_seconds = max_block_seconds
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        # Waiting async calls as (priority, arrival) plus an event that is
+        # replaced whenever the head of the queue changes
+        self._queue: List[Tuple[int, int]] = []
+        self._arrivals = itertools.count()
+        # Created on first use so it belongs to the serving event loop
+        self._changed: Optional[asyncio.Event] = None
+        self.throttle_events = 0
+
+    def _reserve(self) -> float:
+        """
+        Take a slot and return 0, or return how long until one is available.
+        """
+        with self._lock:
+            now = self._clock()
+            if now < self._blocked_until:
+                blocked = self._blocked_until - now
+                if blocked > self.max_block_seconds:
+                    raise RateLimited(blocked)
+                return blocked
+            if self.rate <= 0:
+                return 0.0
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _notify(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+        self._changed = asyncio.Event()
+        metrics.set_gauge('spotify.queue_depth', len(self._queue))
+
+    async def acquire(self, priority: Optional[int] = None) -> None:
+        """
+        Wait for a slot; higher-priority (lower value) callers go first.
+
+        Raises:
+            RateLimited: Spotify's Retry-After exceeds `max_block_seconds`
+        """
+        priority = spotify_priority.get() if priority is None else priority
+        if not self._queue and self._reserve() == 0:
+            return
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        entry = (priority, next(self._arrivals))
+        heapq.heappush(self._queue, entry)
+        if self._queue[0] == entry:
+            self._notify()
+        metrics.set_gauge('spotify.queue_depth', len(self._queue))
+        metrics.inc('spotify.queued')
+        started = time.perf_counter()
+        try:
+            while True:
+                changed = self._changed
+                if self._queue[0] == entry:
+                    wait = self._reserve()
+                    if wait == 0:
+                        return
+                    try:
+                        await asyncio.wait_for(changed.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await changed.wait()
+        finally:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._notify()
+            metrics.observe(f"spotify.queue_wait_ms.{PRIORITY_NAMES.get(priority, priority)}",
+                            (time.perf_counter() - started) * 1000)
+
+    def acquire_blocking(self) -> None:
+        """
+        Blocking `acquire` for worker threads, served after queued async calls.
+
+        Raises:
+            RuntimeError: Called on a thread that is running an event loop
+            RateLimited: Spotify's Retry-After exceeds `max_block_seconds`
+        """
+        if running_loop() is not None:
+            raise RuntimeError("Blocking Spotify call on the event loop thread; run it with asyncio.to_thread")
+        while True:
+            if self._queue:
+                time.sleep(0.05)
+                continue
+            wait = self._reserve()
+            if wait == 0:
+                return
+            time.sleep(min(wait, 0.5))
+
+    def throttle(self, retry_after: float) -> None:
+        """
+        Block every call for `retry_after` seconds after a 429.
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + retry_after)
+            self._tokens = 0.0
+            self.throttle_events += 1
+        metrics.inc('spotify.throttle_events')
+        logger.warning(f"Spotify rate limit hit; pausing all calls for {retry_after:.1f}s")
+
+    def status(self) -> dict:
+        return {
+            'queue_depth': len(self._queue),
+            'blocked_for_seconds': max(0.0, self._blocked_until - self._clock()),
+            'throttle_events': self.throttle_events,
+        }
+
+
+_scheduler: Optional[SpotifyScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_spotify_scheduler() -> SpotifyScheduler:
+    """
+    Return the process-wide Spotify request scheduler.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SpotifyScheduler()
+    return _scheduler
+
+
+__all__ = [
+    'SpotifyScheduler', 'RateLimited', 'background_priority', 'get_spotify_scheduler', 'running_loop',
+    'spotify_priority', 'INTERACTIVE', 'BACKGROUND', 'MAX_RETRY_AFTER_SECONDS'
+]
@@ -11,17 +11,39 @@ Key Architectural Decisions:
    are hit or the API fails, the service gracefully degrades to mock data instead of crashing.
 2. Market Filtering: Uses Spotify's 'market' parameters and localized seed artists to
    ensure recommendations are culturally relevant to the user.
+3. Shared Client: `get_spotify_client` hands out one long-lived client per process
+   (pooled connections, cached token, background health probe) instead of
+   authenticating and test-searching on every call.
+4. Non-Blocking Calls: The async functions here await the asyncio-native client
+   from `get_async_spotify_client`, so Spotify round-trips never block the event
+   loop; independent lookups (per-artist top tracks, keyword searches) run
+   concurrently.
+5. Cached Recommendations: `fetch_random_tracks` draws its audio-feature targets
+   from a few quantized buckets and serves results through a stale-while-
+   revalidate cache (see recommendation_cache.py).
+6. Coalesced Calls: `get_async_spotify_client` wraps the client so concurrent
+   calls with the same endpoint and parameters (e.g. the "{mood} mood"
+   playlist search during a spike) share one upstream request and response.
+7. Local Track Metadata: Every track parsed from a recommendation or search is
+   written to the SQLite track store, and `fetch_tracks_by_ids` serves lookups
+   from it, fetching only missing or expired IDs (see track_store.py).
 """
 
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 import os
-from typing import List, NamedTuple, Union, Optional
+from typing import Any, Dict, List, NamedTuple, Union, Optional
 import asyncio
 import random
 import logging
 import traceback
 
+from .candidate_pool import get_candidate_pools
+from .metrics import metrics
+from .recommendation_cache import TARGET_BUCKETS, bucket_target, get_recommendation_cache
+from .spotify_async import AsyncSpotifyClient
+from .spotify_client import get_spotify_manager
+from .spotify_scheduler import background_priority
+from .track_store import get_track_store
+
 logger = logging.getLogger(__name__)
 
 # Mood parameters for Spotify recommendations
@@ -146,62 +168,94 @@ class Track(NamedTuple):
 
 def get_spotify_client():
     """
-    Initialize and return a Spotify client using environment variables.
-    If authentication fails, return None.
+    Return the process-wide Spotify client (see spotify_client.py).
+    Returns None if credentials are missing or the API is currently unhealthy.
     """
     try:
-        client_id = os.getenv('SPOTIFY_CLIENT_ID')
-        client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
-        
-        # Log credential presence without revealing actual values
-        logger.info(f"Spotify credentials present: Client ID: {bool(client_id)}, Client Secret: {bool(client_secret)}")
-        
-        if not client_id or not client_secret:
-            logger.error("Spotify credentials not found in environment variables")
-            return None
-            
-        # Remove any whitespace that might have been included in the environment variables
-        client_id = client_id.strip()
-        client_secret = client_secret.strip()
-        
-        logger.info("Initializing Spotify client...")
-        
-        try:
-            # Create the client credentials manager
-            client_credentials_manager = SpotifyClientCredentials(
-                client_id=client_id, 
-                client_secret=client_secret
-            )
-            
-            # Create the Spotify client
-            client = spotipy.Spotify(
-                client_credentials_manager=client_credentials_manager,
-                requests_timeout=15,  # Increased timeout
-                retries=5             # Increased retries
-            )
-            
-            # Test with a simple search query first
-            logger.debug("Testing Spotify client with search query...")
-            search_result = client.search(q='test', limit=1, type='track')
-            if not search_result or 'tracks' not in search_result:
-                logger.error("Spotify search test failed: Invalid response format")
-                return None
-                
-            logger.info("Successfully initialized Spotify client")
-            return client
-            
-        except Exception as e:
-            logger.error(f"Failed to authenticate with Spotify: {str(e)}")
-            logger.error("Please check if your Spotify API credentials are valid")
-            if hasattr(e, 'response') and e.response:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response text: {e.response.text}")
-            return None
-        
+        return get_spotify_manager().get_client()
     except Exception as e:
         logger.error(f"Failed to initialize Spotify client: {str(e)}")
         return None
 
+def _normalize(value: Any) -> Any:
+    """Hashable, order-independent form of call arguments."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _normalize(item)) for key, item in value.items() if item is not None))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+class CoalescingSpotifyClient:
+    """
+    Wraps an `AsyncSpotifyClient` so concurrent identical calls share one
+    upstream request. Only calls in flight are shared; nothing is cached.
+    """
+
+    COALESCED_METHODS = frozenset([
+        'search', 'recommendations', 'tracks', 'audio_features',
+        'artist_top_tracks', 'artist_related_artists'
+    ])
+
+    def __init__(self, client: AsyncSpotifyClient):
+        self.client = client
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self.client, name)
+        if name not in self.COALESCED_METHODS:
+            return method
+
+        async def coalesced_call(*args, **kwargs):
+            return await self._call(name, method, args, kwargs)
+
+        return coalesced_call
+
+    async def _call(self, name: str, method: Any, args: tuple, kwargs: dict) -> Any:
+        key = (name, _normalize(args), _normalize(kwargs))
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            # The first caller's priority applies to the shared request
+            task = asyncio.ensure_future(method(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+            metrics.inc('spotify.coalesced_calls')
+        metrics.set_gauge('spotify.coalescing_ratio', self.coalesced / self.calls)
+        # Shielded so one cancelled caller does not cancel the request the others await
+        return await asyncio.shield(task)
+
+    def _finish(self, key: tuple, done: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not done.cancelled():
+            # Mark the error retrieved in case every caller was cancelled
+            done.exception()
+
+_coalescing_client: Optional[CoalescingSpotifyClient] = None
+
+def get_async_spotify_client() -> Optional[CoalescingSpotifyClient]:
+    """
+    Return the process-wide asyncio Spotify client, with the same availability
+    rules as `get_spotify_client`, wrapped so identical concurrent calls are
+    coalesced.
+    """
+    global _coalescing_client
+    try:
+        client = get_spotify_manager().get_async_client()
+        if client is None:
+            return None
+        if _coalescing_client is None or _coalescing_client.client is not client:
+            _coalescing_client = CoalescingSpotifyClient(client)
+        return _coalescing_client
+    except Exception as e:
+        logger.error(f"Failed to initialize async Spotify client: {str(e)}")
+        return None
+
 async def generate_mood_playlist(mood: str, limit: int = 10) -> List[SpotifyTrack]:
     """
     Generate a playlist based on the given mood.
@@ -213,7 +267,8 @@ async def generate_mood_playlist(mood: str, limit: int = 10) -> List[SpotifyTrac
     # Use the MoodRecommender class for better results
     from .recommender import MoodRecommender
     recommender = MoodRecommender()
-    results = recommender.get_recommendations_by_mood(mood, limit)
+    # The recommender uses the blocking spotipy client; keep it off the event loop
+    results = await asyncio.to_thread(recommender.get_recommendations_by_mood, mood, limit)
     
     return [
         SpotifyTrack(
@@ -254,7 +309,7 @@ def _generate_mood_playlist(mood: str, limit: int = 10) -> List[Track]:
     
     return tracks[:limit]
 
-def search_tracks(query: str, limit: int = 10, language: Optional[str] = None) -> List[SpotifyTrack]:
+async def search_tracks(query: str, limit: int = 10, language: Optional[str] = None) -> List[SpotifyTrack]:
     """
     Search Spotify tracks based on a query.
     
@@ -262,14 +317,16 @@ def search_tracks(query: str, limit: int = 10, language: Optional[str] = None) -
     :param limit: Maximum number of tracks to return
     :return: List of SpotifyTrack objects
     """
-    sp = get_spotify_client()
+    sp = get_async_spotify_client()
+    if not sp:
+        raise RuntimeError("Spotify client not available")
 
     market = None
     if language:
         lang_key = language.lower()
         market = LANGUAGE_CONFIGS.get(lang_key, LANGUAGE_CONFIGS.get('english', {})).get('market')
     
-    results = sp.search(q=query, type='track', limit=limit, market=market) if market else sp.search(q=query, type='track', limit=limit)
+    results = await sp.search(q=query, type='track', limit=limit, market=market)
     
     tracks = []
     for item in results['tracks']['items']:
@@ -291,6 +348,7 @@ def search_tracks(query: str, limit: int = 10, language: Optional[str] = None) -
         )
         tracks.append(track)
     
+    remember_tracks(tracks)
     return tracks
 
 LANGUAGE_CONFIGS = {
@@ -414,7 +472,7 @@ mood_params = {
     }
 }
 
-async def find_bangla_artists(spotify: spotipy.Spotify, mood: str, limit: int = 5) -> List[str]:
+async def find_bangla_artists(spotify: AsyncSpotifyClient, mood: str, limit: int = 5) -> List[str]:
     """
     Dynamically find Bangladeshi artists based on mood.
     Returns list of artist IDs.
@@ -430,7 +488,7 @@ async def find_bangla_artists(spotify: spotipy.Spotify, mood: str, limit: int =
     
     try:
         for term in search_terms:
-            results = spotify.search(q=term, type='artist', limit=limit, market='BD')
+            results = await spotify.search(q=term, type='artist', limit=limit, market='BD')
             for artist in results['artists']['items']:
                 # Check if artist has sufficient popularity and followers
                 if artist['popularity'] > 20 and artist['followers']['total'] > 1000:
@@ -438,7 +496,7 @@ async def find_bangla_artists(spotify: spotipy.Spotify, mood: str, limit: int =
                     
                     # Get related artists
                     try:
-                        related = spotify.artist_related_artists(artist['id'])
+                        related = await spotify.artist_related_artists(artist['id'])
                         for related_artist in related['artists'][:2]:  # Get top 2 related artists
                             if related_artist['popularity'] > 20:
                                 artists.add(related_artist['id'])
@@ -454,13 +512,18 @@ async def find_bangla_artists(spotify: spotipy.Spotify, mood: str, limit: int =
         
     return list(artists)[:limit]
 
-async def get_tracks_from_artists(spotify: spotipy.Spotify, artist_ids: List[str], limit: int, mood: str) -> List[SpotifyTrack]:
+async def get_tracks_from_artists(spotify: AsyncSpotifyClient, artist_ids: List[str], limit: int, mood: str) -> List[SpotifyTrack]:
     """Get tracks from specific artists."""
     tracks = []
-    for artist_id in artist_ids:
+    # Fetch every artist's top tracks concurrently
+    responses = await asyncio.gather(
+        *(spotify.artist_top_tracks(artist_id, country='BD') for artist_id in artist_ids),
+        return_exceptions=True
+    )
+    for artist_id, results in zip(artist_ids, responses):
         try:
-            # Get artist's top tracks
-            results = spotify.artist_top_tracks(artist_id, country='BD')
+            if isinstance(results, Exception):
+                raise results
             for item in results['tracks']:
                 image_url = item['album']['images'][0]['url'] if item['album']['images'] else None
                 track = SpotifyTrack(
@@ -482,20 +545,27 @@ async def get_tracks_from_artists(spotify: spotipy.Spotify, artist_ids: List[str
     random.shuffle(tracks)
     return tracks[:limit]
 
-async def search_bangla_tracks(spotify: spotipy.Spotify, keywords: List[str], limit: int, mood: str) -> List[SpotifyTrack]:
+async def search_bangla_tracks(spotify: AsyncSpotifyClient, keywords: List[str], limit: int, mood: str) -> List[SpotifyTrack]:
     """Search for Bangla tracks using keywords."""
     tracks = []
-    for keyword in keywords:
+    
+    async def search_keyword(keyword: str) -> list:
+        # Search with various combinations
+        search_queries = [
+            f"bangla {keyword} rock",
+            f"bangladeshi {keyword}",
+            f"bengali {keyword} music"
+        ]
+        return await asyncio.gather(*(
+            spotify.search(q=query, type='track', limit=limit, market='BD') for query in search_queries
+        ))
+    
+    responses = await asyncio.gather(*(search_keyword(keyword) for keyword in keywords), return_exceptions=True)
+    for keyword, keyword_results in zip(keywords, responses):
         try:
-            # Search with various combinations
-            search_queries = [
-                f"bangla {keyword} rock",
-                f"bangladeshi {keyword}",
-                f"bengali {keyword} music"
-            ]
-            
-            for query in search_queries:
-                results = spotify.search(q=query, type='track', limit=limit, market='BD')
+            if isinstance(keyword_results, Exception):
+                raise keyword_results
+            for results in keyword_results:
                 for item in results['tracks']['items']:
                     image_url = item['album']['images'][0]['url'] if item['album']['images'] else None
                     track = SpotifyTrack(
@@ -514,11 +584,20 @@ async def search_bangla_tracks(spotify: spotipy.Spotify, keywords: List[str], li
             logger.error(f"Failed to search with keyword {keyword}: {str(e)}")
             continue
     
+    remember_tracks(tracks)
     random.shuffle(tracks)
     return tracks[:limit]
 
-async def get_recommendations(spotify: spotipy.Spotify, lang_config: dict, mood_config: dict, limit: int, mood: str) -> List[SpotifyTrack]:
-    # Get tracks using Spotify's recommendation API.
+async def get_recommendations(
+    spotify: AsyncSpotifyClient,
+    lang_config: dict,
+    mood_config: dict,
+    limit: int,
+    mood: str,
+    target_bucket: Optional[int] = None
+) -> List[SpotifyTrack]:
+    # Get tracks using Spotify's recommendation API. With a target_bucket the
+    # audio-feature targets are that bucket's midpoints (cacheable) instead of random.
     try:
         logger.info(f"Getting recommendations for mood: {mood}, language config: {lang_config['market']}")
         
@@ -528,9 +607,13 @@ async def get_recommendations(spotify: spotipy.Spotify, lang_config: dict, mood_
             'market': lang_config.get('market', 'US'),
         }
         
-        # Add audio features based on mood
+        # Add audio features based on mood; (low, high) target ranges become one value
         for key, value in mood_config.items():
-            if key != 'seed_genres':  # Handle seed_genres separately
+            if key in ('seed_genres', 'bangla_keywords'):  # Not recommendation parameters
+                continue
+            if isinstance(value, tuple):
+                params[key] = bucket_target(value, target_bucket) if target_bucket is not None else random.uniform(*value)
+            else:
                 params[key] = value
                 
         logger.debug(f"Audio feature parameters: {params}")
@@ -595,15 +678,10 @@ async def get_recommendations(spotify: spotipy.Spotify, lang_config: dict, mood_
         logger.info(f"Final recommendation parameters: seed_genres={seed_genres}, "
                    f"seed_artists={seed_artists}, seed_tracks={seed_tracks}")
             
-        # Add audio feature targets
-        if 'target_valence' in mood_config:
-            params['target_valence'] = random.uniform(*mood_config['target_valence'])
-        if 'target_energy' in mood_config:
-            params['target_energy'] = random.uniform(*mood_config['target_energy'])
         # Make the API call
         logger.debug(f"Calling Spotify recommendations API with params: {params}")
         try:
-            response = spotify.recommendations(**params)
+            response = await spotify.recommendations(**params)
             
             if not response or 'tracks' not in response:
                 logger.error(f"Invalid response from Spotify recommendations API: {response}")
@@ -636,23 +714,55 @@ async def get_recommendations(spotify: spotipy.Spotify, lang_config: dict, mood_
                     logger.error(f"Error processing track item: {str(track_err)}")
                     continue
             
+            remember_tracks(tracks)
             return tracks
             
         except Exception as e:
             logger.error(f"Error calling Spotify recommendations API: {str(e)}")
-            if hasattr(e, 'response') and e.response:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response text: {e.response.text}")
+            logger.error(f"Response status: {getattr(e, 'http_status', 'Unknown')}")
             return []
         
     except Exception as e:
-        logger.error(f"HTTP Error for GET to {spotify.recommendations.url} with Params: {params} returned {getattr(e, 'http_status', 'Unknown')} due to {getattr(e, 'msg', str(e))}")
+        logger.error(f"HTTP Error for GET to recommendations returned {getattr(e, 'http_status', 'Unknown')} due to {getattr(e, 'msg', str(e))}")
         logger.error(f"Error getting recommendations: {str(e)}")
         return []
 
+# Tracks requested per candidate-pool refill call (Spotify's maximum)
+CANDIDATE_POOL_BATCH = 100
+
+def candidate_pool_key(mood: str, language: Optional[str]) -> tuple:
+    """
+    (mood, language) pool key; moods and languages without their own
+    configuration share the pool of the config they fall back to.
+    """
+    mood_key = mood.lower() if mood.lower() in mood_params else 'neutral'
+    language_key = language if language in LANGUAGE_CONFIGS else 'english'
+    return mood_key, language_key
+
+async def fill_candidate_pool(key: tuple, round_index: int) -> List[SpotifyTrack]:
+    """
+    Fetch one batch of recommendations for a candidate pool, at background
+    priority. Successive rounds cycle through the target buckets so one refill
+    covers the mood's range.
+    """
+    spotify = get_async_spotify_client()
+    if not spotify:
+        return []
+    mood_key, language_key = key
+    with background_priority():
+        return await get_recommendations(
+            spotify,
+            LANGUAGE_CONFIGS[language_key],
+            mood_params[mood_key],
+            CANDIDATE_POOL_BATCH,
+            mood_key,
+            target_bucket=round_index % TARGET_BUCKETS
+        )
+
 async def fetch_random_tracks(mood: str, limit: int = 10, language: str = None) -> List[SpotifyTrack]:
     """
-    Fetch random tracks based on a mood and language using Spotify's recommendations API.
+    Fetch random tracks based on a mood and language, sampled from the candidate
+    pool or, until the pool is filled, from Spotify's recommendations API.
     If Spotify API fails, returns mock data.
     
     Args:
@@ -664,24 +774,28 @@ async def fetch_random_tracks(mood: str, limit: int = 10, language: str = None)
         List[SpotifyTrack]: List of tracks matching the mood
     """
     try:
-        spotify = get_spotify_client()
+        spotify = get_async_spotify_client()
         if not spotify:
             logger.warning("Spotify client not available, using mock data")
             return generate_mock_tracks(mood, limit)
             
+        # Sample from the (mood, language) candidate pool when it is filled
+        pooled = get_candidate_pools().sample(candidate_pool_key(mood, language), limit)
+        if pooled:
+            return [track if track.mood == mood else track._replace(mood=mood) for track in pooled]
+
         # Get language config
         lang_config = LANGUAGE_CONFIGS.get(language or 'english', LANGUAGE_CONFIGS['english'])
         mood_config = mood_params.get(mood.lower(), mood_params['neutral'])
         
-        # Get tracks using Spotify's recommendation API
+        # Get tracks using Spotify's recommendation API, through the cache keyed
+        # on a randomly chosen target bucket
         try:
-            # Directly call the async function and await it
-            tracks = await get_recommendations(
-                spotify,
-                lang_config,
-                mood_config,
-                limit,
-                mood
+            target_bucket = random.randrange(TARGET_BUCKETS)
+            cache_key = (mood.lower(), lang_config.get('market'), target_bucket, limit)
+            tracks = await get_recommendation_cache().get(
+                cache_key,
+                lambda: get_recommendations(spotify, lang_config, mood_config, limit, mood, target_bucket)
             )
             
             if tracks and len(tracks) > 0:
@@ -700,6 +814,75 @@ async def fetch_random_tracks(mood: str, limit: int = 10, language: str = None)
         logger.error(traceback.format_exc())
         return generate_mock_tracks(mood, limit)
 
+# Spotify's limit for GET /tracks
+TRACKS_PER_REQUEST = 50
+# IDs accepted per fetch_tracks_by_ids call, which bounds its concurrent upstream requests
+MAX_TRACK_IDS = 100
+
+def remember_tracks(tracks: List[SpotifyTrack]) -> None:
+    """
+    Write parsed tracks to the local metadata store; failures only cost cache hits.
+    """
+    try:
+        get_track_store().put_many(tracks)
+    except Exception as e:
+        logger.error(f"Failed to store track metadata: {str(e)}")
+
+async def fetch_tracks_by_ids(ids: List[str]) -> List[SpotifyTrack]:
+    """
+    Fetch tracks by Spotify ID, in request order. Fresh entries come from the
+    local metadata store; the rest are fetched in parallel 50-ID requests and
+    stored. Unknown IDs are left out. While Spotify is unavailable or the
+    refetch fails, expired store entries are served instead.
+
+    Raises:
+        ValueError: More than MAX_TRACK_IDS IDs were requested
+        RuntimeError: Some tracks were never stored locally and Spotify is unavailable
+    """
+    if len(ids) > MAX_TRACK_IDS:
+        raise ValueError(f"At most {MAX_TRACK_IDS} track IDs per request")
+    store = get_track_store()
+    found, missing = store.get_many(ids)
+    if missing:
+        spotify = get_async_spotify_client()
+        try:
+            if not spotify:
+                raise RuntimeError("Spotify client not available")
+            chunks = [missing[start:start + TRACKS_PER_REQUEST] for start in range(0, len(missing), TRACKS_PER_REQUEST)]
+            responses = await asyncio.gather(*(spotify.tracks(chunk) for chunk in chunks))
+        except Exception as e:
+            stale, unknown = store.get_many(missing, include_stale=True)
+            if unknown:
+                raise
+            logger.warning(f"Serving {len(stale)} stale tracks from the store: {e}")
+            metrics.inc('track_store.stale_served', len(stale))
+            found.update(stale)
+            responses = []
+        fetched = []
+        for response in responses:
+            for item in response.get('tracks', []):
+                # Spotify returns null for IDs it does not know
+                if not item:
+                    continue
+                images = (item.get('album') or {}).get('images', [])
+                fetched.append(SpotifyTrack(
+                    id=item['id'],
+                    name=item['name'],
+                    artist=item['artists'][0]['name'] if item['artists'] else "Unknown",
+                    album_name=(item.get('album') or {}).get('name'),
+                    album_art_url=images[0]['url'] if images else None,
+                    preview_url=item.get('preview_url'),
+                    external_url=item.get('external_urls', {}).get('spotify'),
+                    uri=item['uri'],
+                    mood='unknown'
+                ))
+        remember_tracks(fetched)
+        found.update((track.id, track._asdict()) for track in fetched)
+    return [
+        SpotifyTrack(**{**found[track_id], 'mood': 'unknown'})
+        for track_id in ids if track_id in found
+    ]
+
 def get_supported_languages() -> List[str]:
     """
     Get list of supported languages for song recommendations.
@@ -768,7 +951,7 @@ async def fetch_mood_playlists(mood: str, limit: int = 5, language: Optional[str
         List[SpotifyPlaylist]: List of playlists matching the mood
     """
     try:
-        spotify = get_spotify_client()
+        spotify = get_async_spotify_client()
         if not spotify:
             logger.warning("Spotify client not available, using mock playlists")
             return generate_mock_playlists(mood, limit)
@@ -790,7 +973,7 @@ async def fetch_mood_playlists(mood: str, limit: int = 5, language: Optional[str
 
         try:
             # Spotify search for playlists
-            results = spotify.search(q=query, type='playlist', limit=limit, market=market)
+            results = await spotify.search(q=query, type='playlist', limit=limit, market=market)
 
             if not results or 'playlists' not in results or not results['playlists']['items']:
                 logger.warning(f"No playlists found for query: {query}")
@@ -0,0 +1,185 @@
+"""
+Track Metadata Store
+
+A local SQLite table of Spotify track metadata (name, artist, album, artwork,
+preview and links), filled from every track payload the service already
+parses, so `/api/spotify/tracks` can answer most lookups without Spotify.
+A second table keeps audio features (see audio_features.py).
+
+Key Architectural Decisions:
+1. SQLite: The standard library's sqlite3 is persistent across restarts,
+   needs no extra service, and a primary-key lookup of a few dozen IDs takes
+   well under a millisecond. WAL mode with `synchronous=NORMAL` keeps the
+   small upserts cheap enough to run on the event loop.
+2. Write-Through From Existing Calls: Recommendations and searches already
+   return full track objects; they are upserted as they are parsed instead of
+   looked up again later.
+3. TTL Revalidation: Entries older than `ttl_seconds` count as misses, so the
+   next lookup refetches and rewrites them. Metadata rarely changes, but
+   preview URLs and artwork do, so entries are not kept forever. Expired rows
+   stay in the table, so `include_stale` lookups can still serve them while
+   Spotify is unavailable. Audio features are computed once per track ID and
+   never expire.
+4. Per-Process Connection: One connection per worker process, guarded by a
+   lock, with one database file per deployment. `TRACK_STORE_PATH=:memory:`
+   keeps the store in memory only.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRACK_FIELDS = ('id', 'name', 'artist', 'album_name', 'album_art_url', 'preview_url', 'external_url', 'uri')
+
+
+class TrackStore:
+    """
+    SQLite-backed track metadata keyed by Spotify track ID.
+
+    Args:
+        path: Database file (env TRACK_STORE_PATH, default .cache/tracks.sqlite3)
+        ttl_seconds: Age after which an entry is refetched
+            (env TRACK_STORE_TTL_SECONDS, default 604800)
+        clock: Epoch time source (for tests)
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.path = path or os.getenv('TRACK_STORE_PATH', os.path.join('.cache', 'tracks.sqlite3'))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('TRACK_STORE_TTL_SECONDS', 7 * 24 * 3600))
+        self._clock = clock
+        self._lock = threading.Lock()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            if self.path != ':memory:':
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS tracks ('
+                'id TEXT PRIMARY KEY, name TEXT NOT NULL, artist TEXT, album_name TEXT, '
+                'album_art_url TEXT, preview_url TEXT, external_url TEXT, uri TEXT, '
+                'fetched_at REAL NOT NULL)'
+            )
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS audio_features (id TEXT PRIMARY KEY, features TEXT NOT NULL)'
+            )
+            self._db.commit()
+
+    def put_many(self, tracks: Iterable[Any]) -> int:
+        """
+        Upsert tracks (objects with the TRACK_FIELDS attributes); returns the count.
+        """
+        now = self._clock()
+        rows = [
+            tuple(getattr(track, field, None) for field in TRACK_FIELDS) + (now,)
+            for track in tracks if getattr(track, 'id', None)
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO tracks ({', '.join(TRACK_FIELDS)}, fetched_at) "
+                f"VALUES ({', '.join('?' * (len(TRACK_FIELDS) + 1))})",
+                rows
+            )
+            self._db.commit()
+        return len(rows)
+
+    def get_many(self, ids: List[str], include_stale: bool = False) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Look up tracks by ID.
+
+        Args:
+            ids: Spotify track IDs
+            include_stale: Also return entries older than `ttl_seconds`
+                (fallback when they cannot be refetched)
+
+        Returns:
+            (fresh entries by ID, IDs that are missing or expired, deduplicated
+            in request order)
+        """
+        unique = list(dict.fromkeys(ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        if unique:
+            cutoff = float('-inf') if include_stale else self._clock() - self.ttl_seconds
+            with self._lock:
+                # SQLite allows 999 bound parameters per statement
+                for start in range(0, len(unique), 500):
+                    chunk = unique[start:start + 500]
+                    cursor = self._db.execute(
+                        f"SELECT {', '.join(TRACK_FIELDS)} FROM tracks "
+                        f"WHERE fetched_at >= ? AND id IN ({', '.join('?' * len(chunk))})",
+                        [cutoff, *chunk]
+                    )
+                    for row in cursor.fetchall():
+                        found[row[0]] = dict(zip(TRACK_FIELDS, row))
+        missing = [track_id for track_id in unique if track_id not in found]
+        metrics.inc('track_store.hits', len(found))
+        metrics.inc('track_store.misses', len(missing))
+        return found, missing
+
+    def put_audio_features(self, features: Iterable[Dict[str, Any]]) -> int:
+        """
+        Store Spotify audio-feature objects (keyed by their `id`); returns the count.
+        """
+        rows = [(item['id'], json.dumps(item)) for item in features if item and item.get('id')]
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO audio_features (id, features) VALUES (?, ?)', rows)
+            self._db.commit()
+        return len(rows)
+
+    def get_audio_features(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Stored audio features by track ID; IDs without stored features are absent.
+        """
+        unique = list(dict.fromkeys(ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                cursor = self._db.execute(
+                    f"SELECT id, features FROM audio_features WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+                for track_id, features in cursor.fetchall():
+                    found[track_id] = json.loads(features)
+        return found
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_store: Optional[TrackStore] = None
+_store_lock = threading.Lock()
+
+
+def get_track_store() -> TrackStore:
+    """
+    Return the process-wide track metadata store.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TrackStore()
+    return _store
+
+
+__all__ = ['TrackStore', 'get_track_store', 'TRACK_FIELDS']
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from src.services.admission import (
+    AdmissionController, AdmissionRejected, check_image_dimensions, estimate_decoded_bytes
+)
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_pixel_bytes=100, max_queue=0, queue_timeout_ms=50)
+        async with controller.admit(10):
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with controller.admit(10):
+                    pass
+        assert rejected.value.reason == 'queue_full'
+        assert controller.inflight == 0
+    asyncio.run(scenario())
+
+def test_waiter_is_admitted_when_slot_frees():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_pixel_bytes=100, max_queue=4, queue_timeout_ms=1000)
+        order = []
+
+        async def request(name, hold):
+            async with controller.admit(10):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        await asyncio.gather(request('first', 0.02), request('second', 0))
+        assert order == ['first', 'second']
+    asyncio.run(scenario())
+
+def test_wait_times_out():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_pixel_bytes=100, max_queue=4, queue_timeout_ms=10)
+        async with controller.admit(10):
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with controller.admit(10):
+                    pass
+        assert rejected.value.reason == 'queue_timeout'
+        assert controller.waiting == 0
+    asyncio.run(scenario())
+
+def test_pixel_budget_limits_concurrency():
+    async def scenario():
+        controller = AdmissionController(max_inflight=10, max_pixel_bytes=100, max_queue=0, queue_timeout_ms=10)
+        async with controller.admit(80):
+            with pytest.raises(AdmissionRejected):
+                async with controller.admit(30):
+                    pass
+            async with controller.admit(20):
+                assert controller.inflight_bytes == 100
+    asyncio.run(scenario())
+
+def test_decompression_bomb_dimensions():
+    check_image_dimensions(4000, 3000)
+    with pytest.raises(ValueError):
+        check_image_dimensions(100_000, 100_000)
+
+def test_jpeg_cost_uses_draft_scale():
+    jpeg = estimate_decoded_bytes(4000, 3000, 'JPEG', 1024)
+    png = estimate_decoded_bytes(4000, 3000, 'PNG', 1024)
+    assert jpeg < png / 4
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.ml_models.artifact_store import LazyModel, ModelArtifactStore
+
+def write_model(tmp_path, content):
+    path = tmp_path / 'emotion_model.h5'
+    path.write_bytes(content)
+    return str(path)
+
+def test_publish_creates_versions(tmp_path):
+    store = ModelArtifactStore(root=str(tmp_path / 'store'))
+    store.publish('emotion_model', write_model(tmp_path, b'first'))
+    store.publish('emotion_model', write_model(tmp_path, b'second'))
+
+    manifest = store.manifest('emotion_model')
+    assert manifest['current'] == 'v2'
+    assert set(manifest['versions']) == {'v1', 'v2'}
+    with open(store.resolve('emotion_model'), 'rb') as f:
+        assert f.read() == b'second'
+    with open(store.resolve('emotion_model', 'v1'), 'rb') as f:
+        assert f.read() == b'first'
+
+def test_resolve_rejects_modified_file(tmp_path):
+    store = ModelArtifactStore(root=str(tmp_path / 'store'))
+    store.publish('emotion_model', write_model(tmp_path, b'weights'))
+    path = store.resolve('emotion_model')
+
+    with open(path, 'wb') as f:
+        f.write(b'tampered')
+    with pytest.raises(ValueError):
+        ModelArtifactStore(root=str(tmp_path / 'store')).resolve('emotion_model')
+
+def test_resolve_unknown_model(tmp_path):
+    store = ModelArtifactStore(root=str(tmp_path / 'store'), legacy_artifacts={})
+    with pytest.raises(FileNotFoundError):
+        store.resolve('emotion_model')
+
+def test_shipped_model_is_imported_on_first_resolve(tmp_path):
+    shipped = write_model(tmp_path, b'trained weights')
+    store = ModelArtifactStore(root=str(tmp_path / 'store'), legacy_artifacts={'emotion_model': shipped})
+
+    with open(store.resolve('emotion_model'), 'rb') as f:
+        assert f.read() == b'trained weights'
+    assert store.manifest('emotion_model')['current'] == 'v1'
+    # Only the first resolve imports; later publishes are not overridden
+    store.publish('emotion_model', write_model(tmp_path, b'retrained'))
+    assert store.import_legacy('emotion_model') is None
+    assert store.manifest('emotion_model')['current'] == 'v2'
+
+def test_concurrent_stores_import_the_shipped_model_once(tmp_path):
+    shipped = write_model(tmp_path, b'shipped weights')
+    root = str(tmp_path / 'store')
+    # Separate store instances stand in for separate worker processes
+    stores = [ModelArtifactStore(root=root, legacy_artifacts={'emotion_model': shipped}) for _ in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = list(executor.map(lambda store: store.resolve('emotion_model'), stores))
+
+    manifest = stores[0].manifest('emotion_model')
+    assert set(manifest['versions']) == {'v1'}
+    assert len(set(paths)) == 1
+    with open(paths[0], 'rb') as f:
+        assert f.read() == b'shipped weights'
+    assert not [name for name in os.listdir(tmp_path / 'store' / 'emotion_model') if name.endswith('.tmp')]
+
+def test_lazy_model_loads_once():
+    calls = []
+    model = LazyModel('test_model', lambda: calls.append(1) or 'model')
+
+    assert not model.loaded
+    assert model.get() == 'model'
+    assert model.get() == 'model'
+    assert calls == [1]
+    assert model.load_seconds is not None
@@ -0,0 +1,25 @@
+from src.services.audio_features import AudioFeatureProvider
+from src.services.track_store import TrackStore
+
+def make_provider(calls, unknown=()):
+    def fetch(ids):
+        calls.append(list(ids))
+        return [None if track_id in unknown else {'id': track_id, 'valence': 0.5} for track_id in ids]
+
+    return AudioFeatureProvider(fetch, store=TrackStore(':memory:'), max_workers=2)
+
+def test_misses_are_fetched_in_chunks_of_100():
+    calls = []
+    provider = make_provider(calls)
+    ids = [f"t{i}" for i in range(250)]
+    features = provider.get_many(ids)
+    assert len(features) == 250
+    assert sorted(len(chunk) for chunk in calls) == [50, 100, 100]
+
+def test_cached_features_are_not_refetched():
+    calls = []
+    provider = make_provider(calls, unknown={'gone'})
+    assert provider.get('a') == {'id': 'a', 'valence': 0.5}
+    features = provider.get_many(['a', 'b', 'gone', 'b'])
+    assert set(features) == {'a', 'b'}
+    assert calls == [['a'], ['b', 'gone']]
@@ -0,0 +1,59 @@
+import asyncio
+from collections import namedtuple
+
+from src.services.candidate_pool import CandidatePoolService
+
+Track = namedtuple('Track', 'id')
+
+def test_empty_pool_misses_and_refills_once():
+    calls = []
+
+    async def fill(key, round_index):
+        calls.append(round_index)
+        await asyncio.sleep(0)
+        return [Track(f"{round_index}-{i}") for i in range(10)]
+
+    async def scenario():
+        pools = CandidatePoolService(fill, target_size=30, low_watermark=15)
+        assert pools.sample(('happy', 'english'), 5) is None
+        assert pools.sample(('happy', 'english'), 5) is None
+        await pools.schedule_refill(('happy', 'english'))
+        return pools, pools.sample(('happy', 'english'), 5)
+
+    pools, sampled = asyncio.run(scenario())
+    assert calls == [0, 1, 2]
+    assert len(sampled) == 5 and len(set(sampled)) == 5
+    assert pools.size(('happy', 'english')) == 30
+
+def test_refill_deduplicates_and_stops_without_new_tracks():
+    calls = []
+
+    async def fill(key, round_index):
+        calls.append(round_index)
+        return [Track(str(i)) for i in range(8)]
+
+    async def scenario():
+        pools = CandidatePoolService(fill, target_size=100, low_watermark=10)
+        return await pools.schedule_refill('sad')
+
+    assert asyncio.run(scenario()) == 8
+    assert calls == [0, 1]
+
+def test_expired_tracks_trigger_refill():
+    now = [0.0]
+
+    async def fill(key, round_index):
+        return [Track(f"{now[0]}-{i}") for i in range(20)]
+
+    async def scenario():
+        pools = CandidatePoolService(fill, target_size=20, low_watermark=10, track_ttl_seconds=100,
+                                     clock=lambda: now[0])
+        await pools.schedule_refill('angry')
+        assert len(pools.sample('angry', 10)) == 10
+        now[0] = 150.0
+        assert pools.sample('angry', 10) is None
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return pools.sample('angry', 10)
+
+    assert all(track.id.startswith('150.0') for track in asyncio.run(scenario()))
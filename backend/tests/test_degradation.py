@@ -0,0 +1,41 @@
+import time
+
+from src.services.degradation import QUALITY_TIERS, DegradationController
+from src.services.metrics import metrics
+
+def make_controller(**overrides):
+    options = dict(max_queue_depth=4, max_p95_ms=100, step_seconds=0, recovery_seconds=0,
+                   queue_gauge='test_degradation.queue_depth')
+    options.update(overrides)
+    return DegradationController(**options)
+
+def test_steps_down_under_queue_pressure_and_recovers():
+    controller = make_controller()
+    metrics.set_gauge('test_degradation.queue_depth', 10)
+    assert controller.current().name == QUALITY_TIERS[1].name
+    assert controller.current().name == QUALITY_TIERS[2].name
+
+    metrics.set_gauge('test_degradation.queue_depth', 0)
+    assert controller.current().name == QUALITY_TIERS[1].name
+    assert controller.current().name == QUALITY_TIERS[0].name
+
+def test_latency_triggers_step_down_and_respects_max_tier():
+    controller = make_controller(max_tier=1)
+    metrics.set_gauge('test_degradation.queue_depth', 0)
+    for _ in range(20):
+        controller.record_latency(500)
+    controller.current()
+    assert controller.current().name == QUALITY_TIERS[1].name
+
+def test_step_interval_prevents_flapping():
+    controller = make_controller(step_seconds=60)
+    metrics.set_gauge('test_degradation.queue_depth', 10)
+    controller.current()
+    assert controller.current().name == QUALITY_TIERS[1].name
+
+def test_old_latencies_leave_the_window():
+    controller = make_controller(window_seconds=0.01)
+    metrics.set_gauge('test_degradation.queue_depth', 0)
+    controller.record_latency(500)
+    time.sleep(0.02)
+    assert controller.current().name == QUALITY_TIERS[0].name
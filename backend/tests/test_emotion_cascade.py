@@ -0,0 +1,79 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+pytest.importorskip('deepface')
+
+from src.services.emotion_detection import EmotionDetector, top_class_margin
+
+CONFIDENT = {'happy': 0.9, 'neutral': 0.05, 'sad': 0.05}
+UNSURE = {'happy': 0.45, 'neutral': 0.4, 'sad': 0.15}
+DEEPFACE = {'happy': 0.2, 'neutral': 0.7, 'sad': 0.1}
+
+class FakeRegistry:
+    """Fast tier answers from `fast_scores`; DeepFace calls are recorded."""
+
+    def __init__(self, fast_scores, fast_available=True):
+        self.fast_scores = fast_scores
+        self.fast_available = fast_available
+        self.deepface_batches = []
+
+    def load_fast_tier(self):
+        return self.fast_available
+
+    def predict_fast(self, crops):
+        if isinstance(self.fast_scores, Exception):
+            raise self.fast_scores
+        return self.fast_scores[:len(crops)]
+
+    def predict_emotions(self, crops):
+        self.deepface_batches.append([int(crop[0, 0, 0]) for crop in crops])
+        return [DEEPFACE] * len(crops)
+
+def crops(count):
+    # Each crop's first pixel records its index, so escalations can be identified
+    return [np.full((48, 48, 3), index, dtype=np.uint8) for index in range(count)]
+
+def test_top_class_margin():
+    assert top_class_margin(CONFIDENT) == pytest.approx(0.85)
+    assert top_class_margin(UNSURE) == pytest.approx(0.05)
+    assert top_class_margin({'happy': 0.6}) == pytest.approx(0.6)
+
+def test_only_uncertain_faces_escalate_in_one_batch(monkeypatch):
+    monkeypatch.setenv('EMOTION_CASCADE', 'true')
+    registry = FakeRegistry([CONFIDENT, UNSURE, CONFIDENT, UNSURE])
+    detector = EmotionDetector(registry=registry, cascade_margin=0.3)
+
+    classified = detector.classify_faces(crops(4))
+    assert [tier for _, tier in classified] == ['fast', 'deepface', 'fast', 'deepface']
+    assert classified[0][0] == CONFIDENT
+    assert classified[1][0] == DEEPFACE
+    assert registry.deepface_batches == [[1, 3]]
+
+def test_confident_faces_never_reach_deepface(monkeypatch):
+    monkeypatch.setenv('EMOTION_CASCADE', 'true')
+    registry = FakeRegistry([CONFIDENT, CONFIDENT])
+    classified = EmotionDetector(registry=registry, cascade_margin=0.3).classify_faces(crops(2))
+    assert [tier for _, tier in classified] == ['fast', 'fast']
+    assert registry.deepface_batches == []
+
+def test_margin_threshold_is_configurable(monkeypatch):
+    monkeypatch.setenv('EMOTION_CASCADE', 'true')
+    registry = FakeRegistry([UNSURE])
+    classified = EmotionDetector(registry=registry, cascade_margin=0.01).classify_faces(crops(1))
+    assert classified == [(UNSURE, 'fast')]
+
+def test_fast_tier_failure_escalates_every_face(monkeypatch):
+    monkeypatch.setenv('EMOTION_CASCADE', 'true')
+    registry = FakeRegistry(RuntimeError('onnx session crashed'))
+    classified = EmotionDetector(registry=registry, cascade_margin=0.3).classify_faces(crops(3))
+    assert classified == [(DEEPFACE, 'deepface')] * 3
+    assert registry.deepface_batches == [[0, 1, 2]]
+
+@pytest.mark.parametrize('enabled, fast_available', [('false', True), ('true', False)])
+def test_without_the_fast_tier_everything_goes_to_deepface(monkeypatch, enabled, fast_available):
+    monkeypatch.setenv('EMOTION_CASCADE', enabled)
+    registry = FakeRegistry([CONFIDENT, CONFIDENT], fast_available=fast_available)
+    classified = EmotionDetector(registry=registry, cascade_margin=0.3).classify_faces(crops(2))
+    assert classified == [(DEEPFACE, 'deepface')] * 2
+    assert registry.deepface_batches == [[0, 1]]
@@ -0,0 +1,115 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('deepface')
+
+import src.api.emotion as emotion_api
+from src.services.admission import AdmissionRejected
+
+DISCONNECT = {'type': 'websocket.disconnect'}
+
+class FakeWebSocket:
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    def send_frame(self, data):
+        self.incoming.put_nowait({'type': 'websocket.receive', 'bytes': data})
+
+class FakeSession:
+    """Records analysed frames; the first frame blocks until `release` is set."""
+
+    def __init__(self):
+        self.processed = []
+        self.dropped = 0
+        self.release = asyncio.Event()
+
+    def frame_received(self, replaced_pending):
+        self.dropped += replaced_pending
+
+    async def process(self, data, quality=None):
+        self.processed.append(data)
+        if data == b'bad':
+            raise ValueError('Invalid image format')
+        if len(self.processed) == 1:
+            await self.release.wait()
+        return {'type': 'emotion', 'emotion': 'happy', 'mood_changed': False}
+
+    def stats(self):
+        return {}
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def run_stream(monkeypatch, scenario):
+    session = FakeSession()
+    monkeypatch.setattr(emotion_api, 'EmotionStreamSession', lambda: session)
+
+    async def main():
+        websocket = FakeWebSocket()
+        endpoint = asyncio.ensure_future(emotion_api.emotion_stream_endpoint(websocket))
+        await scenario(websocket, session)
+        websocket.incoming.put_nowait(DISCONNECT)
+        await asyncio.wait_for(endpoint, 5)
+        return websocket.sent
+
+    return session, asyncio.run(main())
+
+def test_newest_frame_replaces_pending_ones(monkeypatch):
+    async def scenario(websocket, session):
+        websocket.send_frame(b'first')
+        await settle()
+        # Inference is busy with the first frame; these queue up behind it
+        for frame in (b'second', b'third', b'fourth'):
+            websocket.send_frame(frame)
+        await settle()
+        session.release.set()
+        await settle()
+
+    session, sent = run_stream(monkeypatch, scenario)
+    assert session.processed == [b'first', b'fourth']
+    assert session.dropped == 2
+    assert [message['type'] for message in sent] == ['emotion', 'emotion']
+
+def test_frames_rejected_at_capacity_get_a_busy_message(monkeypatch):
+    @asynccontextmanager
+    async def full(image, max_dimension):
+        raise AdmissionRejected('queue_full', 2)
+        yield
+
+    monkeypatch.setattr(emotion_api, 'admit_image', full)
+
+    async def scenario(websocket, session):
+        websocket.send_frame(b'first')
+        await settle()
+
+    session, sent = run_stream(monkeypatch, scenario)
+    assert session.processed == []
+    assert sent == [{'type': 'busy', 'detail': 'queue_full', 'retry_after': 2}]
+
+def test_oversized_and_undecodable_frames_get_error_messages(monkeypatch):
+    monkeypatch.setattr(emotion_api, 'MAX_IMAGE_UPLOAD_BYTES', 8)
+
+    async def scenario(websocket, session):
+        session.processed.append(b'already analysed')  # first-frame blocking off
+        websocket.send_frame(b'x' * 9)
+        websocket.send_frame(b'bad')
+        await settle()
+
+    session, sent = run_stream(monkeypatch, scenario)
+    assert [message['type'] for message in sent] == ['error', 'error']
+    assert '8 byte limit' in sent[0]['detail']
+    assert sent[1]['detail'].startswith('Failed to decode frame')
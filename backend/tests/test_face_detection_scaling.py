@@ -0,0 +1,71 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+pytest.importorskip('deepface')
+
+from src.services.emotion_detection import MIN_DETECTION_DIMENSION, EmotionDetector, detection_copy
+
+class FakeRegistry:
+    detector_backends = ['opencv']
+
+    def load(self):
+        pass
+
+def color_frame(height, width):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = 200
+    frame[..., 2] = 50
+    return frame
+
+def test_large_frames_are_downscaled_to_gray():
+    small, scale = detection_copy(color_frame(960, 1280), max_dimension=320)
+    assert scale == pytest.approx(0.25)
+    assert small.shape == (240, 320, 3)
+    # Expanded back from grayscale: every channel is identical
+    assert np.array_equal(small[..., 0], small[..., 2])
+
+def test_small_frames_are_left_alone():
+    frame = color_frame(240, 320)
+    small, scale = detection_copy(frame, max_dimension=320)
+    assert scale == 1.0
+    assert small is frame
+
+def test_shorter_side_stays_above_the_minimum():
+    small, scale = detection_copy(color_frame(400, 2000), max_dimension=320)
+    assert min(small.shape[:2]) == MIN_DETECTION_DIMENSION
+    assert scale == pytest.approx(MIN_DETECTION_DIMENSION / 400)
+
+def test_zero_max_dimension_disables_downscaling():
+    frame = color_frame(960, 1280)
+    assert detection_copy(frame, max_dimension=0) == (frame, 1.0)
+
+def detector_seeing(monkeypatch, answers):
+    """Detector whose face detector returns `answers` in order, recording the image sizes it saw."""
+    detector = EmotionDetector(registry=FakeRegistry())
+    seen = []
+
+    def locate(image_array, detector_backends):
+        seen.append(image_array.shape[:2])
+        return answers.pop(0)
+
+    monkeypatch.setattr(detector, '_locate_faces', locate)
+    return detector, seen
+
+def test_boxes_are_mapped_back_to_the_working_frame(monkeypatch):
+    detector, seen = detector_seeing(monkeypatch, [[{'x': 40, 'y': 30, 'w': 25, 'h': 26, 'confidence': 0.9}]])
+
+    faces = detector.detect_faces(color_frame(960, 1280))
+    assert seen == [(240, 320)]
+    assert faces == [{'x': 160, 'y': 120, 'w': 100, 'h': 104, 'confidence': 0.9}]
+
+def test_unconfident_downscaled_detection_retries_at_full_resolution(monkeypatch):
+    full_resolution_face = {'x': 500, 'y': 400, 'w': 30, 'h': 30, 'confidence': 0.8}
+    detector, seen = detector_seeing(monkeypatch, [
+        [{'x': 0, 'y': 0, 'w': 320, 'h': 240, 'confidence': 0.0}],
+        [full_resolution_face],
+    ])
+
+    faces = detector.detect_faces(color_frame(960, 1280))
+    assert seen == [(240, 320), (960, 1280)]
+    assert faces == [full_resolution_face]
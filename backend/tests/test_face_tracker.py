@@ -0,0 +1,59 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from src.services.face_tracker import FaceTracker, expand_region
+
+def textured_frame(face_x, face_y, size=40, shape=(240, 320)):
+    """Flat grey frame with a random-textured square standing in for a face."""
+    rng = np.random.default_rng(7)
+    frame = np.full(shape + (3,), 100, dtype=np.uint8)
+    patch = rng.integers(0, 255, (size, size, 3), dtype=np.uint8)
+    frame[face_y:face_y + size, face_x:face_x + size] = patch
+    return frame
+
+FACE = {'x': 100, 'y': 80, 'w': 40, 'h': 40}
+
+def test_expand_region_is_clamped_to_the_image():
+    assert expand_region({'x': 5, 'y': 5, 'w': 20, 'h': 20}, 0.5, 30, 30) == {'x': 0, 'y': 0, 'w': 30, 'h': 30}
+
+def test_follows_a_moving_face_between_keyframes():
+    tracker = FaceTracker(keyframe_interval=10, margin=0.3, min_score=0.6)
+    assert tracker.needs_detection()
+    tracker.start(textured_frame(100, 80), FACE)
+    assert not tracker.needs_detection()
+
+    region = tracker.track(textured_frame(106, 84))
+    assert region == {'x': 106, 'y': 84, 'w': 40, 'h': 40}
+    assert tracker.crop_region(textured_frame(106, 84)) == {'x': 94, 'y': 72, 'w': 64, 'h': 64}
+
+def test_keyframe_is_forced_after_the_interval():
+    tracker = FaceTracker(keyframe_interval=3, margin=0.3, min_score=0.6)
+    frame = textured_frame(100, 80)
+    tracker.start(frame, FACE)
+    for _ in range(2):
+        assert tracker.track(frame) is not None
+        assert not tracker.needs_detection()
+    assert tracker.track(frame) is not None
+    assert tracker.needs_detection()
+
+    tracker.start(frame, FACE)
+    assert not tracker.needs_detection()
+
+def test_tracking_is_lost_when_the_face_disappears():
+    tracker = FaceTracker(keyframe_interval=10, margin=0.3, min_score=0.6)
+    tracker.start(textured_frame(100, 80), FACE)
+
+    empty = np.full((240, 320, 3), 100, dtype=np.uint8)
+    assert tracker.track(empty) is None
+    assert tracker.region is None
+    assert tracker.needs_detection()
+    assert tracker.crop_region(empty) is None
+
+def test_lose_forces_detection_on_the_next_frame():
+    tracker = FaceTracker(keyframe_interval=10)
+    tracker.start(textured_frame(100, 80), FACE)
+    tracker.lose()
+    assert tracker.needs_detection()
+    assert tracker.track(textured_frame(100, 80)) is None
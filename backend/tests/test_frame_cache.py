@@ -0,0 +1,62 @@
+import time
+
+from src.services.frame_cache import FrameResultCache, hamming_distance
+
+RESULT = {'emotion': 'happy', 'confidence': 0.9, 'emotion_scores': {'happy': 0.9}}
+
+def test_exact_and_near_hits():
+    cache = FrameResultCache(max_entries=8, ttl_seconds=60, max_distance=2)
+    cache.put(0b1010_1010, RESULT, inference_ms=120, scope='session-1')
+
+    assert cache.get(0b1010_1010, scope='session-1') == RESULT
+    # Two flipped bits is still the same frame
+    assert cache.get(0b1010_1001, scope='session-1') == RESULT
+    # Three flipped bits is a different frame
+    assert cache.get(0b1010_0101, scope='session-1') is None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+def test_entries_expire():
+    cache = FrameResultCache(max_entries=8, ttl_seconds=0.01, max_distance=0)
+    cache.put(42, RESULT)
+    time.sleep(0.02)
+    assert cache.get(42) is None
+
+def test_capacity_evicts_least_recently_used():
+    cache = FrameResultCache(max_entries=2, ttl_seconds=60, max_distance=0)
+    cache.put(1, 'a')
+    cache.put(2, 'b')
+    cache.get(1)
+    cache.put(4, 'c')
+    assert cache.get(2) is None
+    assert cache.get(1) == 'a'
+    assert cache.get(4) == 'c'
+
+def test_variants_do_not_share_entries():
+    cache = FrameResultCache(max_entries=8, ttl_seconds=60, max_distance=2)
+    degraded = (640, ('opencv',))
+    cache.put(0b1010_1010, RESULT, variant=degraded)
+
+    assert cache.get(0b1010_1010) is None
+    assert cache.get(0b1010_1010, degraded) == RESULT
+
+def test_near_matches_stay_within_a_scope():
+    cache = FrameResultCache(max_entries=8, ttl_seconds=60, max_distance=2)
+    cache.put(0b1010_1010, RESULT, scope='session-1')
+    cache.put(0b1111_0000, RESULT)
+
+    # Another client's similar-looking frame is not served this one's result
+    assert cache.get(0b1010_1001, scope='session-2') is None
+    assert cache.get(0b1010_1001) is None
+    # Unscoped lookups only match the exact hash
+    assert cache.get(0b1111_0000) == RESULT
+    assert cache.get(0b1111_0001) is None
+
+def test_disabled_cache_is_a_no_op():
+    cache = FrameResultCache(max_entries=0)
+    cache.put(1, RESULT)
+    assert cache.get(1) is None
+
+def test_hamming_distance():
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(0b1111, 0b0000) == 4
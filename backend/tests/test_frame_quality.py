@@ -0,0 +1,36 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+pytest.importorskip('deepface')
+
+from src.services.emotion_detection import assess_frame_quality
+
+SHAPE = (240, 320, 3)
+
+def checkerboard(low=50, high=200, block=16):
+    rows, cols = np.indices(SHAPE[:2]) // block
+    gray = np.where((rows + cols) % 2 == 0, low, high).astype(np.uint8)
+    return np.stack([gray, gray, gray], axis=-1)
+
+def test_textured_frame_is_usable():
+    quality = assess_frame_quality(checkerboard())
+    assert quality['usable']
+    assert quality['reason'] is None
+
+@pytest.mark.parametrize('level, reason', [(10, 'too_dark'), (250, 'too_bright'), (128, 'low_contrast')])
+def test_uniform_frames_are_rejected(level, reason):
+    quality = assess_frame_quality(np.full(SHAPE, level, dtype=np.uint8))
+    assert not quality['usable']
+    assert quality['reason'] == reason
+
+def test_smooth_gradient_is_blurry():
+    # Bright and contrasty enough, but no edges at all
+    gradient = np.tile(np.linspace(60, 200, SHAPE[1]).astype(np.uint8), (SHAPE[0], 1))
+    quality = assess_frame_quality(np.stack([gradient] * 3, axis=-1))
+    assert quality['contrast'] > 12
+    assert quality['reason'] == 'blurry'
+
+def test_grayscale_frames_are_accepted():
+    quality = assess_frame_quality(checkerboard()[..., 0])
+    assert quality['usable']
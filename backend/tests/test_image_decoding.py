@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+np = pytest.importorskip('numpy')
+Image = pytest.importorskip('PIL.Image')
+pytest.importorskip('cv2')
+pytest.importorskip('deepface')
+
+from src.services.emotion_detection import MAX_DIMENSION, MIN_DETECTION_DIMENSION, decode_image_bytes
+
+def encode(size, format='JPEG'):
+    width, height = size
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)
+    pixels = np.stack([np.tile(gradient, (height, 1))] * 3, axis=-1)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=format)
+    return buffer.getvalue()
+
+def shape_of(data, max_dimension=MAX_DIMENSION):
+    height, width, channels = decode_image_bytes(data, max_dimension).shape
+    assert channels == 3
+    return width, height
+
+def test_large_jpeg_is_decoded_at_the_working_size():
+    # draft() alone stops at a power-of-two scale; the resize finishes the job
+    assert shape_of(encode((4000, 3000))) == (MAX_DIMENSION, 768)
+
+def test_large_png_is_resized_to_the_working_size():
+    assert shape_of(encode((2048, 1024), 'PNG')) == (MAX_DIMENSION, 512)
+
+def test_tier_max_dimension_is_respected():
+    assert shape_of(encode((1600, 1200)), max_dimension=640) == (640, 480)
+
+def test_small_frame_is_upscaled_for_detection():
+    assert shape_of(encode((160, 120))) == (320, MIN_DETECTION_DIMENSION)
+
+def test_upscaling_never_exceeds_max_dimension():
+    width, height = shape_of(encode((2000, 50)))
+    assert width <= MAX_DIMENSION
+    assert height < MIN_DETECTION_DIMENSION
+
+def test_frame_within_bounds_is_left_alone():
+    assert shape_of(encode((640, 480))) == (640, 480)
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('multipart')
+pytest.importorskip('deepface')
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.api.emotion import read_image_upload
+
+BOUNDARY = 'testboundary'
+
+def make_request(chunks, content_type='application/octet-stream', content_length=None):
+    pending = list(chunks) or [b'']
+    headers = [(b'content-type', content_type.encode())]
+    if content_length is not None:
+        headers.append((b'content-length', str(content_length).encode()))
+
+    async def receive():
+        if pending:
+            return {'type': 'http.request', 'body': pending.pop(0), 'more_body': bool(pending)}
+        return {'type': 'http.disconnect'}
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/emotion/detect/upload',
+             'headers': headers, 'query_string': b''}
+    return Request(scope, receive)
+
+def multipart(payload, field='image'):
+    return (
+        f"--{BOUNDARY}\r\n"
+        f"Content-Disposition: form-data; name=\"{field}\"; filename=\"face.jpg\"\r\n"
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + payload + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def read(request, max_bytes):
+    return asyncio.run(read_image_upload(request, max_bytes))
+
+def status_of(request, max_bytes):
+    with pytest.raises(HTTPException) as error:
+        read(request, max_bytes)
+    return error.value.status_code
+
+def test_raw_body_within_limit_is_returned():
+    assert read(make_request([b'abc', b'def']), 10) == b'abcdef'
+
+def test_declared_oversized_body_is_rejected_before_reading():
+    assert status_of(make_request([b'x' * 5], content_length=11), 10) == 413
+
+def test_chunked_raw_body_is_cut_off_at_the_limit():
+    assert status_of(make_request([b'x' * 6, b'x' * 6]), 10) == 413
+
+def test_empty_body_is_rejected():
+    assert status_of(make_request([]), 10) == 400
+
+def test_multipart_image_within_limit_is_returned():
+    request = make_request([multipart(b'jpegbytes')], f"multipart/form-data; boundary={BOUNDARY}")
+    assert read(request, 100) == b'jpegbytes'
+
+def test_multipart_image_over_limit_is_rejected():
+    body = multipart(b'x' * 200)
+    # Streamed in small pieces without Content-Length, like a chunked upload
+    pieces = [body[start:start + 64] for start in range(0, len(body), 64)]
+    request = make_request(pieces, f"multipart/form-data; boundary={BOUNDARY}")
+    assert status_of(request, 100) == 413
+
+def test_multipart_without_image_field_is_rejected():
+    request = make_request([multipart(b'jpegbytes', field='other')], f"multipart/form-data; boundary={BOUNDARY}")
+    assert status_of(request, 100) == 400
@@ -0,0 +1,64 @@
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.ml_models import inference_backends
+from src.ml_models.inference_backends import KerasBackend, get_configured_backend, load_backend
+
+class FakeKerasModel:
+    def predict(self, batch, verbose=0):
+        return np.full((len(batch), 7), 1 / 7)
+
+class FakeOnnxBackend:
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.name = 'onnx-int8' if model_path.endswith('.int8.onnx') else 'onnx'
+
+def test_unknown_backend_name_falls_back_to_keras(monkeypatch):
+    monkeypatch.setenv('EMOTION_INFERENCE_BACKEND', ' TensorRT ')
+    assert get_configured_backend() == 'keras'
+    monkeypatch.setenv('EMOTION_INFERENCE_BACKEND', 'ONNX-int8')
+    assert get_configured_backend() == 'onnx-int8'
+
+def test_keras_backend_never_touches_onnx(monkeypatch, tmp_path):
+    monkeypatch.setenv('EMOTION_ONNX_DIR', str(tmp_path))
+    (tmp_path / 'emotion_model.onnx').write_bytes(b'')
+    monkeypatch.setattr(inference_backends, 'OnnxBackend', None)
+
+    backend = load_backend('emotion_model', FakeKerasModel, backend='keras')
+    assert isinstance(backend, KerasBackend)
+    assert backend.predict(np.zeros((2, 48, 48, 1))).shape == (2, 7)
+
+def test_missing_onnx_file_falls_back_to_keras(monkeypatch, tmp_path):
+    monkeypatch.setenv('EMOTION_ONNX_DIR', str(tmp_path))
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return FakeKerasModel()
+
+    backend = load_backend('emotion_model', loader, backend='onnx')
+    assert isinstance(backend, KerasBackend)
+    assert loads == [1]
+
+def test_missing_onnxruntime_falls_back_to_keras(monkeypatch, tmp_path):
+    monkeypatch.setenv('EMOTION_ONNX_DIR', str(tmp_path))
+    (tmp_path / 'emotion_model.onnx').write_bytes(b'')
+    monkeypatch.setitem(sys.modules, 'onnxruntime', None)  # import raises ImportError
+
+    backend = load_backend('emotion_model', FakeKerasModel, backend='onnx')
+    assert isinstance(backend, KerasBackend)
+
+def test_exported_model_is_used_when_available(monkeypatch, tmp_path):
+    monkeypatch.setenv('EMOTION_ONNX_DIR', str(tmp_path))
+    (tmp_path / 'deepface_emotion.int8.onnx').write_bytes(b'')
+    monkeypatch.setattr(inference_backends, 'OnnxBackend', FakeOnnxBackend)
+
+    def loader():
+        raise AssertionError('Keras model should not be loaded')
+
+    backend = load_backend('deepface_emotion', loader, backend='onnx-int8')
+    assert backend.name == 'onnx-int8'
+    assert backend.model_path == str(tmp_path / 'deepface_emotion.int8.onnx')
@@ -0,0 +1,87 @@
+import asyncio
+import sys
+import threading
+import types
+from multiprocessing import shared_memory
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.services.inference_pool import (
+    _detect_shared_batch, await_shared_frame, frame_to_shared, release_shared
+)
+
+def block_exists(frame):
+    try:
+        block = shared_memory.SharedMemory(name=frame.name)
+    except FileNotFoundError:
+        return False
+    block.close()
+    return True
+
+def test_shared_frame_round_trip():
+    image = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    frame = frame_to_shared(image, frame_hash=42)
+    try:
+        assert frame.shape == (2, 3, 3)
+        assert frame.frame_hash == 42
+        block = shared_memory.SharedMemory(name=frame.name)
+        view = np.ndarray(frame.shape, dtype=np.dtype(frame.dtype), buffer=block.buf)
+        assert (view == image).all()
+        del view
+        block.close()
+    finally:
+        release_shared(frame)
+    assert not block_exists(frame)
+    # Releasing twice is harmless
+    release_shared(frame)
+
+def test_cancelled_caller_still_releases_the_frame():
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    gate = threading.Event()
+    created = []
+
+    def slow_create():
+        gate.wait()
+        frame = frame_to_shared(image)
+        created.append(frame)
+        return frame
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, slow_create)
+        caller = asyncio.ensure_future(await_shared_frame(future))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        gate.set()
+        await asyncio.wait_for(asyncio.shield(future), 5)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert len(created) == 1
+    assert not block_exists(created[0])
+
+def test_batch_with_a_released_frame_fails_only_that_item(monkeypatch):
+    class Detector:
+        def detect_emotion_batch(self, images, regions, backends):
+            return [{'emotion': 'happy', 'pixel': int(image[0, 0, 0])} for image in images]
+
+    # The worker resolves the detector lazily; stand in for the DeepFace-backed one
+    fake = types.ModuleType('src.services.emotion_detection')
+    fake.get_emotion_detector = Detector
+    monkeypatch.setitem(sys.modules, 'src.services.emotion_detection', fake)
+
+    frames = [frame_to_shared(np.full((2, 2, 3), value, dtype=np.uint8)) for value in (1, 2, 3)]
+    release_shared(frames[1])
+    try:
+        results = _detect_shared_batch([(frame, None, None) for frame in frames])
+    finally:
+        for frame in frames:
+            release_shared(frame)
+
+    assert results[0] == {'emotion': 'happy', 'pixel': 1}
+    assert isinstance(results[1], FileNotFoundError)
+    assert results[2] == {'emotion': 'happy', 'pixel': 3}
@@ -0,0 +1,70 @@
+import asyncio
+
+from src.services.inference_scheduler import InferenceScheduler
+from src.services.metrics import metrics
+
+def test_concurrent_submissions_are_batched():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def run():
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=4, max_wait_ms=50, name='test_batch')
+        results = await asyncio.gather(*(scheduler.submit(i) for i in range(4)))
+        await scheduler.stop()
+        return results
+
+    metrics.reset()
+    assert asyncio.run(run()) == [0, 2, 4, 6]
+    assert calls == [[0, 1, 2, 3]]
+    assert metrics.counter('test_batch.batches') == 1
+    assert metrics.snapshot()['histograms']['test_batch.size']['max'] == 4
+
+def test_batches_respect_max_size():
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return items
+
+    async def run():
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=3, max_wait_ms=20, name='test_batch')
+        results = await asyncio.gather(*(scheduler.submit(i) for i in range(7)))
+        await scheduler.stop()
+        return results
+
+    assert asyncio.run(run()) == list(range(7))
+    assert max(sizes) <= 3
+    assert sum(sizes) == 7
+
+def test_batch_errors_propagate_to_callers():
+    def batch_fn(items):
+        raise ValueError("model exploded")
+
+    async def run():
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=2, max_wait_ms=5, name='test_batch')
+        try:
+            return await asyncio.gather(scheduler.submit(1), scheduler.submit(2), return_exceptions=True)
+        finally:
+            await scheduler.stop()
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+def test_per_item_errors_fail_only_their_caller():
+    def batch_fn(items):
+        return [FileNotFoundError(item) if item == 'gone' else item.upper() for item in items]
+
+    async def run():
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=3, max_wait_ms=50, name='test_batch')
+        try:
+            return await asyncio.gather(*(scheduler.submit(item) for item in ('a', 'gone', 'b')),
+                                        return_exceptions=True)
+        finally:
+            await scheduler.stop()
+
+    first, missing, last = asyncio.run(run())
+    assert (first, last) == ('A', 'B')
+    assert isinstance(missing, FileNotFoundError)
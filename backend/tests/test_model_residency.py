@@ -0,0 +1,94 @@
+import pytest
+
+from src.services.model_residency import ModelResidencyManager
+
+MB = 1024 * 1024
+
+class FakeProcess:
+    def __init__(self):
+        self.rss = 100 * MB
+        self.now = 0.0
+
+def make_manager(process, **kwargs):
+    return ModelResidencyManager(rss_reader=lambda: process.rss, clock=lambda: process.now, **kwargs)
+
+def load(manager, process, name, size_mb):
+    with manager.use(name):
+        process.rss += size_mb * MB
+
+def test_use_measures_first_load_only():
+    process = FakeProcess()
+    manager = make_manager(process, budget_mb=0, idle_seconds=0)
+    load(manager, process, 'detector.retinaface', 150)
+    load(manager, process, 'detector.retinaface', 5)
+
+    model = manager.status()['models']['detector.retinaface']
+    assert model['resident_mb'] == 150
+    assert model['uses'] == 2
+    assert model['loads'] == 1
+
+def test_budget_evicts_least_recently_used():
+    process = FakeProcess()
+    unloaded = []
+    manager = make_manager(process, budget_mb=250, idle_seconds=0)
+    manager.register('detector.opencv', pinned=True)
+    for name in ('detector.retinaface', 'detector.mtcnn'):
+        manager.register(name, unload=lambda name=name: unloaded.append(name))
+
+    load(manager, process, 'detector.opencv', 100)
+    process.now = 1
+    load(manager, process, 'detector.retinaface', 100)
+    process.now = 2
+    load(manager, process, 'detector.mtcnn', 100)
+
+    assert unloaded == ['detector.retinaface']
+    models = manager.status()['models']
+    assert models['detector.opencv']['resident']
+    assert models['detector.mtcnn']['resident']
+    assert not models['detector.retinaface']['resident']
+
+def test_idle_backends_are_evicted():
+    process = FakeProcess()
+    unloaded = []
+    manager = make_manager(process, budget_mb=0, idle_seconds=60)
+    manager.register('detector.retinaface', unload=lambda: unloaded.append('detector.retinaface'))
+    load(manager, process, 'detector.retinaface', 100)
+
+    process.now = 30
+    assert manager.enforce() == []
+    process.now = 61
+    assert manager.enforce() == ['detector.retinaface']
+    assert unloaded == ['detector.retinaface']
+
+def test_backend_in_use_is_not_evicted():
+    process = FakeProcess()
+    manager = make_manager(process, budget_mb=0, idle_seconds=0)
+    manager.register('detector.retinaface', unload=lambda: None)
+    load(manager, process, 'detector.retinaface', 100)
+
+    with manager.use('detector.retinaface'):
+        assert not manager.evict('detector.retinaface')
+    assert manager.evict('detector.retinaface')
+
+def test_failed_load_is_not_resident():
+    process = FakeProcess()
+    manager = make_manager(process, budget_mb=0, idle_seconds=0)
+    with pytest.raises(RuntimeError):
+        with manager.use('emotion.fast'):
+            raise RuntimeError('missing artifact')
+    assert not manager.status()['models']['emotion.fast']['resident']
+
+def test_reload_after_eviction_is_measured_again():
+    process = FakeProcess()
+    manager = make_manager(process, budget_mb=0, idle_seconds=0)
+    manager.register('detector.retinaface', unload=lambda: setattr(process, 'rss', process.rss - 90 * MB))
+    load(manager, process, 'detector.retinaface', 150)
+    assert manager.evict('detector.retinaface')
+
+    # Part of the footprint stayed with the allocator, so the reload grows less
+    load(manager, process, 'detector.retinaface', 90)
+    model = manager.status()['models']['detector.retinaface']
+    assert model['resident']
+    assert model['resident_mb'] == 90
+    assert model['loads'] == 2
+    assert model['evictions'] == 1
@@ -1,7 +1,7 @@
 import pytest
 import sys
 import asyncio
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 # Mock spotipy before importing the service
 mock_spotipy = MagicMock()
@@ -19,7 +19,7 @@ def test_generate_mock_playlists():
 
 def test_fetch_mood_playlists_no_client():
     # Test fallback to mock when client is not available
-    with patch('src.services.spotify_service.get_spotify_client', return_value=None):
+    with patch('src.services.spotify_service.get_async_spotify_client', return_value=None):
         playlists = asyncio.run(fetch_mood_playlists('sad', limit=2))
         assert len(playlists) == 2
         assert all('sad' in p.name.lower() or (p.description and 'sad' in p.description.lower()) for p in playlists)
@@ -28,6 +28,7 @@ def test_fetch_mood_playlists_no_client():
 def test_fetch_mood_playlists_with_client():
     # Mock Spotify client
     mock_client = MagicMock()
+    mock_client.search = AsyncMock()
     mock_client.search.return_value = {
         'playlists': {
             'items': [
@@ -43,10 +44,10 @@ def test_fetch_mood_playlists_with_client():
         }
     }
 
-    with patch('src.services.spotify_service.get_spotify_client', return_value=mock_client):
+    with patch('src.services.spotify_service.get_async_spotify_client', return_value=mock_client):
         playlists = asyncio.run(fetch_mood_playlists('happy', limit=1))
         assert len(playlists) == 1
         assert playlists[0].name == 'Real Playlist 1'
         assert playlists[0].id == 'pl1'
         assert playlists[0].image_url == 'http://image1.jpg'
-        mock_client.search.assert_called_once()
+        mock_client.search.assert_awaited_once()
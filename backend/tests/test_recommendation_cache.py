@@ -0,0 +1,84 @@
+import asyncio
+
+from src.services.recommendation_cache import StaleWhileRevalidateCache, bucket_target
+from src.services.spotify_scheduler import BACKGROUND, INTERACTIVE, spotify_priority
+
+def make_cache(now, **kwargs):
+    return StaleWhileRevalidateCache(ttl_seconds=10, stale_seconds=100, jitter=0, max_entries=16,
+                                     clock=lambda: now[0], **kwargs)
+
+def test_bucket_target_midpoints():
+    assert bucket_target((0.0, 0.9), 0, 3) == 0.15
+    assert round(bucket_target((0.0, 0.9), 2, 3), 6) == 0.75
+
+def test_concurrent_misses_share_one_fetch():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ['track']
+
+    async def scenario():
+        cache = make_cache([0.0])
+        return await asyncio.gather(*(cache.get('happy', fetch) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == [['track']] * 10
+    assert calls == [1]
+
+def test_stale_entry_is_served_while_refreshing():
+    now = [0.0]
+    versions = iter(['v1', 'v2'])
+
+    async def fetch():
+        return next(versions)
+
+    async def scenario():
+        cache = make_cache(now)
+        assert await cache.get('sad', fetch) == 'v1'
+        now[0] = 50.0
+        # Stale: the old value comes back at once and a refresh is started
+        assert await cache.get('sad', fetch) == 'v1'
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return await cache.get('sad', fetch)
+
+    assert asyncio.run(scenario()) == 'v2'
+
+def test_refresh_runs_at_background_priority():
+    now = [0.0]
+    priorities = []
+
+    async def fetch():
+        priorities.append(spotify_priority.get())
+        return 'tracks'
+
+    async def scenario():
+        cache = make_cache(now)
+        await cache.get('happy', fetch)
+        now[0] = 50.0
+        await cache.get('happy', fetch)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    # The miss was fetched for the caller, the stale refresh in the background
+    assert priorities == [INTERACTIVE, BACKGROUND]
+
+def test_expired_and_empty_results_are_refetched():
+    now = [0.0]
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return [] if len(calls) == 1 else ['track']
+
+    async def scenario():
+        cache = make_cache(now)
+        assert await cache.get('angry', fetch) == []
+        assert await cache.get('angry', fetch) == ['track']
+        now[0] = 200.0
+        return await cache.get('angry', fetch)
+
+    assert asyncio.run(scenario()) == ['track']
+    assert len(calls) == 3
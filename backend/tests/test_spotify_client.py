@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.services.spotify_client import SingleFlightToken, SpotifyClientManager
+
+def test_token_is_cached_until_expiry():
+    now = [1000.0]
+    fetched = []
+
+    def fetch():
+        fetched.append(now[0])
+        return f"token-{len(fetched)}", now[0] + 3600
+
+    token = SingleFlightToken(fetch, refresh_margin_seconds=60, clock=lambda: now[0])
+    assert token.get() == 'token-1'
+    now[0] += 3000
+    assert token.get() == 'token-1'
+    now[0] += 600
+    assert token.get() == 'token-2'
+    assert len(fetched) == 2
+
+def test_concurrent_expiry_fetches_once():
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'token', time.time() + 3600
+
+    token = SingleFlightToken(slow_fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(token.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['token'] * 8
+    assert calls == [1]
+
+def test_manager_without_credentials_has_no_client(monkeypatch):
+    monkeypatch.delenv('SPOTIFY_CLIENT_ID', raising=False)
+    monkeypatch.delenv('SPOTIFY_CLIENT_SECRET', raising=False)
+    manager = SpotifyClientManager()
+    assert not manager.configured
+    assert manager.get_client() is None
+
+def test_unhealthy_manager_returns_no_client():
+    manager = SpotifyClientManager(client_id='id', client_secret='secret')
+    manager.healthy = False
+    assert manager.get_client() is None
+
+def test_async_concurrent_expiry_fetches_once():
+    calls = []
+
+    async def afetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'token', time.time() + 3600
+
+    async def scenario():
+        token = SingleFlightToken(lambda: ('sync', time.time() + 3600), afetch)
+        return await asyncio.gather(*(token.aget() for _ in range(8)))
+
+    assert asyncio.run(scenario()) == ['token'] * 8
+    assert calls == [1]
+
+def test_async_caller_joins_refresh_running_in_a_thread():
+    calls = []
+    started = threading.Event()
+
+    def slow_fetch():
+        calls.append('sync')
+        started.set()
+        time.sleep(0.05)
+        return 'token', time.time() + 3600
+
+    async def afetch():
+        calls.append('async')
+        return 'other', time.time() + 3600
+
+    async def scenario():
+        token = SingleFlightToken(slow_fetch, afetch)
+        sync_call = asyncio.ensure_future(asyncio.to_thread(token.get))
+        await asyncio.to_thread(started.wait)
+        return await asyncio.gather(token.aget(), token.aget(), sync_call)
+
+    assert asyncio.run(scenario()) == ['token'] * 3
+    assert calls == ['sync']
+
+def test_sync_refresh_on_the_event_loop_raises_instead_of_deadlocking():
+    async def afetch():
+        await asyncio.sleep(0.01)
+        return 'token', time.time() + 3600
+
+    async def scenario():
+        token = SingleFlightToken(lambda: ('sync', time.time() + 3600), afetch)
+        refresh = asyncio.ensure_future(token.aget())
+        await asyncio.sleep(0)
+        # The refresh is owned by a coroutine on this loop; waiting for it here would never return
+        with pytest.raises(RuntimeError):
+            token.get()
+        assert await refresh == 'token'
+        # Once the token is valid the sync path is a plain cache read
+        return token.get()
+
+    assert asyncio.run(scenario()) == 'token'
@@ -0,0 +1,54 @@
+import sys
+import asyncio
+from unittest.mock import MagicMock
+
+# Mock spotipy before importing the service
+mock_spotipy = MagicMock()
+sys.modules['spotipy'] = mock_spotipy
+sys.modules['spotipy.oauth2'] = MagicMock()
+
+from src.services.spotify_service import CoalescingSpotifyClient
+
+EMPTY = {'playlists': {'items': []}}
+
+def make_client(calls):
+    async def search(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        return EMPTY
+
+    client = MagicMock()
+    client.search = search
+    return client
+
+def test_identical_concurrent_calls_are_coalesced():
+    calls = []
+
+    async def scenario():
+        spotify = CoalescingSpotifyClient(make_client(calls))
+        same = [spotify.search(q='happy mood', type='playlist', limit=5, market='US') for _ in range(5)]
+        other = spotify.search(q='sad mood', type='playlist', limit=5, market='US')
+        results = await asyncio.gather(*same, other)
+        return spotify, results
+
+    spotify, results = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert all(result == EMPTY for result in results)
+    assert spotify.coalesced == 4
+
+def test_calls_with_different_arguments_are_not_coalesced():
+    calls = []
+
+    async def scenario():
+        spotify = CoalescingSpotifyClient(make_client(calls))
+        await asyncio.gather(
+            spotify.search(q='happy mood', type='playlist', limit=5, market='US'),
+            spotify.search(q='happy mood', type='playlist', limit=10, market='US'),
+            spotify.search(q='happy mood', type='playlist', limit=5, market='GB'),
+            spotify.search(q='happy mood', type='track', limit=5, market='US'),
+        )
+        return spotify
+
+    spotify = asyncio.run(scenario())
+    assert len(calls) == 4
+    assert spotify.coalesced == 0
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from src.services.spotify_scheduler import BACKGROUND, INTERACTIVE, RateLimited, SpotifyScheduler, background_priority
+
+def test_burst_then_paced():
+    async def scenario():
+        scheduler = SpotifyScheduler(rate=50, burst=2)
+        started = time.perf_counter()
+        for _ in range(4):
+            await scheduler.acquire()
+        return time.perf_counter() - started
+
+    # Two slots from the burst, two more at 50/s
+    assert 0.03 <= asyncio.run(scenario()) < 0.5
+
+def test_interactive_calls_overtake_background_ones():
+    order = []
+
+    async def call(scheduler, name, priority):
+        await scheduler.acquire(priority)
+        order.append(name)
+
+    async def scenario():
+        scheduler = SpotifyScheduler(rate=100, burst=1)
+        await scheduler.acquire()
+        background = [asyncio.create_task(call(scheduler, f"refill-{i}", BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call(scheduler, 'detect', INTERACTIVE))
+        await asyncio.gather(interactive, *background)
+
+    asyncio.run(scenario())
+    assert order[0] == 'detect'
+    assert order[1:] == ['refill-0', 'refill-1', 'refill-2']
+
+def test_retry_after_pauses_all_calls():
+    async def scenario():
+        scheduler = SpotifyScheduler(rate=0)
+        scheduler.throttle(0.05)
+        started = time.perf_counter()
+        with background_priority():
+            await asyncio.gather(scheduler.acquire(), scheduler.acquire())
+        return time.perf_counter() - started
+
+    assert asyncio.run(scenario()) >= 0.04
+
+def test_long_retry_after_fails_fast():
+    async def scenario():
+        scheduler = SpotifyScheduler(rate=0, max_block_seconds=1)
+        scheduler.throttle(30)
+        await scheduler.acquire()
+
+    with pytest.raises(RateLimited):
+        asyncio.run(scenario())
+
+def test_blocking_acquire_refuses_to_run_on_the_event_loop():
+    scheduler = SpotifyScheduler(rate=0)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            scheduler.acquire_blocking()
+        # A worker thread is fine
+        await asyncio.to_thread(scheduler.acquire_blocking)
+
+    asyncio.run(scenario())
+    scheduler.acquire_blocking()
@@ -1,13 +1,16 @@
 import pytest
 import sys
-from unittest.mock import MagicMock
+import asyncio
+from collections import namedtuple
+from unittest.mock import MagicMock, patch
 
 # Mock spotipy before importing the service
 mock_spotipy = MagicMock()
 sys.modules['spotipy'] = mock_spotipy
 sys.modules['spotipy.oauth2'] = MagicMock()
 
-from src.services.spotify_service import get_supported_languages, validate_language
+from src.services.spotify_service import MAX_TRACK_IDS, fetch_tracks_by_ids, get_supported_languages, validate_language
+from src.services.track_store import TrackStore
 
 def test_get_supported_languages():
     languages = get_supported_languages()
@@ -44,3 +47,22 @@ def test_validate_language_unsupported():
     assert validate_language('german') is None
     assert validate_language('de') is None
     assert validate_language('') is None
+
+def test_tracks_fall_back_to_stale_store_entries_without_spotify():
+    Track = namedtuple('Track', 'id name artist album_name album_art_url preview_url external_url uri')
+    now = [0.0]
+    store = TrackStore(':memory:', ttl_seconds=100, clock=lambda: now[0])
+    store.put_many([Track('a', 'Song', 'Artist', None, None, None, None, 'spotify:track:a')])
+    now[0] = 150.0
+
+    with patch('src.services.spotify_service.get_track_store', return_value=store), \
+            patch('src.services.spotify_service.get_async_spotify_client', return_value=None):
+        tracks = asyncio.run(fetch_tracks_by_ids(['a']))
+        assert [track.name for track in tracks] == ['Song']
+        # Nothing stored at all: still an error
+        with pytest.raises(RuntimeError):
+            asyncio.run(fetch_tracks_by_ids(['a', 'never-seen']))
+
+def test_track_lookup_is_capped():
+    with pytest.raises(ValueError):
+        asyncio.run(fetch_tracks_by_ids([f"id{i}" for i in range(MAX_TRACK_IDS + 1)]))
@@ -0,0 +1,43 @@
+from collections import namedtuple
+
+from src.services.track_store import TrackStore
+
+Track = namedtuple('Track', 'id name artist album_name album_art_url preview_url external_url uri mood')
+
+def make_track(track_id, name='Song'):
+    return Track(track_id, name, 'Artist', 'Album', None, None, None, f"spotify:track:{track_id}", 'happy')
+
+def test_lookup_splits_hits_and_misses():
+    store = TrackStore(':memory:')
+    store.put_many([make_track('a'), make_track('b')])
+    found, missing = store.get_many(['b', 'x', 'a', 'x'])
+    assert set(found) == {'a', 'b'}
+    assert found['a']['uri'] == 'spotify:track:a'
+    assert 'mood' not in found['a']
+    assert missing == ['x']
+
+def test_expired_entries_are_misses_until_rewritten():
+    now = [0.0]
+    store = TrackStore(':memory:', ttl_seconds=100, clock=lambda: now[0])
+    store.put_many([make_track('a')])
+    now[0] = 150.0
+    assert store.get_many(['a']) == ({}, ['a'])
+    store.put_many([make_track('a', name='Renamed')])
+    found, _ = store.get_many(['a'])
+    assert found['a']['name'] == 'Renamed'
+
+def test_stale_entries_can_be_served_on_request():
+    now = [0.0]
+    store = TrackStore(':memory:', ttl_seconds=100, clock=lambda: now[0])
+    store.put_many([make_track('a')])
+    now[0] = 150.0
+    found, missing = store.get_many(['a', 'x'], include_stale=True)
+    assert set(found) == {'a'}
+    assert missing == ['x']
+
+def test_store_persists_across_connections(tmp_path):
+    path = str(tmp_path / 'tracks.sqlite3')
+    store = TrackStore(path)
+    store.put_many([make_track('a')])
+    store.close()
+    assert 'a' in TrackStore(path).get_many(['a'])[0]